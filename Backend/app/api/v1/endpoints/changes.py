@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Query
+from typing import Optional
+from app.core.json_stream import FastJSONResponse
+from app.services.change_log import change_log
+import asyncio
+
+router = APIRouter()
+
+@router.get("/")
+async def get_changes(
+    since: Optional[int] = Query(None, ge=0),
+    epoch: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000),
+):
+    """
+    Creates and updates to reports, solutions and users after `since`,
+    oldest first, one entry per record:
+    {"seq", "collection", "id", "op": "create" | "update", "data"}.
+    A create carries the whole record; an update only the changed fields
+    (keys may be Firebase paths such as "aiAnalysis/score").
+
+    Ask again with since=`next` and the returned `epoch`. `has_more` means
+    the page was cut at `limit`. `resync` means the changes are no longer
+    available: refetch the lists, then continue from `next`.
+    Call without `since` to get the current `next` before a first full load.
+    """
+    result = await asyncio.to_thread(change_log.changes, since, epoch, limit)
+    return FastJSONResponse(result, headers={"Cache-Control": "no-store"})
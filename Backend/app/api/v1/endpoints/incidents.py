@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Form, HTTPException, Query
+from typing import Optional
+from app.core.config import settings
+from app.services.firebase_service import firebase_async
+from app.services.incident_service import incident_clusterer, verify_incident
+
+router = APIRouter()
+
+@router.get("/")
+async def get_incidents(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+):
+    """
+    Incidents (clustered reports), most recently reported first.
+    Each carries reportCount and submitterCount.
+    Pass `next_cursor` back as `cursor` for the next page.
+    """
+    filters = {"status": status, "category": category}
+    try:
+        page, next_cursor = await firebase_async.query_page('incidents', 'lastReportedAt', limit, cursor, filters)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    return {
+        "items": [{**incident, "id": key} for key, incident in page],
+        "next_cursor": next_cursor
+    }
+
+@router.get("/{incident_id}")
+async def get_incident(incident_id: str):
+    """One incident with its member report ids"""
+    incident = incident_clusterer.get(incident_id) or await firebase_async.get_incident(incident_id)
+    if not incident:
+        raise HTTPException(status_code=404, detail="Incident not found")
+    return incident
+
+@router.patch("/{incident_id}/verify")
+async def verify_incident_endpoint(
+    incident_id: str,
+    status: str = Form("Verified"),
+    area: str = Form("Sector 4"),
+    issue_type: str = Form("Pothole"),
+    radius_m: Optional[float] = Form(None),
+    severity: Optional[str] = Form(None)
+):
+    """
+    Admin verifies or rejects every report of an incident at once.
+    The first "Verified" sends one alert (area, or radius_m around the incident);
+    area alerts wait for the area's digest unless severity is High.
+    """
+    if radius_m is not None and not 0 < radius_m <= settings.GEO_MAX_RADIUS_M:
+        raise HTTPException(status_code=400, detail="radius_m out of range")
+
+    result = await verify_incident(incident_id, status, area, issue_type, radius_m, severity)
+    if "error" in result:
+        status_code = 404 if result["error"] == "Incident not found" else 500
+        raise HTTPException(status_code=status_code, detail=result["error"])
+    return result
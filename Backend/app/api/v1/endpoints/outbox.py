@@ -0,0 +1,20 @@
+from fastapi import APIRouter, HTTPException
+from app.services.alert_digest import alert_digest
+from app.services.whatsapp_outbox import whatsapp_outbox
+
+router = APIRouter()
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Progress of a WhatsApp job (the job_id returned by verify).
+    state: scheduled (digest window still open) -> queued -> in_progress
+    -> completed / completed_with_failures
+    """
+    scheduled = alert_digest.scheduled(job_id)
+    if scheduled:
+        return scheduled
+    job = await whatsapp_outbox.job_status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
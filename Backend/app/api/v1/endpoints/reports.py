@@ -1,14 +1,28 @@
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException
+from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from typing import Optional
-from app.services.gemini_service import gemini_service
-from app.services.firebase_service import firebase_service
-from app.services.whatsapp_service import send_green_alert
+from app.core.config import settings
+from app.core.json_stream import iter_json_object
+from app.core.log import get_logger
+from app.services.geo_index import report_geo_index, report_point
+from app.services.report_index import user_report_index
+from app.services.report_stats import report_stats
+from app.services.collection_versions import collection_versions, cache_headers
+from app.services.verification_service import verification_pipeline, PENDING_STATUS
+from app.services.image_service import image_preprocessor, UploadTooLarge
+from app.services.incident_service import incident_clusterer, verify_incident
+from app.services.firebase_service import firebase_async
+from app.services.whatsapp_outbox import whatsapp_outbox
 # Import the Alert Service to send WhatsApp messages
-from app.services.alert_service import broadcast_alert_to_area 
+from app.services.alert_digest import alert_digest, report_severity
+from app.services.alert_service import broadcast_alert_to_radius
+import asyncio
 import shutil
 import os
 from datetime import datetime
 
+logger = get_logger(__name__)
+
 router = APIRouter()
 
 @router.post("/submit", status_code=201)
@@ -23,41 +37,23 @@ async def submit_report(
 ):
     """
     Receives a photo and location from the mobile app.
-    1. Uses Gemini to verify the issue.
-    2. If valid, saves to Firebase Realtime DB.
+    1. Reads the photo (size-capped) and shrinks it for analysis.
+    2. Saves the report to Firebase as "Pending Verification".
+    3. Queues the photo for background AI verification; the result is
+       patched onto the report and pushed over WebSocket.
     """
     
-    # 1. Read Image
+    # 1. Read Image (chunked, capped) and downscale / strip EXIF in the process pool
     try:
-        image_bytes = await file.read()
+        photo = await image_preprocessor.process_upload(file, settings.UPLOAD_MAX_BYTES, settings.UPLOAD_CHUNK_SIZE)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail="Invalid image file")
 
-    # 2. Analyze with Gemini
-    prompt = """
-    Analyze this image for civic issues like potholes, garbage, street light issues, or accidents.
-    Answer with a JSON object containing:
-    - "is_civic_issue": boolean
-    - "issue_type": string (e.g., "Pothole", "Garbage", "Traffic", "N/A")
-    - "severity": string ("Low", "Medium", "High")
-    - "description": short description of what you see
-    """
-    
-    ai_analysis = await gemini_service.analyze_image(image_bytes, prompt=prompt)
-    
-    # Default fallback logic
-    report_status = "Pending Verification"
-    issue_type = "reported_issue"
-    confidence = 0.0
-    
-    if "analysis" in ai_analysis and ai_analysis["analysis"]:
-        text_resp = ai_analysis["analysis"].lower()
-        if "true" in text_resp or "pothole" in text_resp or "garbage" in text_resp:
-            report_status = "Verified"
-            issue_type = "Verified Issue"
-            confidence = 0.95
-    
-    # 3. Construct Payload
+    report_status = PENDING_STATUS
+
+    # 2. Construct Payload
     report_payload = {
         "userId": user_id,
         "category": category,
@@ -68,63 +64,221 @@ async def submit_report(
         },
         "description": description,
         "aiAnalysis": {
-            "raw": ai_analysis.get("analysis", ""),
-            "detectedType": issue_type,
-            "confidence": confidence
+            "raw": "",
+            "detectedType": "reported_issue",
+            "confidence": 0.0
         },
         "status": report_status,
         "timestamp_local": datetime.now().isoformat(),
     }
+    if photo["gps"]:
+        # Where the photo was taken, from its EXIF (stripped from the image itself)
+        report_payload["photoGps"] = photo["gps"]
+
+    # 3. Save to Firebase
+    db_result = await firebase_async.save_report(report_payload)
+    if "error" in db_result:
+        raise HTTPException(status_code=500, detail=db_result["error"])
 
-    # 4. Save to Firebase
-    db_result = firebase_service.save_report(report_payload)
+    # 4. Group with nearby reports of the same issue (one incident, one alert)
+    incident_id, incident_updates = incident_clusterer.assign(db_result["id"], report_payload)
+    if incident_updates:
+        incident_result = await firebase_async.update_multi(incident_updates)
+        if "error" in incident_result:
+            logger.warning("Could not link report to incident: %s", incident_result['error'],
+                           extra={"report_id": db_result['id'], "incident_id": incident_id})
+    incident = incident_clusterer.get(incident_id) or {}
 
-    # 5. Notify Admin (Bot Logic)
+    # 5. Queue AI verification (runs after we respond)
+    verification_queued = verification_pipeline.submit(
+        db_result["id"], user_id, photo["image"], mime_type=photo["mime_type"]
+    )
+
+    # 6. Notify Admin (Bot Logic)
     try:
         ADMIN_PHONE = "918872825483"
         admin_msg = f"🚨 *New Incident Reported*\n\nType: {category}\nLocation: {latitude}, {longitude}\nStatus: {report_status}\n\nID: {db_result.get('id')}\n\nAuthorize on Dashboard."
-        send_green_alert(ADMIN_PHONE, admin_msg)
+        await whatsapp_outbox.enqueue("admin", [ADMIN_PHONE], admin_msg, dedup_key=f"report-admin:{db_result.get('id')}")
     except Exception as e:
-        print(f"Failed to notify admin: {e}")
+        logger.warning("Failed to notify admin: %s", e, extra={"report_id": db_result.get('id')})
 
     return {
         "message": "Report submitted successfully",
         "reportId": db_result.get("id"),
         "ai_verification": report_status,
-        "analysis": ai_analysis.get("analysis")
+        "verification_queued": verification_queued,
+        "incidentId": incident_id,
+        "incidentSubmitters": incident.get("submitterCount", 1)
     }
 
 @router.get("/", status_code=200)
-async def get_reports():
+async def get_reports(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    userId: Optional[str] = None,
+):
+    """
+    Get reports (Admin usage), newest first.
+    - With `limit`: one page -> {"items": [...], "next_cursor": "..."}.
+      Pass `next_cursor` back as `cursor` for the next page.
+    - Without `limit`: every matching report as {id: report}, streamed
+      from Firebase page by page (export / legacy dashboard shape).
+    Filters: status, category, userId.
+    Answers 304 when If-None-Match holds the current ETag (no report written since).
+    """
+    etag = collection_versions.etag('reports', request.query_params.multi_items())
+    if collection_versions.not_modified('reports', etag, request.headers.get('if-none-match')):
+        return Response(status_code=304, headers=cache_headers(etag))
+    filters = {"userId": userId, "status": status, "category": category}
+
+    if limit is None:
+        records = firebase_async.iter_collection('reports', 'timestamp', filters)
+        return StreamingResponse(iter_json_object(records), media_type="application/json",
+                                 headers=cache_headers(etag))
+
+    try:
+        page, next_cursor = await firebase_async.query_page('reports', 'timestamp', limit, cursor, filters)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    response.headers.update(cache_headers(etag))
+    return {
+        "items": [{**report, "id": key} for key, report in page],
+        "next_cursor": next_cursor
+    }
+
+async def _load_reports(report_ids):
+    """Fetch report records one child each, concurrently"""
+    records = await asyncio.gather(*(firebase_async.get_report(rid) for rid in report_ids))
+    return dict(zip(report_ids, records))
+
+@router.get("/nearby")
+async def get_reports_nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(1000, gt=0, le=settings.GEO_MAX_RADIUS_M),
+    limit: int = Query(100, ge=1, le=500),
+):
+    """Reports within radius_m of a point, nearest first (served from the geo index)"""
+    hits = report_geo_index.within_radius(lat, lng, radius_m)[:limit]
+    records = await _load_reports([report_id for report_id, *_ in hits])
+    return {
+        "items": [
+            {**records[report_id], "id": report_id, "distance_m": round(distance, 1)}
+            for report_id, _, _, distance in hits if records[report_id]
+        ],
+        "total_in_radius": len(hits)
+    }
+
+@router.get("/within")
+async def get_reports_within(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lng: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lng: float = Query(..., ge=-180, le=180),
+    limit: int = Query(500, ge=1, le=2000),
+):
+    """Reports inside a bounding box (e.g. the admin map viewport)"""
+    if min_lat > max_lat or min_lng > max_lng:
+        raise HTTPException(status_code=400, detail="min_lat/min_lng must not exceed max_lat/max_lng")
+    hits = report_geo_index.within_bbox(min_lat, min_lng, max_lat, max_lng)
+    records = await _load_reports([report_id for report_id, *_ in hits[:limit]])
+    return {
+        "items": [{**report, "id": report_id} for report_id, report in records.items() if report],
+        "total_in_box": len(hits)
+    }
+
+@router.get("/stats")
+async def get_report_stats(days: int = Query(30, ge=0, le=366)):
     """
-    Get all reports (Admin usage).
+    Dashboard counts by status, category, area and day (last `days` days
+    with reports) plus mean time to resolution, from in-memory counters.
     """
-    reports = firebase_service.get_reports()
-    return reports
+    return report_stats.snapshot(days=days)
+
+@router.get("/by-user/{user_id}")
+async def get_reports_by_user(
+    user_id: str,
+    status: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+):
+    """
+    One user's reports, newest first ("my reports"), served from the
+    user -> reports index: id, status, category, address and timestamp.
+    """
+    reports = user_report_index.reports_for(user_id, status=status)
+    counts = {}
+    for report in reports:
+        counts[report["status"]] = counts.get(report["status"], 0) + 1
+    return {
+        "userId": user_id,
+        "items": reports[:limit],
+        "total": len(reports),
+        "by_status": counts
+    }
 
 @router.patch("/{report_id}/verify")
 async def verify_report(
     report_id: str, 
     status: str = Form("Verified"), 
     area: str = Form("Sector 4"),       # New Field: Admin inputs area
-    issue_type: str = Form("Pothole")   # New Field: Admin confirms issue type
+    issue_type: str = Form("Pothole"),  # New Field: Admin confirms issue type
+    radius_m: Optional[float] = Form(None),  # Optional: alert users near the report instead of by area
+    severity: Optional[str] = Form(None)  # Optional: defaults to the AI's severity; High skips the digest window
 ):
     """
     Admin manually verifies or rejects a report.
-    If Verified, it triggers a WhatsApp Broadcast to that Area.
+    If Verified, it triggers a WhatsApp Broadcast to that Area,
+    or to every user within radius_m of the report when given.
+    Reports that belong to an incident decide the whole incident, and the
+    alert goes out once per incident. Area alerts are merged into a
+    per-area digest unless the issue is high severity.
     """
-    # 1. Update Firebase
-    result = firebase_service.update_report_status(report_id, status)
+    if radius_m is not None and not 0 < radius_m <= settings.GEO_MAX_RADIUS_M:
+        raise HTTPException(status_code=400, detail="radius_m out of range")
+
+    report = await firebase_async.get_report(report_id)
+    severity = severity or report_severity(report)
+    if report and report.get("incidentId"):
+        incident_result = await verify_incident(report["incidentId"], status, area, issue_type, radius_m, severity)
+        if "error" in incident_result:
+            raise HTTPException(status_code=500, detail=incident_result["error"])
+        return incident_result
+
+    # Radius alerts need the report's position: check before anything is written
+    point = None
+    if status == "Verified" and radius_m:
+        point = report_geo_index.get(report_id) or report_point(report)
+        if not point:
+            raise HTTPException(status_code=400, detail="Report has no location for radius targeting")
+
+    # 1. Update Firebase (the area also feeds the per-area report stats)
+    result = await firebase_async.update_report(report_id, {"status": status, "verifiedArea": area})
     if "error" in result:
          raise HTTPException(status_code=500, detail=result["error"])
 
     # 2. TRIGGER WHATSAPP ALERT (New Logic)
     alert_result = {"status": "skipped"}
     if status == "Verified":
-        # Call the alert service we created
-        alert_result = await broadcast_alert_to_area(incident_area=area, issue_type=issue_type)
+        if point:
+            alert_result = await broadcast_alert_to_radius(
+                point[0], point[1], radius_m, issue_type=issue_type, incident_area=area,
+                additional_data={"report_id": report_id}
+            )
+        else:
+            # Held and merged with other alerts for the same area
+            alert_result = await alert_digest.submit(
+                incident_area=area, issue_type=issue_type, severity=severity,
+                additional_data={"report_id": report_id}
+            )
 
     return {
         "firebase_update": result,
-        "whatsapp_alert": alert_result
+        "whatsapp_alert": alert_result,
+        # Poll /api/v1/outbox/jobs/{job_id} for WhatsApp delivery progress
+        "job_id": alert_result.get("job_id")
     }
\ No newline at end of file
@@ -1,5 +1,9 @@
-from fastapi import APIRouter, HTTPException, Body
-from app.services.firebase_service import firebase_service
+from fastapi import APIRouter, HTTPException, Body, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from app.core.json_stream import iter_json_object
+from app.services.collection_versions import collection_versions, cache_headers
+from app.services.firebase_service import firebase_async
+from app.services.incident_service import incident_clusterer, notify_incident_resolved
 from pydantic import BaseModel
 from typing import Optional
 
@@ -18,15 +22,61 @@ async def submit_solution(solution: SolutionCreate):
     Admin submits a solution.
     1. Creates entry in 'solutions' table.
     2. Updates 'reports' table status to 'Resolved'.
+    3. If the report is part of an incident, resolves the incident and
+       all its reports, and notifies admins and submitters once.
     """
     data = solution.dict()
-    result = firebase_service.save_solution(data)
+    report = await firebase_async.get_report(solution.reportId)
+    incident_id = (report or {}).get("incidentId")
+    incident = None
+    if incident_id:
+        incident = incident_clusterer.get(incident_id) or await firebase_async.get_incident(incident_id)
+
+    related_ids = [rid for rid in (incident or {}).get("reportIds") or {} if rid != solution.reportId]
+    result = await firebase_async.save_solution(
+        data, incident_id=incident["id"] if incident else None, related_report_ids=related_ids
+    )
     
     if "error" in result:
         raise HTTPException(status_code=500, detail=result["error"])
+
+    if incident:
+        await notify_incident_resolved(incident, result["solutionId"])
         
     return {"message": "Solution recorded", "solutionId": result["solutionId"]}
 
 @router.get("/")
-async def get_solutions():
-    return firebase_service.get_solutions()
\ No newline at end of file
+async def get_solutions(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    reportId: Optional[str] = None,
+    adminId: Optional[str] = None,
+):
+    """
+    Get solutions, newest first (same contract as GET /reports).
+    - With `limit`: one page -> {"items": [...], "next_cursor": "..."}
+    - Without `limit`: every matching solution as {id: solution}, streamed
+    Answers 304 when If-None-Match holds the current ETag.
+    """
+    etag = collection_versions.etag('solutions', request.query_params.multi_items())
+    if collection_versions.not_modified('solutions', etag, request.headers.get('if-none-match')):
+        return Response(status_code=304, headers=cache_headers(etag))
+    filters = {"reportId": reportId, "adminId": adminId}
+
+    if limit is None:
+        records = firebase_async.iter_collection('solutions', 'solvedAt', filters)
+        return StreamingResponse(iter_json_object(records), media_type="application/json",
+                                 headers=cache_headers(etag))
+
+    try:
+        page, next_cursor = await firebase_async.query_page('solutions', 'solvedAt', limit, cursor, filters)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    response.headers.update(cache_headers(etag))
+    return {
+        "items": [{**solution, "id": key} for key, solution in page],
+        "next_cursor": next_cursor
+    }
\ No newline at end of file
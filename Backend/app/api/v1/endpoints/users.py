@@ -1,8 +1,18 @@
-from fastapi import APIRouter, HTTPException, Body
-from app.services.firebase_service import firebase_service
+from fastapi import APIRouter, HTTPException, Body, Query, Request, Response
+from app.core.json_stream import FastJSONResponse
+from app.core.log import get_logger
+from app.core.ws_auth import issue_admin_token
+from app.services.collection_versions import collection_versions, cache_headers
+from app.services.firebase_service import firebase_async
+from app.services.area_index import area_index
+from app.services.geo_index import user_geo_index
+from app.services.location_buffer import location_buffer
+from app.services.websocket_manager import manager
 from pydantic import BaseModel
 from typing import Optional
 
+logger = get_logger(__name__)
+
 router = APIRouter()
 
 class UserLocation(BaseModel):
@@ -33,18 +43,18 @@ async def register_user(user: UserCreate):
     Register User (Citizen) or Admin.
     Key is mobile number for uniqueness.
     """
-    print(f"DEBUG REGISTER: Validating {user.mobile}")
+    logger.debug("Register attempt", extra={"mobile": user.mobile})
     user_data = user.dict()
     # Use mobile as key
     user_id = user.mobile
     
-    result = firebase_service.save_user(user_data, user_id=user_id)
+    result = await firebase_async.save_user(user_data, user_id=user_id)
     
     if "error" in result:
-        print(f"DEBUG REGISTER ERROR: {result['error']}")
+        logger.error("Register failed: %s", result['error'], extra={"mobile": user.mobile})
         raise HTTPException(status_code=500, detail=result["error"])
         
-    print(f"DEBUG REGISTER SUCCESS: {user_id}")
+    logger.debug("Registered", extra={"user_id": user_id, "role": user.role})
     return {"message": "Registered successfully", "userId": user_id, "role": user.role}
 
 @router.post("/login")
@@ -52,42 +62,29 @@ async def login_user(user: UserLogin):
     """
     Simple Login: Verify Mobile and Password
     """
-    print(f"DEBUG LOGIN: Attempting login for {user.mobile}")
-    users = firebase_service.get_users()
-    if not users:
-        print("DEBUG LOGIN: No users in DB")
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    print(f"DEBUG LOGIN: Users Keys: {list(users.keys()) if isinstance(users, dict) else 'Not a dict'}")
-
-    # Find user by mobile (key or field)
-    target_user = None
-    if isinstance(users, dict):
-        target_user = users.get(user.mobile)
-        if not target_user:
-            print(f"DEBUG LOGIN: Key lookup failed for {user.mobile}. Checking values...")
-            # Search values
-            for key, val in users.items():
-                if val.get('mobile') == user.mobile:
-                    target_user = val
-                    break
-            for key, val in users.items():
-                if val.get('mobile') == user.mobile:
-                    target_user = val
-                    break
+    logger.debug("Login attempt", extra={"mobile": user.mobile})
+    # Single-record lookup by key or mobile (cached, no full users download)
+    _, target_user = await firebase_async.get_user_by_mobile(user.mobile)
     
     if not target_user:
+        logger.debug("Login for unknown user", extra={"mobile": user.mobile})
         raise HTTPException(status_code=404, detail="User not found")
         
     # Check Password (Plaintext for MVP)
     if target_user.get('password') != user.password:
          raise HTTPException(status_code=400, detail="Invalid credentials")
          
-    return {
+    role = target_user.get('role', 'user')
+    response = {
         "userId": user.mobile, 
         "name": f"{target_user.get('firstName', '')} {target_user.get('lastName', '')}",
-        "role": target_user.get('role', 'user')
+        "role": role
     }
+    # Admins open /ws/{userId}?token=... to receive the live map
+    ws_token = issue_admin_token(user.mobile) if role == "admin" else None
+    if ws_token:
+        response["wsToken"] = ws_token
+    return response
 
 @router.post("/update-location")
 async def update_location(
@@ -97,43 +94,62 @@ async def update_location(
 ):
     """
     Called by Mobile App background service to update Admin Map.
+    Buffered: only the latest position per user is written, once per flush.
     """
-    location_data = {
-        "location": {
-            "latitude": latitude,
-            "longitude": longitude
-        },
-        "lastActive": {".sv": "timestamp"}
-    }
-    firebase_service.save_user(location_data, user_id=user_id)
+    location_buffer.add(user_id, latitude, longitude)
+    # Admin map picks it up in the next location frame
+    await manager.send_location_update(user_id, {"latitude": latitude, "longitude": longitude})
     return {"status": "updated"}
 
 @router.get("/active")
-async def get_active_users():
-    return firebase_service.get_users()
+async def get_active_users(request: Request):
+    """
+    Every user record (Admin map); 304 when If-None-Match holds the current ETag.
+    The ETag follows user record writes, not position updates: positions here
+    can lag, live ones come from /users/within or the WebSocket location stream.
+    """
+    etag = collection_versions.etag('users', request.query_params.multi_items())
+    if collection_versions.not_modified('users', etag, request.headers.get('if-none-match')):
+        return Response(status_code=304, headers=cache_headers(etag))
+    # Already plain JSON from Firebase: skip FastAPI's per-value re-encoding
+    return FastJSONResponse(await firebase_async.get_users(), headers=cache_headers(etag))
+
+@router.get("/within")
+async def get_users_within(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lng: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lng: float = Query(..., ge=-180, le=180),
+):
+    """Last known user positions inside a bounding box (Admin map)"""
+    if min_lat > max_lat or min_lng > max_lng:
+        raise HTTPException(status_code=400, detail="min_lat/min_lng must not exceed max_lat/max_lng")
+    return [
+        {"userId": user_id, "latitude": lat, "longitude": lng}
+        for user_id, lat, lng in user_geo_index.within_bbox(min_lat, min_lng, max_lat, max_lng)
+    ]
+
+@router.get("/area-index/check")
+async def check_area_index():
+    """Compare the in-memory area index against the users tree (Admin)"""
+    return area_index.check(await firebase_async.get_users())
+
+@router.post("/area-index/rebuild")
+async def rebuild_area_index():
+    """Rebuild the in-memory area index from Firebase (Admin)"""
+    area_index.build(await firebase_async.get_users())
+    return {"status": "rebuilt", **area_index.stats()}
 
 @router.get("/{user_id}")
 async def get_user_profile(user_id: str):
     """Get single user profile"""
-    users = firebase_service.get_users() # Optimization: Should fetch single, but using existing method
-    # Filter manually for now as firebase_service.get_users() returns all
-    if not users:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Check if users is list or dict
-    if isinstance(users, dict):
-        user = users.get(user_id)
-        if user:
-            return user
-            
-        # Search by value if user_id is a key
-        for key, val in users.items():
-            if val.get('mobile') == user_id or key == user_id:
-                return val
+    _, user = await firebase_async.get_user_by_mobile(user_id)
+    if user:
+        return user
     
     raise HTTPException(status_code=404, detail="User not found")
 
 @router.patch("/{user_id}")
 async def update_user_profile(user_id: str, user_update: dict = Body(...)):
     """Update user profile"""
-    return firebase_service.save_user(user_update, user_id=user_id)
\ No newline at end of file
+    return await firebase_async.save_user(user_update, user_id=user_id)
\ No newline at end of file
@@ -3,23 +3,34 @@ WebSocket endpoint for real-time alert notifications
 Handles client connections and manages subscriptions
 """
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
+from app.core.log import get_logger
 from app.services.websocket_manager import manager
 
+logger = get_logger(__name__)
+
 router = APIRouter()
 
 
 @router.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: str):
+async def websocket_endpoint(websocket: WebSocket, user_id: str, token: str = Query(None)):
     """
     WebSocket endpoint for real-time alerts
     
     Connect: ws://your-api/api/v1/ws/{user_id}
+    Admins add ?token=<wsToken from /users/login>; without it every socket is a
+    plain user socket.
     
     Messages:
     1. Subscribe to areas: {"type": "subscribe", "areas": ["Area1", "Area2"]}
     2. Receives alerts as: {"type": "alert", "timestamp": "...", "data": {...}}
+    
+    Admins also receive the live user map:
+    3. Every second: {"type": "location_delta", "users": [{"userId", "latitude", "longitude"}, ...]}
+       (only users that moved)
+    4. Limit it to the visible map: {"type": "viewport", "bounds": {"min_lat", "min_lng", "max_lat", "max_lng"}}
+       (bounds null = whole map); answered with a "location_snapshot" of users inside
     """
-    await manager.connect(websocket, user_id)
+    await manager.connect(websocket, user_id, admin_token=token)
     
     try:
         while True:
@@ -29,22 +40,33 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
                 # User subscribing to areas
                 areas = data.get("areas", [])
                 await manager.subscribe_to_area(user_id, areas)
-                await websocket.send_json({
+                manager.send_personal(user_id, {
                     "type": "subscription_confirmed",
                     "areas": areas,
                     "message": f"Subscribed to {len(areas)} area(s)"
                 })
             
+            elif data.get("type") == "viewport":
+                # Admin map moved: filter the location stream to these bounds
+                try:
+                    snapshot = manager.set_viewport(user_id, data.get("bounds"))
+                except (KeyError, TypeError, ValueError) as e:
+                    manager.send_personal(user_id, {"type": "error", "message": f"Invalid viewport: {e}"})
+                    continue
+                if snapshot is None:
+                    manager.send_personal(user_id, {"type": "error", "message": "Location stream is for admins only"})
+                else:
+                    manager.send_personal(user_id, {"type": "location_snapshot", "users": snapshot})
+            
             elif data.get("type") == "ping":
                 # Keep-alive ping
-                await websocket.send_json({"type": "pong"})
+                manager.send_personal(user_id, {"type": "pong"})
                 
     except WebSocketDisconnect:
-        manager.disconnect(user_id)
-        print(f"WebSocket disconnected: {user_id}")
+        manager.disconnect(user_id, websocket)
     except Exception as e:
-        print(f"WebSocket error for {user_id}: {e}")
-        manager.disconnect(user_id)
+        logger.warning("WebSocket error: %s", e, extra={"user_id": user_id})
+        manager.disconnect(user_id, websocket)
 
 
 @router.get("/ws/status")
@@ -52,5 +74,9 @@ async def websocket_status():
     """Get current WebSocket connection status"""
     return {
         "connected_users": manager.get_connected_users_count(),
-        "user_list": manager.get_connected_users()
+        "admins": manager.get_admin_count(),
+        "location_frames_sent": manager.location_frames_sent,
+        "user_list": manager.get_connected_users(),
+        "queues": manager.get_queue_stats(),
+        "cluster": manager.get_cluster_status()
     }
@@ -1,4 +1,5 @@
 import os
+from typing import List
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict
 
@@ -11,14 +12,125 @@ class Settings(BaseSettings):
     # Google API Keys
     GOOGLE_MAPS_API_KEY: str = ""
     GOOGLE_GEMINI_API_KEY: str = ""
+    # Report photo uploads
+    UPLOAD_MAX_BYTES: int = 15 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    # Downscale + re-encode before analysis (needs Pillow)
+    IMAGE_PREPROCESS_ENABLED: bool = True
+    IMAGE_PREPROCESS_WORKERS: int = 2
+    # Uploads held in memory at once; others wait spooled to disk
+    IMAGE_PREPROCESS_MAX_IN_FLIGHT: int = 4
+    IMAGE_MAX_DIMENSION: int = 1600
+    IMAGE_JPEG_QUALITY: int = 85
+    # Background AI verification of submitted reports
+    AI_VERIFY_WORKERS: int = 4
+    AI_VERIFY_QUEUE_SIZE: int = 500
+    AI_VERIFY_TIMEOUT: float = 30.0
+    AI_VERIFY_MAX_ATTEMPTS: int = 3
+    AI_VERIFY_RETRY_BACKOFF: float = 2.0
+    # Gemini reply cache (exact + near-duplicate photos, persisted to SQLite)
+    GEMINI_CACHE_ENABLED: bool = True
+    GEMINI_CACHE_PATH: str = "gemini_cache.sqlite3"
+    GEMINI_CACHE_MAXSIZE: int = 5000
+    GEMINI_CACHE_TTL: float = 7 * 24 * 3600.0
+    # Max dHash bit difference (of 64) for a near-duplicate hit; 0 = exact only
+    GEMINI_CACHE_MAX_DISTANCE: int = 5
     
     # Firebase
     FIREBASE_CREDENTIALS_PATH: str = "app/core/serviceAccountKey.json"
     FIREBASE_DATABASE_URL: str = ""
+    # Threads running blocking Firebase calls for async endpoints
+    FIREBASE_EXECUTOR_WORKERS: int = 16
+    # Page size used when streaming whole collections
+    FIREBASE_PAGE_SIZE: int = 500
+    # Single-user read-through cache
+    USER_CACHE_MAXSIZE: int = 10000
+    USER_CACHE_TTL: float = 60.0
+    # Coalesced /users/update-location writes
+    LOCATION_FLUSH_INTERVAL: float = 2.0
+    LOCATION_FLUSH_MAX_PENDING: int = 5000
 
     # Green-API Credentials (WhatsApp)
     GREEN_API_ID_INSTANCE: str = ""
     GREEN_API_API_TOKEN: str = ""
+    GREEN_API_HOST: str = "https://api.green-api.com"
+    # Bulk alert sending (quota is per instance)
+    GREEN_API_MAX_CONCURRENCY: int = 10
+    GREEN_API_RATE_LIMIT_PER_SEC: float = 5.0
+    GREEN_API_RATE_LIMIT_BURST: int = 10
+    GREEN_API_SEND_TIMEOUT: float = 10.0
+
+    # Durable WhatsApp outbox (SQLite) and its retry policy
+    WHATSAPP_OUTBOX_PATH: str = "whatsapp_outbox.sqlite3"
+    WHATSAPP_OUTBOX_BATCH_SIZE: int = 50
+    WHATSAPP_OUTBOX_MAX_ATTEMPTS: int = 6
+    WHATSAPP_OUTBOX_BACKOFF: float = 5.0
+    WHATSAPP_OUTBOX_MAX_BACKOFF: float = 600.0
+    WHATSAPP_OUTBOX_POLL_INTERVAL: float = 5.0
+    # A claimed batch belongs to its worker this long; then any worker may retry it
+    WHATSAPP_OUTBOX_LEASE_S: float = 300.0
+    # Sent/failed messages are kept this long for job status
+    WHATSAPP_OUTBOX_RETENTION: float = 7 * 24 * 3600.0
+
+    # Incoming WhatsApp webhooks: acknowledged at once, processed by workers
+    WEBHOOK_WORKERS: int = 2
+    WEBHOOK_QUEUE_SIZE: int = 1000
+    # Recently seen Green-API idMessage values (redeliveries are dropped)
+    WEBHOOK_DEDUP_SIZE: int = 10000
+
+    # Geospatial grid index (~1.1 km cells)
+    GEO_CELL_SIZE_DEG: float = 0.01
+    GEO_MAX_RADIUS_M: float = 50000.0
+
+    # Reports of one category this close in space and time form one incident
+    INCIDENT_RADIUS_M: float = 150.0
+    INCIDENT_WINDOW_S: float = 6 * 3600.0
+
+    # Area alerts within this window are merged into one digest (0 = send at once)
+    ALERT_DIGEST_WINDOW_S: float = 120.0
+    ALERT_DIGEST_BYPASS_SEVERITIES: List[str] = ["High", "Critical"]
+    # A digest that could not be enqueued is retried after 5 s, 10 s, ... up to the max
+    ALERT_DIGEST_RETRY_BACKOFF: float = 5.0
+    ALERT_DIGEST_RETRY_MAX_BACKOFF: float = 300.0
+
+    # WebSocket fan-out
+    WS_SEND_TIMEOUT: float = 5.0
+    # Per-connection outbound queue
+    WS_QUEUE_MAXSIZE: int = 100
+    WS_QUEUE_DROP_OLDEST_TYPES: List[str] = ["location_delta", "location_snapshot"]
+    WS_QUEUE_FULL_DISCONNECT_AFTER: float = 10.0
+    # Admin location stream: one delta frame per interval
+    WS_LOCATION_FRAME_INTERVAL: float = 1.0
+    # Admin sockets need a login-issued token signed with this secret (empty = admin stream off)
+    WS_ADMIN_TOKEN_SECRET: str = ""
+    WS_ADMIN_TOKEN_TTL_S: float = 12 * 3600
+    # Cross-worker backplane: "memory" (single process) or "redis"
+    WS_BACKPLANE: str = "memory"
+    WS_BACKPLANE_CHANNEL_PREFIX: str = "nagar:ws:"
+    WS_PRESENCE_INTERVAL: float = 5.0
+    # A publish taking longer than this is delivered on this worker only
+    WS_BACKPLANE_PUBLISH_TIMEOUT: float = 2.0
+    # redis://[user:password@]host:port/db
+    REDIS_URL: str = "redis://localhost:6379/0"
+
+    # Startup: each connect/warm-up step gives up after this long (the app still starts)
+    STARTUP_STEP_TIMEOUT: float = 15.0
+    # Connections opened to Firebase and Green-API before the first request
+    STARTUP_WARM_CONNECTIONS: int = 4
+
+    # Logging: DEBUG/INFO/WARNING/ERROR, "json" or "text" lines on stdout
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+
+    # Change log behind GET /changes: newest entries in memory, older ones spilled to SQLite
+    # (one file per worker: change_log.0.sqlite3, change_log.1.sqlite3, ...)
+    CHANGE_LOG_PATH: str = "change_log.sqlite3"
+    CHANGE_LOG_MEMORY_ENTRIES: int = 5000
+    CHANGE_LOG_DISK_ENTRIES: int = 100000
+
+    # Responses at least this large are gzip-compressed for clients that accept it
+    GZIP_MINIMUM_SIZE: int = 1024
+    GZIP_COMPRESS_LEVEL: int = 5
 
     # Extra configs
     DEBUG: bool = False
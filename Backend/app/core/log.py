@@ -0,0 +1,93 @@
+"""
+Structured, leveled logging that never writes on the event loop.
+
+Records go onto an in-memory queue (QueueHandler); a background thread
+formats and writes them to stdout (QueueListener). Below LOG_LEVEL a call
+returns after one level check, so per-message debug logging in hot paths
+is free in production: pass values as arguments or `extra` fields, never
+pre-formatted f-strings.
+
+    logger = get_logger(__name__)
+    logger.info("Alert queued", extra={"area": area, "phones": len(phones)})
+
+LOG_FORMAT "json" writes one JSON object per line with the `extra` fields at
+top level; "text" writes `time level logger message key=value ...`.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+
+from app.core.config import settings
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+
+
+def _fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS}
+
+
+def _timestamp(record: logging.LogRecord) -> str:
+    return datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": _timestamp(record),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_fields(record),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{key}={value}" for key, value in _fields(record).items())
+        line = f"{_timestamp(record)} {record.levelname:<7} {record.name}: {record.getMessage()}"
+        if fields:
+            line = f"{line} {fields}"
+        if record.exc_info:
+            line = f"{line}\n{self.formatException(record.exc_info)}"
+        return line
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Keep args and exc_info for the listener's formatter instead of
+        # rendering the message on the caller's thread
+        return record
+
+
+def setup_logging():
+    """Route the 'app' loggers through the background writer (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+    records = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, output)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(settings.LOG_LEVEL.upper())
+    app_logger.addHandler(_QueueHandler(records))
+    app_logger.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for a module; pass __name__ so it falls under 'app'"""
+    setup_logging()
+    return logging.getLogger(name)
@@ -0,0 +1,63 @@
+"""
+Prometheus metrics, served at /metrics.
+
+Histograms are observed where the work happens (Gemini, Firebase, Green-API,
+alert broadcasts). Gauges are read from the services when /metrics is
+scraped, via `Gauge.set_function` next to each service's global instance,
+so nothing is updated on the hot path just to keep a gauge current.
+
+With several uvicorn workers each process has its own registry; scrape
+each worker (or pod) separately.
+"""
+from prometheus_client import Counter, Gauge, Histogram
+
+# Network round trips: 5 ms .. 30 s
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Queued WhatsApp messages can wait behind the rate limit and retries for minutes
+DELIVERY_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+# --- Histograms ---
+GEMINI_ANALYSIS_SECONDS = Histogram(
+    "nagar_gemini_analysis_seconds", "Gemini model call time (cache hits excluded)",
+    ["outcome"], buckets=LATENCY_BUCKETS,
+)
+FIREBASE_CALL_SECONDS = Histogram(
+    "nagar_firebase_call_seconds", "Firebase call time by service method",
+    ["method", "outcome"], buckets=LATENCY_BUCKETS,
+)
+GREEN_API_SEND_SECONDS = Histogram(
+    "nagar_green_api_send_seconds", "Green-API sendMessage time, including rate-limit wait",
+    ["outcome"], buckets=LATENCY_BUCKETS,
+)
+ALERT_BROADCAST_SECONDS = Histogram(
+    "nagar_alert_broadcast_seconds",
+    "Alert fan-out: target lookup, WhatsApp messages queued and WebSocket clients enqueued",
+    ["target"], buckets=LATENCY_BUCKETS,
+)
+WHATSAPP_DELIVERY_SECONDS = Histogram(
+    "nagar_whatsapp_delivery_seconds", "Outbox message queued -> delivered (or given up)",
+    ["kind", "outcome"], buckets=DELIVERY_BUCKETS,
+)
+
+# --- Counters ---
+ALERT_RECIPIENTS = Counter(
+    "nagar_alert_recipients_total", "Alert recipients by channel", ["channel"],
+)
+CONDITIONAL_GETS = Counter(
+    "nagar_conditional_gets_total", "Admin list reads answered 304 (not_modified) or with a body (full)",
+    ["collection", "outcome"],
+)
+
+# --- Gauges (read at scrape time) ---
+WS_CONNECTIONS = Gauge("nagar_websocket_connections", "Open WebSocket connections on this worker")
+WS_ADMIN_CONNECTIONS = Gauge("nagar_websocket_admin_connections", "Connected admins on this worker")
+WS_SUBSCRIPTIONS = Gauge("nagar_websocket_subscriptions", "Area subscriptions held by connected users")
+WS_SUBSCRIBED_AREAS = Gauge("nagar_websocket_subscribed_areas", "Areas with at least one subscriber")
+WS_OUTBOUND_QUEUED = Gauge("nagar_websocket_outbound_queued", "Messages waiting in per-connection send queues")
+VERIFICATION_QUEUE_DEPTH = Gauge("nagar_verification_queue_depth", "Reports waiting for AI verification")
+VERIFICATION_IN_FLIGHT = Gauge("nagar_verification_in_flight", "Reports being verified right now")
+WEBHOOK_QUEUE_DEPTH = Gauge("nagar_webhook_queue_depth", "Incoming WhatsApp messages waiting for a reply")
+OUTBOX_PENDING = Gauge("nagar_whatsapp_outbox_pending", "WhatsApp messages queued or being sent")
+LOCATION_BUFFER_PENDING = Gauge("nagar_location_buffer_pending", "User positions waiting for the next Firebase flush")
+ALERT_DIGEST_PENDING = Gauge("nagar_alert_digest_pending_issues", "Verified issues held for an area digest")
+CHANGE_LOG_ENTRIES = Gauge("nagar_change_log_memory_entries", "Record changes held in the in-memory change log")
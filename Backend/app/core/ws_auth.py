@@ -0,0 +1,47 @@
+"""
+WebSocket admin tokens.
+
+/ws/{user_id} is open to anyone, so the user id alone must not unlock the
+admin channel (live user locations, dashboard updates). Login hands admins
+a short-lived token signed with WS_ADMIN_TOKEN_SECRET; the socket presents
+it as ?token=... and only then is the admin role looked up.
+
+With no secret configured no tokens are issued, and every socket is a
+plain user socket (the admin stream is off).
+"""
+import base64
+import hashlib
+import hmac
+import time
+from typing import Optional
+
+from app.core.config import settings
+
+
+def _sign(payload: str) -> str:
+    digest = hmac.new(settings.WS_ADMIN_TOKEN_SECRET.encode(), payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def admin_stream_enabled() -> bool:
+    return bool(settings.WS_ADMIN_TOKEN_SECRET)
+
+
+def issue_admin_token(user_id: str, ttl_s: float = None) -> Optional[str]:
+    """Token letting `user_id` open an admin socket, or None when the stream is off"""
+    if not admin_stream_enabled():
+        return None
+    expires = int(time.time() + (ttl_s if ttl_s is not None else settings.WS_ADMIN_TOKEN_TTL_S))
+    payload = f"{expires}.{user_id}"
+    return f"{payload}.{_sign(payload)}"
+
+
+def verify_admin_token(token: Optional[str], user_id: str) -> bool:
+    """True for an unexpired token issued to `user_id`"""
+    if not token or not admin_stream_enabled():
+        return False
+    payload, _, signature = token.rpartition(".")
+    expires, _, token_user = payload.partition(".")
+    if not hmac.compare_digest(signature, _sign(payload)) or token_user != user_id:
+        return False
+    return expires.isdigit() and int(expires) > time.time()
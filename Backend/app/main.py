@@ -1,10 +1,119 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from app.core.config import settings
+from app.core.json_stream import FastJSONResponse
+from app.core.log import get_logger
+from app.core.ws_auth import admin_stream_enabled
 # Import the new webhook router
-from app.api.v1.endpoints import reports, users, solutions, webhook, websocket
+from app.api.v1.endpoints import reports, users, solutions, incidents, outbox, changes, webhook, websocket
+from app.services.whatsapp_service import whatsapp_sender
+from app.services.whatsapp_outbox import whatsapp_outbox
+from app.services.webhook_processor import webhook_processor
+from app.services.firebase_service import firebase_async, firebase_service
+from app.services.gemini_service import gemini_service
+from app.services.location_buffer import location_buffer
+from app.services.verification_service import verification_pipeline
+from app.services.analysis_cache import analysis_cache
+from app.services.change_log import change_log
+from app.services.image_service import image_preprocessor
+from app.services.incident_service import incident_clusterer, load_incidents
+from app.services.alert_digest import alert_digest
+from app.services.websocket_manager import manager
+from app.services.readiness import readiness
 
-app = FastAPI(title=settings.PROJECT_NAME)
+logger = get_logger(__name__)
+
+
+async def _start_firebase():
+    if not await asyncio.to_thread(firebase_service.init):
+        raise RuntimeError(firebase_service.init_error)
+    await firebase_async.warm(settings.STARTUP_WARM_CONNECTIONS)
+
+
+async def _start_data(timeout: float):
+    if not await readiness.step("firebase", _start_firebase(), required=True, timeout=timeout):
+        return
+    # Build the in-memory indexes once; writes keep them current.
+    # If this fails, alerts rebuild the area index on first use and new
+    # reports start fresh incidents.
+    await readiness.step("indexes", firebase_async.build_indexes())
+    await readiness.step("incidents", load_incidents())
+
+
+async def _start_gemini():
+    if not await asyncio.to_thread(gemini_service.init):
+        raise RuntimeError(gemini_service.init_error)
+    await gemini_service.warm()
+
+
+async def _check_admin_stream():
+    if not admin_stream_enabled():
+        logger.error("WS_ADMIN_TOKEN_SECRET is not set: no socket gets the admin role, "
+                     "the live location stream and admin updates are off")
+        raise RuntimeError("WS_ADMIN_TOKEN_SECRET is not set")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    readiness.reset()
+    timeout = settings.STARTUP_STEP_TIMEOUT
+    warm = settings.STARTUP_WARM_CONNECTIONS
+    # Independent steps run at once; the SDK imports run off the event loop.
+    # Image workers go first so they are forked before gRPC starts threads.
+    steps = [
+        readiness.step("image_workers", image_preprocessor.warm(), timeout=timeout),
+        # Without its file the change log still works, it just keeps less history
+        readiness.step("change_log", change_log.start(), timeout=timeout),
+        _start_data(timeout),
+        readiness.step("gemini", _start_gemini(), timeout=timeout),
+        # Warm the pool so the first alert does not pay for connecting
+        readiness.step("green_api", whatsapp_sender.warm(warm), timeout=timeout),
+        # Shown as not ready in /ready until a secret is configured
+        readiness.step("admin_stream", _check_admin_stream()),
+    ]
+    if settings.GEMINI_CACHE_ENABLED:
+        steps.append(readiness.step("gemini_cache", asyncio.to_thread(analysis_cache.load), timeout=timeout))
+    await asyncio.gather(*steps)
+    # Join the cross-worker WebSocket backplane. If Redis is down the step fails
+    # and the backplane keeps reconnecting; meanwhile messages stay on this worker.
+    await readiness.step("backplane", manager.start(), timeout=timeout)
+    await location_buffer.start()
+    await verification_pipeline.start()
+    # Resumes messages a previous run did not finish sending
+    await whatsapp_outbox.start()
+    # Digests whose window was still open when the last run stopped
+    await alert_digest.start()
+    await webhook_processor.start()
+    readiness.live("backplane_connected", lambda: manager.backplane.is_connected, required=False)
+    readiness.live("location_buffer", lambda: location_buffer.is_running)
+    readiness.live("verification_workers", lambda: verification_pipeline.is_running)
+    readiness.live("whatsapp_outbox", lambda: whatsapp_outbox.is_running)
+    readiness.live("webhook_workers", lambda: webhook_processor.is_running)
+    readiness.finish()
+    yield
+    await webhook_processor.stop()
+    await verification_pipeline.stop()
+    # Send held area alerts while WhatsApp and WebSocket are still up
+    await alert_digest.stop()
+    # Unsent messages stay in the outbox for the next start
+    await whatsapp_outbox.stop()
+    analysis_cache.close()
+    image_preprocessor.shutdown()
+    # Write out buffered locations before the executor goes away
+    await location_buffer.stop()
+    await manager.stop()
+    # After the last writers have stopped, so the next start keeps the epoch
+    change_log.close()
+    # Release pooled Green-API connections
+    await whatsapp_sender.aclose()
+    firebase_async.shutdown()
+
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan, default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -12,11 +121,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the Webadmin read the list ETags and send them back in If-None-Match
+    expose_headers=["ETag"],
 )
+# Full report / user trees shrink several times; small replies are left alone
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE,
+                   compresslevel=settings.GZIP_COMPRESS_LEVEL)
 
 app.include_router(reports.router, prefix=f"{settings.API_PREFIX}/reports", tags=["reports"])
 app.include_router(users.router, prefix=f"{settings.API_PREFIX}/users", tags=["users"])
 app.include_router(solutions.router, prefix=f"{settings.API_PREFIX}/solutions", tags=["solutions"])
+app.include_router(incidents.router, prefix=f"{settings.API_PREFIX}/incidents", tags=["incidents"])
+app.include_router(outbox.router, prefix=f"{settings.API_PREFIX}/outbox", tags=["outbox"])
+app.include_router(changes.router, prefix=f"{settings.API_PREFIX}/changes", tags=["changes"])
 
 # --- NEW: WhatsApp Webhook Router ---
 # This allows Green-API to send incoming messages to your backend
@@ -27,4 +144,67 @@ app.include_router(websocket.router, prefix=f"{settings.API_PREFIX}", tags=["web
 
 @app.get("/")
 async def root():
-    return {"status": "Active", "system": "Nagar Alert Hub Backend"}
\ No newline at end of file
+    return {"status": "Active", "system": "Nagar Alert Hub Backend"}
+
+@app.get("/ready")
+async def ready(response: Response):
+    """Per-dependency readiness; 503 until every required dependency is up"""
+    report = readiness.report()
+    if not report["ready"]:
+        response.status_code = 503
+    return report
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/stats/firebase")
+async def firebase_stats():
+    """Per-method Firebase call latency"""
+    return firebase_async.latency_stats()
+
+@app.get("/stats/locations")
+async def location_stats():
+    """Coalesced location writes: received vs performed vs avoided"""
+    return location_buffer.stats()
+
+@app.get("/stats/verification")
+async def verification_stats():
+    """Background AI verification queue and outcomes"""
+    return verification_pipeline.stats()
+
+@app.get("/stats/gemini-cache")
+async def gemini_cache_stats():
+    """Gemini reply cache hit rate and model time saved"""
+    return analysis_cache.stats()
+
+@app.get("/stats/images")
+async def image_stats():
+    """Upload preprocessing counts and size reduction"""
+    return image_preprocessor.stats()
+
+@app.get("/stats/incidents")
+async def incident_stats():
+    """Open incidents and how many reports were merged into existing ones"""
+    return incident_clusterer.stats()
+
+@app.get("/stats/alerts")
+async def alert_stats():
+    """Area alerts received, merged into digests and still waiting"""
+    return alert_digest.stats()
+
+@app.get("/stats/outbox")
+async def outbox_stats():
+    """WhatsApp messages waiting, sent, retried and given up on"""
+    return await whatsapp_outbox.stats()
+
+@app.get("/stats/changes")
+async def change_log_stats():
+    """Change log sequence, entries held in memory and resyncs handed out"""
+    return change_log.stats()
+
+@app.get("/stats/webhook")
+async def webhook_stats():
+    """Incoming WhatsApp messages queued, processed and dropped as redeliveries"""
+    return webhook_processor.stats()
\ No newline at end of file
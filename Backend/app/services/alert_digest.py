@@ -0,0 +1,232 @@
+"""
+Alert Digest Scheduler
+Area alerts are held for ALERT_DIGEST_WINDOW_S after the first one, and
+everything verified in that area meanwhile goes out as one digest: one
+WhatsApp message per resident instead of one per issue. Severities in
+ALERT_DIGEST_BYPASS_SEVERITIES skip the window and are sent at once.
+
+Waiting digests are stored in the outbox database, so a restart inside the
+window sends them (and keeps their job ids) instead of losing them. A digest
+that cannot be enqueued stays stored and is retried with backoff.
+"""
+import asyncio
+import re
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.log import get_logger
+from app.core.metrics import ALERT_DIGEST_PENDING
+from app.services.alert_service import broadcast_alert_to_area, broadcast_digest_to_area
+from app.services.whatsapp_outbox import whatsapp_outbox
+
+logger = get_logger(__name__)
+
+_SEVERITY_RE = re.compile(r'"severity"\s*:\s*"(\w+)"', re.IGNORECASE)
+
+
+def report_severity(report: Optional[dict]) -> Optional[str]:
+    """Severity from a report's AI analysis reply, if the model gave one"""
+    raw = ((report or {}).get("aiAnalysis") or {}).get("raw") or ""
+    match = _SEVERITY_RE.search(raw) if isinstance(raw, str) else None
+    return match.group(1).capitalize() if match else None
+
+
+class PendingDigest:
+    """Alerts waiting for one area's window to close"""
+
+    def __init__(self, area: str, opened_at: float, job_id: str = None, issues: List[dict] = None):
+        self.area = area
+        self.opened_at = opened_at
+        # Outbox job the digest will be sent under, known before it is sent
+        self.job_id = job_id or uuid.uuid4().hex
+        self.issues: List[dict] = issues or []
+        self.task: Optional[asyncio.Task] = None
+        self.attempts = 0
+
+
+class AlertDigestScheduler:
+    """Per-area coalescing of broadcast_alert_to_area calls"""
+
+    def __init__(self, window_s: float, bypass_severities: List[str],
+                 retry_backoff: float = 5.0, retry_max_backoff: float = 300.0):
+        self.window_s = window_s
+        self.bypass_severities = {s.lower() for s in bypass_severities}
+        self.retry_backoff = retry_backoff
+        self.retry_max_backoff = retry_max_backoff
+        # normalized area -> pending digest
+        self._pending: Dict[str, PendingDigest] = {}
+        # job id -> closed digest waiting to be retried
+        self._retrying: Dict[str, PendingDigest] = {}
+        # Orders stores and window closes, so a closed digest is never stored again
+        self._store_lock = asyncio.Lock()
+        # Counters
+        self.received = 0
+        self.bypassed = 0
+        self.sends = 0
+        self.digests_sent = 0
+        self.issues_merged = 0
+
+    def _bypass(self, severity: Optional[str]) -> bool:
+        return self.window_s <= 0 or (severity or "").lower() in self.bypass_severities
+
+    async def submit(self, incident_area: str, issue_type: str, severity: str = None, additional_data: dict = None):
+        """
+        Queue an area alert. Returns the broadcast result when it is sent
+        straight away, otherwise {"status": "scheduled", "job_id", ...}.
+        """
+        self.received += 1
+        if self._bypass(severity):
+            self.bypassed += 1
+            self.sends += 1
+            return await broadcast_alert_to_area(
+                incident_area=incident_area, issue_type=issue_type,
+                additional_data={**(additional_data or {}), **({"severity": severity} if severity else {})}
+            )
+
+        key = incident_area.lower().strip()
+        async with self._store_lock:
+            digest = self._pending.get(key)
+            if digest is None:
+                digest = self._pending[key] = PendingDigest(incident_area, time.time())
+                digest.task = asyncio.create_task(self._flush_later(key, digest))
+            digest.issues.append({
+                "issue_type": issue_type,
+                "severity": severity,
+                "verified_at": int(time.time() * 1000),
+                **(additional_data or {}),
+            })
+            try:
+                await whatsapp_outbox.save_digest(digest.job_id, digest.area, digest.opened_at, digest.issues)
+            except Exception as e:
+                # Still sent when the window closes, only not restart-proof
+                logger.warning("Could not store alert digest: %s", e, extra={"job_id": digest.job_id})
+        return {
+            "status": "scheduled",
+            "job_id": digest.job_id,
+            "target_area": digest.area,
+            "pending_issues": len(digest.issues),
+            "sends_at": int((digest.opened_at + self.window_s) * 1000),
+        }
+
+    async def _flush_later(self, key: str, digest: PendingDigest):
+        await asyncio.sleep(max(0.0, digest.opened_at + self.window_s - time.time()))
+        await self._flush(key, digest)
+
+    async def _flush(self, key: str, digest: PendingDigest):
+        # Close the window under the lock, send outside it (other areas keep submitting)
+        async with self._store_lock:
+            # Alerts arriving from here on open a new window
+            if self._pending.get(key) is digest:
+                del self._pending[key]
+        await self._send(digest)
+
+    async def _send(self, digest: PendingDigest, retry: bool = True):
+        """Broadcast a closed digest; on failure keep it stored and retry later"""
+        self.sends += 1
+        try:
+            if len(digest.issues) == 1:
+                issue = digest.issues[0]
+                extra = {k: v for k, v in issue.items() if k != "issue_type"}
+                result = await broadcast_alert_to_area(digest.area, issue["issue_type"], extra, job_id=digest.job_id)
+            else:
+                result = await broadcast_digest_to_area(digest.area, digest.issues, job_id=digest.job_id)
+            if result.get("status") == "error":
+                raise RuntimeError(result.get("detail"))
+        except Exception as e:
+            digest.attempts += 1
+            if not retry:
+                # Still in the outbox database: sent on the next start
+                self._retrying.pop(digest.job_id, None)
+                logger.error("Alert digest failed: %s", e, extra={"area": digest.area, "job_id": digest.job_id})
+                return
+            delay = min(self.retry_max_backoff, self.retry_backoff * 2 ** (digest.attempts - 1))
+            logger.error("Alert digest failed, retrying: %s", e,
+                         extra={"area": digest.area, "job_id": digest.job_id, "retry_in_s": delay})
+            self._retrying[digest.job_id] = digest
+            digest.task = asyncio.create_task(self._retry_later(digest, delay))
+            return
+
+        self._retrying.pop(digest.job_id, None)
+        if len(digest.issues) > 1:
+            self.digests_sent += 1
+            self.issues_merged += len(digest.issues)
+        try:
+            # Enqueued under the same job id: re-sending after a crash here is deduplicated
+            await whatsapp_outbox.delete_digest(digest.job_id)
+        except Exception as e:
+            logger.warning("Could not delete sent alert digest: %s", e, extra={"job_id": digest.job_id})
+
+    async def _retry_later(self, digest: PendingDigest, delay: float):
+        await asyncio.sleep(delay)
+        await self._send(digest)
+
+    async def start(self):
+        """Reschedule digests a previous run stored but did not send (app startup)"""
+        restored = await whatsapp_outbox.load_digests()
+        for job_id, area, opened_at, issues in restored:
+            key = area.lower().strip()
+            if key in self._pending or job_id in self._retrying:
+                continue
+            digest = self._pending[key] = PendingDigest(area, opened_at, job_id, issues)
+            digest.task = asyncio.create_task(self._flush_later(key, digest))
+        if restored:
+            logger.info("Alert digests restored", extra={"digests": len(restored)})
+
+    def scheduled(self, job_id: str) -> Optional[dict]:
+        """Status of a digest that has not been sent yet"""
+        retrying = self._retrying.get(job_id)
+        for digest in [retrying] if retrying else self._pending.values():
+            if digest.job_id == job_id:
+                return {
+                    "job_id": job_id,
+                    "kind": "alert",
+                    "state": "retrying" if retrying else "scheduled",
+                    "target_area": digest.area,
+                    "issues": len(digest.issues),
+                    "sends_at": int((digest.opened_at + self.window_s) * 1000),
+                    "attempts": digest.attempts,
+                }
+        return None
+
+    async def stop(self):
+        """Send everything still waiting, once (shutdown); failures stay stored for the next start"""
+        pending = list(self._pending.items())
+        retrying = list(self._retrying.values())
+        tasks = [d.task for _, d in pending] + [d.task for d in retrying]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for key, digest in pending:
+            async with self._store_lock:
+                if self._pending.get(key) is digest:
+                    del self._pending[key]
+            await self._send(digest, retry=False)
+        for digest in retrying:
+            await self._send(digest, retry=False)
+
+    def stats(self) -> dict:
+        return {
+            "window_s": self.window_s,
+            "received": self.received,
+            "bypassed": self.bypassed,
+            "broadcasts": self.sends,
+            "digests_sent": self.digests_sent,
+            "issues_merged": self.issues_merged,
+            "pending_areas": len(self._pending),
+            "pending_issues": sum(len(d.issues) for d in self._pending.values()),
+            "retrying": len(self._retrying),
+        }
+
+
+alert_digest = AlertDigestScheduler(
+    window_s=settings.ALERT_DIGEST_WINDOW_S,
+    bypass_severities=settings.ALERT_DIGEST_BYPASS_SEVERITIES,
+    retry_backoff=settings.ALERT_DIGEST_RETRY_BACKOFF,
+    retry_max_backoff=settings.ALERT_DIGEST_RETRY_MAX_BACKOFF,
+)
+
+ALERT_DIGEST_PENDING.set_function(lambda: sum(
+    len(d.issues) for d in [*alert_digest._pending.values(), *alert_digest._retrying.values()]
+))
@@ -1,48 +1,103 @@
-from firebase_admin import db
-from app.services.whatsapp_service import send_green_alert
+from typing import List
+from app.core.log import get_logger
+from app.core.metrics import ALERT_BROADCAST_SECONDS, ALERT_RECIPIENTS
+from app.services.firebase_service import firebase_async
+from app.services.area_index import area_index
+from app.services.geo_index import user_geo_index
+from app.services.whatsapp_outbox import whatsapp_outbox
 from app.services.websocket_manager import manager
 import asyncio
 
-async def broadcast_alert_to_area(incident_area: str, issue_type: str, additional_data: dict = None):
+logger = get_logger(__name__)
+
+async def broadcast_alert_to_area(incident_area: str, issue_type: str, additional_data: dict = None,
+                                  job_id: str = None):
     """
-    1. Fetches all users from Firebase.
-    2. Filters them by 'area'.
-    3. Sends alerts via:
-       - WhatsApp (for SMS alerts)
+    1. Looks up residents of the area in the in-memory area index.
+    2. Sends alerts via:
+       - WhatsApp (for SMS alerts), queued in the outbox under job_id
        - WebSocket (for real-time in-app notifications)
+    Returns status "queued" with the outbox job_id: messages are sent in the
+    background, so the sent / failed counts come from GET /outbox/jobs/{job_id}.
     """
-    print(f"🔍 Broadcasting Alert for Area: {incident_area}")
-
-    # 1. Fetch all users from Firebase 'users' node
-    try:
-        ref = db.reference('users')
-        all_users = ref.get()
-    except Exception as e:
-        print(f"❌ Firebase Error: {e}")
-        return {"status": "error", "detail": str(e)}
-
-    if not all_users:
-        print("⚠️ No users found in database.")
-        return {"status": "no_users_found"}
+    logger.debug("Broadcasting alert", extra={"area": incident_area, "issue_type": issue_type})
+
+    with ALERT_BROADCAST_SECONDS.labels("area").time():
+        target_phones = await _area_residents(incident_area)
+        if isinstance(target_phones, dict):
+            return target_phones
 
-    target_phones = []
+        return await _send_alert(incident_area, issue_type, target_phones, additional_data, job_id=job_id)
+
+async def broadcast_digest_to_area(incident_area: str, issues: List[dict], job_id: str = None):
+    """
+    One message for several issues verified in the same area.
+    issues: [{"issue_type", "severity", ...additional_data}, ...]
+    """
+    logger.debug("Broadcasting digest", extra={"area": incident_area, "issues": len(issues)})
+
+    with ALERT_BROADCAST_SECONDS.labels("digest").time():
+        target_phones = await _area_residents(incident_area)
+        if isinstance(target_phones, dict):
+            return target_phones
+
+        issue_types = ", ".join(dict.fromkeys(issue["issue_type"] for issue in issues))
+        return await _send_alert(
+            incident_area, issue_types, target_phones,
+            {"digest": True, "issues": issues},
+            alert_message=_digest_message(incident_area, issues), job_id=job_id
+        )
+
+async def _area_residents(incident_area: str):
+    """Phones registered in an area, or a status dict if there is nobody to alert"""
+    # 1. Build the index once if startup could not (e.g. Firebase was down)
+    if not area_index.is_built:
+        try:
+            area_index.build(await firebase_async.get_users())
+        except Exception as e:
+            logger.error("Area index build failed: %s", e)
+            return {"status": "error", "detail": str(e)}
+
+    if not area_index.user_count():
+        logger.warning("No users found in database")
+        return {"status": "no_users_found"}
 
-    # 2. Filter Users (Case-insensitive check)
+    # 2. Residents of the area (case-insensitive match on 'area')
     # Firebase structure: users -> { "919999...": { "area": "Sector 4" } }
-    clean_incident_area = incident_area.lower().strip()
+    target_phones = area_index.phones_for(incident_area)
 
-    for phone, data in all_users.items():
-        if isinstance(data, dict):
-            user_area = data.get('area', '').lower().strip()
-            
-            # Check if areas match
-            if user_area == clean_incident_area:
-                target_phones.append(phone)
+    logger.debug("Area residents found", extra={"area": incident_area, "residents": len(target_phones)})
+    return target_phones
 
-    print(f"📢 Found {len(target_phones)} residents in {incident_area}")
+async def broadcast_alert_to_radius(
+    latitude: float,
+    longitude: float,
+    radius_m: float,
+    issue_type: str,
+    incident_area: str,
+    additional_data: dict = None
+):
+    """
+    Same as broadcast_alert_to_area, but targets every user whose last known
+    position is within radius_m of the incident. WebSocket subscribers of
+    incident_area are alerted as well.
+    """
+    with ALERT_BROADCAST_SECONDS.labels("radius").time():
+        # Users report location.latitude/longitude via /users/update-location
+        nearby = user_geo_index.within_radius(latitude, longitude, radius_m)
+        target_phones = [user_id for user_id, *_ in nearby]
+        logger.debug("Broadcasting radius alert", extra={
+            "latitude": latitude, "longitude": longitude, "radius_m": radius_m, "users": len(target_phones)
+        })
+
+        return await _send_alert(
+            incident_area, issue_type, target_phones,
+            {"radius_m": radius_m, "center": {"lat": latitude, "lng": longitude}, **(additional_data or {})},
+            websocket_users=target_phones
+        )
 
-    # 3. Construct the Alert Message
-    alert_message = (
+def _alert_message(incident_area: str, issue_type: str) -> str:
+    return (
         f"🚨 *NAGAR ALERT: {incident_area.upper()}* 🚨\n\n"
         f"⚠️ *Issue Verified:* {issue_type}\n"
         f"📍 *Location:* {incident_area} (AI Analysis Verified)\n\n"
@@ -51,7 +106,33 @@ async def broadcast_alert_to_area(incident_area: str, issue_type: str, additiona
         f"— Nagar Alert Authority"
     )
 
-    # 4. Prepare Real-Time Alert Data for WebSocket
+def _digest_message(incident_area: str, issues: List[dict]) -> str:
+    lines = "\n".join(
+        f"{i}. {issue['issue_type']}" + (f" ({issue['severity']})" if issue.get("severity") else "")
+        for i, issue in enumerate(issues, 1)
+    )
+    return (
+        f"🚨 *NAGAR ALERT: {incident_area.upper()}* 🚨\n\n"
+        f"⚠️ *{len(issues)} Issues Verified:*\n{lines}\n"
+        f"📍 *Location:* {incident_area}\n\n"
+        f"ℹ️ Authorities have been notified and teams have been dispatched.\n"
+        f"Please proceed with caution.\n\n"
+        f"— Nagar Alert Authority"
+    )
+
+async def _send_alert(
+    incident_area: str,
+    issue_type: str,
+    target_phones: List[str],
+    additional_data: dict = None,
+    websocket_users: List[str] = None,
+    alert_message: str = None,
+    job_id: str = None
+):
+    # 1. Construct the Alert Message
+    alert_message = alert_message or _alert_message(incident_area, issue_type)
+
+    # 2. Prepare Real-Time Alert Data for WebSocket
     websocket_alert = {
         "area": incident_area,
         "issue_type": issue_type,
@@ -60,21 +141,19 @@ async def broadcast_alert_to_area(incident_area: str, issue_type: str, additiona
         **(additional_data or {})
     }
 
-    # 5. Send Messages (WhatsApp)
-    sent_count = 0
-    for phone in target_phones:
-        success = send_green_alert(phone, alert_message)
-        if success:
-            sent_count += 1
+    # 3. Queue Messages (WhatsApp) - the outbox sends them in the background
+    job = await whatsapp_outbox.enqueue("alert", target_phones, alert_message, job_id=job_id, meta=incident_area)
+    ALERT_RECIPIENTS.labels("whatsapp").inc(job["queued"])
 
-    # 6. Broadcast via WebSocket (Real-time in-app notifications)
-    print(f"📡 Broadcasting to {manager.get_connected_users_count()} connected users via WebSocket")
-    await manager.broadcast_alert(websocket_alert, target_area=incident_area)
+    # 4. Broadcast via WebSocket (Real-time in-app notifications)
+    await manager.broadcast_alert(websocket_alert, target_area=incident_area, target_users=websocket_users)
+    logger.info("Alert queued", extra={"area": incident_area, "job_id": job["job_id"], "phones": job["queued"]})
 
     return {
-        "status": "completed", 
+        "status": "queued",
+        "job_id": job["job_id"],
         "target_area": incident_area,
         "users_found": len(target_phones),
-        "whatsapp_messages_sent": sent_count,
+        "whatsapp_messages_queued": job["queued"],
         "websocket_clients": manager.get_connected_users_count()
-    }
\ No newline at end of file
+    }
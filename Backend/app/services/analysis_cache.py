@@ -0,0 +1,248 @@
+"""
+Gemini Analysis Cache
+Citizens often send the same photo (or near-identical shots of the same
+pothole) more than once. Results are cached by the photo's SHA-256 and, when
+Pillow is installed, by a 64-bit perceptual dHash so close matches (Hamming
+distance <= GEMINI_CACHE_MAX_DISTANCE) are hits too.
+
+LRU + TTL in memory, mirrored to a local SQLite file so it survives restarts.
+"""
+import hashlib
+import io
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.log import get_logger
+
+try:
+    from PIL import Image
+except ImportError:  # Optional: without Pillow only exact duplicates are matched
+    Image = None
+
+logger = get_logger(__name__)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def image_dhash(image_bytes: bytes) -> Optional[int]:
+    """64-bit difference hash of an image, or None if it can't be computed"""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            # JPEG: let the decoder skip straight to a small scale
+            img.draft("L", (64, 64))
+            pixels = list(img.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    except Exception:
+        return None
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+
+def _band_slices(count: int) -> List[Tuple[int, int]]:
+    """Split 64 bits into `count` (shift, mask) bands of near-equal width"""
+    slices, shift = [], 0
+    for i in range(count):
+        width = 64 // count + (1 if i < 64 % count else 0)
+        slices.append((shift, (1 << width) - 1))
+        shift += width
+    return slices
+
+
+class AnalysisCache:
+    """
+    Exact + perceptual cache of model replies, keyed per prompt.
+
+    Near-duplicate lookup uses band indexing: the dHash is split into
+    max_distance + 1 bands, and any hash within max_distance bits must
+    match at least one band exactly, so only those candidates are compared.
+    """
+
+    def __init__(self, path: str, maxsize: int, ttl: float, max_distance: int):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self._bands = _band_slices(max_distance + 1) if max_distance > 0 else []
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # (prompt_hash, content_hash) -> entry dict, least recently used first
+        self._entries: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+        # (prompt_hash, band_no, band_value) -> keys
+        self._band_index: Dict[Tuple[str, int, int], Set[Tuple[str, str]]] = {}
+        # Counters
+        self.lookups = 0
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.latency_saved_ms = 0.0
+
+    # --- persistence ---
+    def _db(self) -> sqlite3.Connection:
+        """Open the SQLite file and load live entries (first use)"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analyses ("
+                " prompt_hash TEXT, content_hash TEXT, dhash TEXT, result TEXT,"
+                " latency_ms REAL, created_at REAL, last_used REAL,"
+                " PRIMARY KEY (prompt_hash, content_hash))"
+            )
+            conn.execute("DELETE FROM analyses WHERE created_at < ?", (time.time() - self.ttl,))
+            rows = conn.execute(
+                "SELECT prompt_hash, content_hash, dhash, result, latency_ms, created_at"
+                " FROM analyses ORDER BY last_used"
+            ).fetchall()
+            conn.commit()
+            self._conn = conn
+            for prompt_hash, chash, dhash, result, latency_ms, created_at in rows[-self.maxsize:]:
+                self._add((prompt_hash, chash), {
+                    "dhash": int(dhash, 16) if dhash else None,
+                    "result": json.loads(result),
+                    "latency_ms": latency_ms,
+                    "created_at": created_at,
+                })
+            if rows:
+                logger.info("Gemini cache loaded", extra={"entries": len(self._entries), "path": self.path})
+        return self._conn
+
+    def load(self):
+        """Open the file and load entries now rather than on the first lookup (app startup)"""
+        with self._lock:
+            self._db()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # --- in-memory index ---
+    def _band_keys(self, prompt_hash: str, dhash: int):
+        return [(prompt_hash, i, (dhash >> shift) & mask) for i, (shift, mask) in enumerate(self._bands)]
+
+    def _add(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if entry["dhash"] is not None:
+            for band_key in self._band_keys(key[0], entry["dhash"]):
+                self._band_index.setdefault(band_key, set()).add(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        if entry["dhash"] is not None:
+            for band_key in self._band_keys(key[0], entry["dhash"]):
+                bucket = self._band_index.get(band_key)
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del self._band_index[band_key]
+        self._conn.execute("DELETE FROM analyses WHERE prompt_hash = ? AND content_hash = ?", key)
+
+    def _live(self, key) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is not None and entry["created_at"] < time.time() - self.ttl:
+            self._remove(key)
+            self._conn.commit()
+            return None
+        return entry
+
+    def _nearest(self, prompt_hash: str, dhash: int) -> Optional[Tuple[str, str]]:
+        candidates = set()
+        for band_key in self._band_keys(prompt_hash, dhash):
+            candidates.update(self._band_index.get(band_key, ()))
+        best, best_distance = None, self.max_distance + 1
+        for key in candidates:
+            distance = (self._entries[key]["dhash"] ^ dhash).bit_count()
+            if distance < best_distance:
+                best, best_distance = key, distance
+        return best
+
+    # --- public API (blocking; call off the event loop) ---
+    @staticmethod
+    def fingerprint(image_bytes: bytes) -> Tuple[str, Optional[int]]:
+        """(sha256, dhash) of a photo"""
+        return content_hash(image_bytes), image_dhash(image_bytes)
+
+    def get(self, prompt: str, fingerprint: Tuple[str, Optional[int]]) -> Optional[dict]:
+        """Cached reply for this prompt and photo (or a near-identical one)"""
+        prompt_hash = content_hash(prompt.encode())
+        chash, dhash = fingerprint
+        with self._lock:
+            self._db()
+            self.lookups += 1
+            key = (prompt_hash, chash)
+            kind = "exact"
+            entry = self._live(key)
+            if entry is None and dhash is not None and self._bands:
+                key = self._nearest(prompt_hash, dhash)
+                kind = "similar"
+                entry = self._live(key) if key else None
+            if entry is None:
+                return None
+
+            self._entries.move_to_end(key)
+            self._conn.execute(
+                "UPDATE analyses SET last_used = ? WHERE prompt_hash = ? AND content_hash = ?",
+                (time.time(), *key),
+            )
+            self._conn.commit()
+            if kind == "exact":
+                self.exact_hits += 1
+            else:
+                self.similar_hits += 1
+            self.latency_saved_ms += entry["latency_ms"]
+            return {**entry["result"], "cache": kind}
+
+    def put(self, prompt: str, fingerprint: Tuple[str, Optional[int]], result: dict, latency_ms: float):
+        """Remember a successful reply"""
+        prompt_hash = content_hash(prompt.encode())
+        chash, dhash = fingerprint
+        key = (prompt_hash, chash)
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            self._remove(key)
+            self._add(key, {"dhash": dhash, "result": result, "latency_ms": latency_ms, "created_at": now})
+            conn.execute(
+                "INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (prompt_hash, chash, format(dhash, "016x") if dhash is not None else None,
+                 json.dumps(result), latency_ms, now, now),
+            )
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+            conn.commit()
+
+    def stats(self) -> dict:
+        hits = self.exact_hits + self.similar_hits
+        return {
+            "entries": len(self._entries),
+            "lookups": self.lookups,
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.lookups - hits,
+            "hit_rate": round(hits / self.lookups, 3) if self.lookups else 0.0,
+            "latency_saved_ms": round(self.latency_saved_ms, 1),
+            "perceptual_matching": Image is not None and bool(self._bands),
+            "max_distance": self.max_distance,
+        }
+
+
+analysis_cache = AnalysisCache(
+    path=settings.GEMINI_CACHE_PATH,
+    maxsize=settings.GEMINI_CACHE_MAXSIZE,
+    ttl=settings.GEMINI_CACHE_TTL,
+    max_distance=settings.GEMINI_CACHE_MAX_DISTANCE,
+)
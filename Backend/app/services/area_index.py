@@ -0,0 +1,131 @@
+"""
+Area -> Recipients Index
+Keeps normalized area names mapped to user keys (phone numbers) in memory,
+so alert targeting costs O(recipients) instead of downloading the whole
+'users' tree on every broadcast.
+"""
+import threading
+from typing import Dict, List, Set
+
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
+
+
+def normalize_area(area) -> str:
+    """Same matching rule the broadcast always used: case-insensitive, trimmed"""
+    if not isinstance(area, str):
+        return ""
+    return area.lower().strip()
+
+
+class AreaIndex:
+    """Inverted index from normalized area to the user keys living there"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # normalized area -> user keys
+        self._by_area: Dict[str, Set[str]] = {}
+        # user key -> normalized area (needed to move users between areas)
+        self._area_of: Dict[str, str] = {}
+        self.is_built = False
+
+    @staticmethod
+    def _collect(all_users: dict):
+        by_area: Dict[str, Set[str]] = {}
+        area_of: Dict[str, str] = {}
+        for user_id, data in (all_users or {}).items():
+            if not isinstance(data, dict):
+                continue
+            area = normalize_area(data.get('area', ''))
+            area_of[user_id] = area
+            by_area.setdefault(area, set()).add(user_id)
+        return by_area, area_of
+
+    def build(self, all_users: dict):
+        """(Re)build the whole index from a users snapshot"""
+        by_area, area_of = self._collect(all_users)
+        with self._lock:
+            self._by_area = by_area
+            self._area_of = area_of
+            self.is_built = True
+        logger.info("Area index built", extra={"users": len(area_of), "areas": len(by_area)})
+
+    def update_user(self, user_id: str, user_data: dict):
+        """
+        Apply a write to the index.
+        Partial updates without an 'area' key only register the user.
+        """
+        if not user_id or not isinstance(user_data, dict):
+            return
+        with self._lock:
+            old_area = self._area_of.get(user_id)
+            if 'area' in user_data:
+                new_area = normalize_area(user_data.get('area'))
+            elif old_area is None:
+                new_area = ""
+            else:
+                return
+
+            if old_area == new_area:
+                return
+            if old_area is not None:
+                members = self._by_area.get(old_area)
+                if members is not None:
+                    members.discard(user_id)
+                    if not members:
+                        del self._by_area[old_area]
+            self._area_of[user_id] = new_area
+            self._by_area.setdefault(new_area, set()).add(user_id)
+
+    def remove_user(self, user_id: str):
+        with self._lock:
+            area = self._area_of.pop(user_id, None)
+            if area is not None:
+                members = self._by_area.get(area)
+                if members is not None:
+                    members.discard(user_id)
+                    if not members:
+                        del self._by_area[area]
+
+    def phones_for(self, area: str) -> List[str]:
+        """User keys (phone numbers) registered in an area"""
+        clean_area = normalize_area(area)
+        if not clean_area:
+            return []
+        with self._lock:
+            return list(self._by_area.get(clean_area, ()))
+
+    def user_count(self) -> int:
+        return len(self._area_of)
+
+    def check(self, all_users: dict) -> dict:
+        """Compare the live index against a fresh users snapshot"""
+        _, expected = self._collect(all_users)
+        with self._lock:
+            actual = dict(self._area_of)
+
+        missing = [uid for uid in expected if uid not in actual]
+        stale = [uid for uid in actual if uid not in expected]
+        mismatched = [uid for uid, area in expected.items() if uid in actual and actual[uid] != area]
+
+        return {
+            "consistent": not (missing or stale or mismatched),
+            "users_in_database": len(expected),
+            "users_indexed": len(actual),
+            "missing": missing,
+            "stale": stale,
+            "mismatched_area": mismatched,
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "built": self.is_built,
+                "users": len(self._area_of),
+                "areas": len(self._by_area),
+            }
+
+
+# Global area index instance
+area_index = AreaIndex()
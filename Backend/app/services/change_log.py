@@ -0,0 +1,337 @@
+"""
+Change Log
+Sequence-numbered log of creates and updates to reports, solutions and users,
+fed by FirebaseService writes. Clients keep the last `next` they were given
+and ask GET /changes?since=<seq>&epoch=<epoch> for what happened after it,
+instead of refetching whole trees.
+
+- The newest changes sit in an in-memory ring. A later change to the same
+  record replaces its earlier entry (data merged, new sequence number), so
+  the ring holds one entry per recently changed record and a busy record
+  (a moving user) cannot push everything else out.
+- Entries evicted from the ring are spilled to a local SQLite file, which
+  keeps the last CHANGE_LOG_DISK_ENTRIES of them.
+- When a client's sequence is older than anything kept, or belongs to
+  another epoch (a crash, another worker), the answer is `resync`: refetch
+  the lists, then continue from the `next` returned alongside.
+
+Each worker keeps its own log: sequence numbers are per worker, so workers
+never share a file or an epoch. A worker takes the first free slot file
+(CHANGE_LOG_PATH with ".0", ".1", ... before the extension), held with an
+exclusive SQLite lock while it runs. A client sent to another worker sees a
+different epoch and resyncs instead of skipping changes.
+
+The epoch survives a clean restart (the ring is spilled on shutdown), not a
+crash. Passwords are never logged.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.log import get_logger
+from app.core.metrics import CHANGE_LOG_ENTRIES
+from app.services.collection_versions import TRACKED_COLLECTIONS
+
+logger = get_logger(__name__)
+
+CREATE = "create"
+UPDATE = "update"
+# Never copied into the log
+PRIVATE_FIELDS = {"users": {"password"}}
+# Most workers (slot files) sharing one CHANGE_LOG_PATH
+MAX_SLOTS = 64
+
+
+def _resolve(value, now_ms: int):
+    """Replace Firebase server timestamps with the local clock"""
+    if isinstance(value, dict):
+        if value.get(".sv") == "timestamp":
+            return now_ms
+        return {k: _resolve(v, now_ms) for k, v in value.items()}
+    return value
+
+
+def _set_path(record: dict, path: str, value):
+    """Set a slash-separated field path inside a record (copying nested dicts)"""
+    head, _, rest = path.partition('/')
+    if not rest:
+        record[head] = value
+        return
+    child = record.get(head)
+    child = dict(child) if isinstance(child, dict) else {}
+    _set_path(child, rest, value)
+    record[head] = child
+
+
+def _merge_fields(old: dict, new: dict) -> dict:
+    """
+    Apply `new` on top of `old` the way a Firebase update would, where keys
+    may be slash paths ("aiAnalysis/score").
+    """
+    merged = dict(old)
+    for key, value in new.items():
+        for existing in [k for k in merged if k == key or k.startswith(key + '/')]:
+            del merged[existing]
+        parent = next((k for k in merged if key.startswith(k + '/')), None)
+        if parent is not None and isinstance(merged[parent], dict):
+            nested = dict(merged[parent])
+            _set_path(nested, key[len(parent) + 1:], value)
+            merged[parent] = nested
+        else:
+            merged[key] = value
+    return merged
+
+
+def _combine(older: dict, newer: dict) -> dict:
+    """One entry standing for two changes to the same record, `newer` last"""
+    if newer["op"] == CREATE:
+        # A full write replaces whatever came before
+        return newer
+    return {**newer, "op": older["op"], "data": _merge_fields(older["data"], newer["data"])}
+
+
+class ChangeLog:
+    """In-memory ring of the newest record changes, spilling to SQLite"""
+
+    def __init__(self, path: str, memory_entries: int, disk_entries: int,
+                 collections: Iterable[str] = TRACKED_COLLECTIONS):
+        self.path = path
+        self.memory_entries = max(1, memory_entries)
+        self.disk_entries = max(0, disk_entries)
+        self.collections = set(collections)
+        self.epoch = uuid.uuid4().hex[:12]
+        # Slot file this worker holds (None until started, or in memory only)
+        self.slot: Optional[int] = None
+        # Last sequence number handed out
+        self.seq = 0
+        # Changes at or below this sequence may be gone (clients behind it resync)
+        self.floor = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # (collection, record_id) -> entry, oldest sequence first
+        self._ring: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+        # Called with new changes after a local write (set by the WebSocket manager)
+        self.on_record: Optional[Callable[[List[dict]], None]] = None
+        # Counters
+        self.recorded = 0
+        self.coalesced = 0
+        self.spilled = 0
+        self.resyncs = 0
+
+    # --- recording ---
+    def record(self, collection: str, record_id: str, op: str, data: dict):
+        """Log one create (full record) or update (changed fields) of a record"""
+        self.record_many([(collection, record_id, op, data)])
+
+    def record_paths(self, updates: dict):
+        """Log the record changes of a multi-path update ({"reports/<id>/status": ...})"""
+        changes: Dict[Tuple[str, str], list] = {}
+        for path, value in updates.items():
+            parts = path.strip('/').split('/', 2)
+            if len(parts) < 2 or parts[0] not in self.collections:
+                continue
+            key = (parts[0], parts[1])
+            if len(parts) == 2:
+                changes[key] = [parts[0], parts[1], CREATE, value if isinstance(value, dict) else {}]
+            else:
+                change = changes.setdefault(key, [parts[0], parts[1], UPDATE, {}])
+                change[3][parts[2]] = value
+        self.record_many(tuple(change) for change in changes.values())
+
+    def record_many(self, changes: Iterable[tuple], share: bool = True):
+        """Log (collection, record_id, op, data) changes; `share=False` for ones relayed by other workers"""
+        now_ms = int(time.time() * 1000)
+        entries = []
+        for collection, record_id, op, data in changes:
+            if collection not in self.collections:
+                continue
+            private = PRIVATE_FIELDS.get(collection, ())
+            data = {k: _resolve(v, now_ms) for k, v in (data or {}).items() if k not in private}
+            entries.append({"collection": collection, "id": record_id, "op": op, "data": data})
+        if not entries:
+            return
+        with self._lock:
+            for entry in entries:
+                self._append(entry)
+            overflow = len(self._ring) - self.memory_entries
+            if overflow > 0:
+                # Spill a tenth of the ring at once so the disk sees batches
+                self._spill(max(overflow, self.memory_entries // 10))
+        if share and self.on_record is not None:
+            self.on_record(entries)
+
+    def _append(self, change: dict):
+        self.seq += 1
+        self.recorded += 1
+        entry = {"seq": self.seq, **change}
+        key = (entry["collection"], entry["id"])
+        previous = self._ring.pop(key, None)
+        if previous is not None:
+            entry = _combine(previous, entry)
+            self.coalesced += 1
+        self._ring[key] = entry
+
+    def _spill(self, count: int):
+        """Move the oldest `count` ring entries to disk (or drop them if there is no file)"""
+        count = min(count, len(self._ring))
+        entries = [self._ring.popitem(last=False)[1] for _ in range(count)]
+        if not entries:
+            return
+        if self._conn is None or not self.disk_entries:
+            self.floor = max(self.floor, entries[-1]["seq"])
+            return
+        try:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO changes (seq, collection, record_id, op, data) VALUES (?, ?, ?, ?, ?)",
+                [(e["seq"], e["collection"], e["id"], e["op"], json.dumps(e["data"])) for e in entries],
+            )
+            cutoff = self._conn.execute(
+                "SELECT seq FROM changes ORDER BY seq DESC LIMIT 1 OFFSET ?", (self.disk_entries,)
+            ).fetchone()
+            if cutoff is not None:
+                self._conn.execute("DELETE FROM changes WHERE seq <= ?", (cutoff[0],))
+                self.floor = max(self.floor, cutoff[0])
+            self._conn.commit()
+            self.spilled += len(entries)
+        except sqlite3.Error as e:
+            self.floor = max(self.floor, entries[-1]["seq"])
+            logger.warning("Change log spill failed, %d changes dropped: %s", len(entries), e)
+
+    # --- reading ---
+    def changes(self, since: Optional[int], epoch: Optional[str] = None, limit: int = 500) -> dict:
+        """
+        Changes after `since`, oldest first, one entry per record.
+        `resync` is True when they cannot be given (no `since`, another
+        epoch, `since` older than the log); `next` is where to ask from next.
+        """
+        with self._lock:
+            head = self.seq
+            if since is None or (epoch is not None and epoch != self.epoch) \
+                    or since < self.floor or since > head:
+                self.resyncs += 1
+                return {"epoch": self.epoch, "next": head, "resync": True, "has_more": False, "changes": []}
+            recent = []
+            for entry in reversed(self._ring.values()):
+                if entry["seq"] <= since:
+                    break
+                recent.append(entry)
+            recent.reverse()
+            # Everything on disk is older than everything in the ring
+            oldest_in_memory = next(iter(self._ring.values()))["seq"] if self._ring else head + 1
+            older = []
+            if self._conn is not None and since + 1 < oldest_in_memory:
+                rows = self._conn.execute(
+                    "SELECT seq, collection, record_id, op, data FROM changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                    (since, limit),
+                ).fetchall()
+                older = [{"seq": seq, "collection": c, "id": rid, "op": op, "data": json.loads(data)}
+                         for seq, c, rid, op, data in rows]
+
+        entries = (older + recent)[:limit]
+        has_more = len(older) + len(recent) > limit or (len(older) == limit and entries[-1]["seq"] < head)
+        compacted: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+        for entry in entries:
+            key = (entry["collection"], entry["id"])
+            previous = compacted.pop(key, None)
+            compacted[key] = entry if previous is None else _combine(previous, entry)
+        return {
+            "epoch": self.epoch,
+            "next": entries[-1]["seq"] if has_more else head,
+            "resync": False,
+            "has_more": has_more,
+            "changes": list(compacted.values()),
+        }
+
+    # --- lifecycle ---
+    def slot_path(self, slot: int) -> str:
+        root, ext = os.path.splitext(self.path)
+        return f"{root}.{slot}{ext}"
+
+    def _lock_slot(self) -> Tuple[sqlite3.Connection, Optional[int]]:
+        """Open the first slot file no other worker holds, and keep it locked"""
+        if self.path == ":memory:":
+            return sqlite3.connect(self.path, check_same_thread=False), None
+        for slot in range(MAX_SLOTS):
+            conn = sqlite3.connect(self.slot_path(slot), check_same_thread=False, timeout=0)
+            try:
+                # Exclusive locking mode: the lock taken here is held until close
+                conn.execute("PRAGMA locking_mode=EXCLUSIVE")
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("BEGIN EXCLUSIVE")
+                conn.commit()
+                return conn, slot
+            except sqlite3.OperationalError:
+                conn.close()
+        raise RuntimeError(f"All {MAX_SLOTS} change log slots are in use")
+
+    def _open(self):
+        conn, slot = self._lock_slot()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS changes ("
+            " seq INTEGER PRIMARY KEY, collection TEXT, record_id TEXT, op TEXT, data TEXT)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        with self._lock:
+            if meta.get("clean") == "1" and not self._ring:
+                # Clean shutdown: the whole log is on disk, carry on from it
+                self.epoch, self.seq, self.floor = meta["epoch"], int(meta["seq"]), int(meta["floor"])
+                logger.info("Change log resumed", extra={"epoch": self.epoch, "seq": self.seq, "slot": slot})
+            else:
+                # First run or a crash: the tail may be lost, so start a new epoch
+                conn.execute("DELETE FROM changes")
+            self._set_meta(conn, clean="0")
+            self._conn = conn
+            self.slot = slot
+
+    @staticmethod
+    def _set_meta(conn: sqlite3.Connection, **values):
+        conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                         [(k, str(v)) for k, v in values.items()])
+        conn.commit()
+
+    async def start(self):
+        """Open the spill file (app startup); until then overflow is dropped"""
+        if self._conn is None:
+            await asyncio.to_thread(self._open)
+
+    def close(self):
+        """Spill the ring and mark the file clean, so the next start keeps the epoch"""
+        with self._lock:
+            if self._conn is None:
+                return
+            self._spill(len(self._ring))
+            self._set_meta(self._conn, epoch=self.epoch, seq=self.seq, floor=self.floor, clean="1")
+            self._conn.close()
+            self._conn = None
+            self.slot = None
+
+    def stats(self) -> dict:
+        return {
+            "epoch": self.epoch,
+            "slot": self.slot,
+            "seq": self.seq,
+            "floor": self.floor,
+            "in_memory": len(self._ring),
+            "recorded": self.recorded,
+            "coalesced": self.coalesced,
+            "spilled": self.spilled,
+            "resyncs": self.resyncs,
+        }
+
+
+# Global change log instance
+change_log = ChangeLog(
+    path=settings.CHANGE_LOG_PATH,
+    memory_entries=settings.CHANGE_LOG_MEMORY_ENTRIES,
+    disk_entries=settings.CHANGE_LOG_DISK_ENTRIES,
+)
+
+CHANGE_LOG_ENTRIES.set_function(lambda: len(change_log._ring))
@@ -0,0 +1,111 @@
+"""
+Collection Versions
+A write counter per collection (reports, solutions, users), bumped by every
+write that goes through FirebaseService. The admin list endpoints turn it
+into an ETag, so a dashboard poll that finds nothing changed gets a 304
+without reading Firebase at all.
+
+User positions written by the location buffer bump their own "locations"
+counter, not "users": devices report every few seconds, and the user list
+would otherwise never answer 304. The live map follows positions over the
+WebSocket location stream instead.
+
+ETags are weak (W/): the same version is served plain or gzipped, and
+/users/active may carry slightly older positions. They include the
+normalized query string, so every filter and page has its own tag.
+
+Counters live in memory. Each start picks a new epoch, so an ETag handed out
+by a previous run never matches. With several workers, bumps are shared over
+the WebSocket backplane, so no worker answers 304 for data another worker
+changed.
+"""
+import hashlib
+import threading
+import uuid
+from typing import Callable, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from app.core.metrics import CONDITIONAL_GETS
+
+TRACKED_COLLECTIONS = ("reports", "solutions", "users")
+# Versioned apart from their user records (see above)
+LOCATIONS = "locations"
+
+
+def _path_collection(path: str) -> str:
+    """Version a multi-path update key belongs to ("users/<id>/location" -> locations)"""
+    parts = path.strip('/').split('/', 3)
+    if parts[0] == "users" and len(parts) > 2 and parts[2] == "location":
+        return LOCATIONS
+    return parts[0]
+
+
+class CollectionVersions:
+    """Per-collection version counters behind the list endpoint ETags"""
+
+    def __init__(self, collections: Iterable[str] = TRACKED_COLLECTIONS + (LOCATIONS,)):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._versions = dict.fromkeys(collections, 0)
+        # Writes run in executor threads
+        self._lock = threading.Lock()
+        # Called with the bumped names after a local write (set by the WebSocket manager)
+        self.on_bump: Optional[Callable[[List[str]], None]] = None
+
+    def bump(self, collections: Iterable[str], share: bool = True):
+        """Mark collections as changed (unknown names are ignored)"""
+        names = sorted({name for name in collections if name in self._versions})
+        if not names:
+            return
+        with self._lock:
+            for name in names:
+                self._versions[name] += 1
+        if share and self.on_bump is not None:
+            self.on_bump(names)
+
+    def bump_paths(self, paths: Iterable[str]):
+        """Bump the collections touched by a multi-path update"""
+        self.bump(_path_collection(path) for path in paths)
+
+    def version(self, collection: str) -> int:
+        return self._versions[collection]
+
+    def etag(self, collection: str, query: Iterable[Tuple[str, str]] = ()) -> str:
+        """
+        Weak ETag for the current state of a collection as seen through one
+        query (request.query_params.multi_items(); order does not matter).
+        Read it before fetching the data: a write landing in between then
+        changes the next ETag instead of hiding behind this one.
+        """
+        tag = f"{collection}-{self.epoch}-{self._versions[collection]}"
+        normalized = urlencode(sorted(query))
+        if normalized:
+            tag += "-" + hashlib.sha1(normalized.encode()).hexdigest()[:12]
+        return f'W/"{tag}"'
+
+    def not_modified(self, collection: str, etag: str, if_none_match: Optional[str]) -> bool:
+        """True when the client already holds this version (If-None-Match)"""
+        matched = _etag_listed(etag, if_none_match)
+        CONDITIONAL_GETS.labels(collection, "not_modified" if matched else "full").inc()
+        return matched
+
+    def stats(self) -> dict:
+        return {"epoch": self.epoch, "versions": dict(self._versions)}
+
+
+def _etag_listed(etag: str, if_none_match: Optional[str]) -> bool:
+    # If-None-Match uses the weak comparison (RFC 9110 13.1.2)
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def cache_headers(etag: str) -> dict:
+    """ETag plus no-cache: browsers keep the body but revalidate every poll"""
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+
+# Global versions instance
+collection_versions = CollectionVersions()
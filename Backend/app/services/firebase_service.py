@@ -1,27 +1,110 @@
-import firebase_admin
-from firebase_admin import credentials, db
 from app.core.config import settings
+from app.core.log import get_logger
+from app.core.metrics import FIREBASE_CALL_SECONDS
+from app.services.area_index import area_index
+from app.services.cache import TTLCache
+from app.services.change_log import change_log, CREATE, UPDATE
+from app.services.collection_versions import collection_versions
+from app.services.geo_index import report_geo_index, user_geo_index, report_point, user_point
+from app.services.report_index import user_report_index
+from app.services.report_stats import report_stats
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import base64
+import functools
 import json
 import os
+import random
+import threading
+import time
+from typing import Iterable
+
+logger = get_logger(__name__)
+
+PUSH_CHARS = '-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz'
+_push_lock = threading.Lock()
+_last_push_time = 0
+_last_rand_chars = [0] * 12
+
+
+def generate_push_id() -> str:
+    """
+    Chronologically ordered key in the same format as Firebase push().
+    Generated locally so a new record can be written in the same
+    multi-path update as related changes (and without an extra round trip).
+    """
+    global _last_push_time
+    with _push_lock:
+        now = int(time.time() * 1000)
+        duplicate_time = now == _last_push_time
+        _last_push_time = now
+
+        if not duplicate_time:
+            for i in range(12):
+                _last_rand_chars[i] = random.randrange(64)
+        else:
+            # Same millisecond: increment the random part to keep ordering
+            i = 11
+            while i >= 0 and _last_rand_chars[i] == 63:
+                _last_rand_chars[i] = 0
+                i -= 1
+            if i >= 0:
+                _last_rand_chars[i] += 1
+
+        time_chars = []
+        for _ in range(8):
+            time_chars.append(PUSH_CHARS[now % 64])
+            now //= 64
+        return ''.join(reversed(time_chars)) + ''.join(PUSH_CHARS[c] for c in _last_rand_chars)
 
 class FirebaseService:
     def __init__(self):
-        if not firebase_admin._apps:
-            try:
-                if os.path.exists(settings.FIREBASE_CREDENTIALS_PATH):
-                    cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS_PATH)
-                    firebase_admin.initialize_app(cred, {
-                        'databaseURL': settings.FIREBASE_DATABASE_URL
-                    })
-                    self.db = db
-                    print("Firebase Admin Initialized")
-                else:
-                    self.db = None
-            except Exception as e:
-                print(f"Error initializing Firebase: {e}")
-                self.db = None
-        else:
+        # Read-through cache of single user records (invalidated by save_user)
+        self.user_cache = TTLCache(maxsize=settings.USER_CACHE_MAXSIZE, ttl=settings.USER_CACHE_TTL)
+        # Secondary index: mobile number -> user key
+        self._mobile_index = {}
+        self._mobile_index_lock = threading.Lock()
+        self._warned_missing_mobile_index = False
+        # (path, field) pairs we already warned about a missing .indexOn
+        self._warned_unindexed = set()
+        # Connected by init() at app startup (firebase_admin is slow to import)
+        self.db = None
+        self.init_error = None
+
+    def init(self) -> bool:
+        """
+        Import firebase_admin and connect with the service account (blocking).
+        A db set beforehand (e.g. a local stand-in) is kept as is.
+        """
+        if self.db is not None:
+            return True
+        try:
+            import firebase_admin
+            from firebase_admin import credentials, db
+            if not firebase_admin._apps:
+                if not os.path.exists(settings.FIREBASE_CREDENTIALS_PATH):
+                    self.init_error = f"Credentials file {settings.FIREBASE_CREDENTIALS_PATH} not found"
+                    logger.error("Firebase not initialized: %s", self.init_error)
+                    return False
+                cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS_PATH)
+                firebase_admin.initialize_app(cred, {
+                    'databaseURL': settings.FIREBASE_DATABASE_URL
+                })
+                logger.info("Firebase Admin initialized")
             self.db = db
+            self.init_error = None
+            return True
+        except Exception as e:
+            self.init_error = str(e)
+            logger.error("Error initializing Firebase: %s", e)
+            return False
+
+    def ping(self):
+        """One cheap round trip (a path that holds no data); raises if Firebase is unreachable"""
+        if not self.db:
+            raise RuntimeError(self.init_error or "Firebase inactive")
+        self.db.reference('_ping').get()
 
     # --- USER & LOCATION ---
     def save_user(self, user_data: dict, user_id: str = None):
@@ -32,72 +115,548 @@ class FirebaseService:
                 user_ref = ref.child(user_id)
                 user_data['updatedAt'] = {".sv": "timestamp"}
                 user_ref.update(user_data)
+                self._on_user_written(user_id, user_data)
+                change_log.record('users', user_id, UPDATE, user_data)
                 return {"success": True, "id": user_id}
             else:
-                new_ref = ref.push()
+                new_id = generate_push_id()
                 user_data['createdAt'] = {".sv": "timestamp"}
-                new_ref.set(user_data)
-                return {"success": True, "id": new_ref.key}
+                ref.child(new_id).set(user_data)
+                self._on_user_written(new_id, user_data)
+                change_log.record('users', new_id, CREATE, user_data)
+                return {"success": True, "id": new_id}
         except Exception as e:
             return {"error": str(e)}
 
+    def _on_user_written(self, user_id: str, user_data: dict):
+        """Keep in-memory indexes and caches in step with a user write"""
+        collection_versions.bump(('users',))
+        self._index_user(user_id, user_data)
+
+    def _index_user(self, user_id: str, user_data: dict):
+        self.user_cache.invalidate(user_id)
+        area_index.update_user(user_id, user_data)
+        point = user_point(user_data)
+        if point:
+            user_geo_index.upsert(user_id, *point)
+        mobile = user_data.get('mobile')
+        if mobile:
+            mobile = str(mobile)
+            with self._mobile_index_lock:
+                # A record keyed by the mobile itself always wins
+                if self._mobile_index.get(mobile) != mobile:
+                    self._mobile_index[mobile] = user_id
+
     def get_users(self):
         if not self.db: return {}
         return self.db.reference('users').get() or {}
 
+    def build_indexes(self):
+        """
+        Load users and reports once (startup) and seed every in-memory index.
+        Later writes through this service keep them current.
+        """
+        all_users = self.get_users()
+        area_index.build(all_users)
+        self.index_user_mobiles(all_users)
+        user_geo_index.build(
+            (user_id, *point) for user_id, user in all_users.items()
+            if (point := user_point(user))
+        )
+        del all_users
+
+        # Resolution times for the report statistics
+        solved_at = {
+            solution_id: solution.get('solvedAt')
+            for solution_id, solution in self.iter_collection('solutions', 'solvedAt')
+        }
+
+        # One streamed pass over the reports feeds every report index
+        points, stat_entries = [], []
+
+        def reports():
+            for report_id, report in self.iter_collection('reports', 'timestamp'):
+                if point := report_point(report):
+                    points.append((report_id, *point))
+                stat_entries.append((report_id, report_stats.entry(report, solved_at.get(report.get('solutionId')))))
+                yield report_id, report
+
+        user_report_index.build(reports())
+        report_geo_index.build(points)
+        report_stats.build(stat_entries)
+        logger.info("Geo indexes built", extra={"users": user_geo_index.stats()['points'],
+                                                 "reports": report_geo_index.stats()['points']})
+
+    def index_user_mobiles(self, all_users: dict):
+        """Seed the mobile -> key index from a users snapshot (startup)"""
+        index = {}
+        for key, val in (all_users or {}).items():
+            if isinstance(val, dict) and val.get('mobile'):
+                mobile = str(val['mobile'])
+                if index.get(mobile) != mobile:
+                    index[mobile] = key
+        with self._mobile_index_lock:
+            self._mobile_index = index
+
+    def get_user(self, user_id: str):
+        """Fetch one user record (read-through cache). Returns None if absent."""
+        if not self.db or not user_id: return None
+        cached = self.user_cache.get(user_id)
+        if cached is not None:
+            return cached
+        try:
+            user = self.db.reference(f'users/{user_id}').get()
+        except ValueError:
+            # Not a valid Firebase key (e.g. contains '.', '#', '$')
+            return None
+        if isinstance(user, dict):
+            self.user_cache.set(user_id, user)
+            return user
+        return None
+
+    def _query_user_by_mobile(self, mobile: str):
+        try:
+            result = self.db.reference('users').order_by_child('mobile').equal_to(mobile).limit_to_first(1).get()
+            return next(iter(result.items()), (None, None)) if result else (None, None)
+        except Exception as e:
+            # Query needs ".indexOn": ["mobile"] on /users; fall back to a scan
+            if not self._warned_missing_mobile_index:
+                logger.warning("Mobile query failed (%s). Add \".indexOn\": [\"mobile\"] to /users rules.", e)
+                self._warned_missing_mobile_index = True
+            for key, val in self.get_users().items():
+                if isinstance(val, dict) and val.get('mobile') == mobile:
+                    return key, val
+            return None, None
+
+    def get_user_by_mobile(self, mobile: str):
+        """
+        Find a user by key or by 'mobile' field.
+        Returns (user_key, user_data) or (None, None).
+        """
+        if not self.db or not mobile: return None, None
+
+        # 1. Secondary index (seeded at startup, updated on every write)
+        with self._mobile_index_lock:
+            user_key = self._mobile_index.get(mobile)
+        if user_key is not None:
+            user = self.get_user(user_key)
+            if user and user.get('mobile') == mobile:
+                return user_key, user
+            # Stale entry (mobile changed elsewhere)
+            with self._mobile_index_lock:
+                self._mobile_index.pop(mobile, None)
+
+        # 2. Users registered through the app are keyed by mobile
+        user = self.get_user(mobile)
+        if user:
+            return mobile, user
+
+        # 3. Indexed Firebase query
+        user_key, user = self._query_user_by_mobile(mobile)
+        if user_key is None or not isinstance(user, dict):
+            return None, None
+        with self._mobile_index_lock:
+            self._mobile_index[mobile] = user_key
+        self.user_cache.set(user_key, user)
+        return user_key, user
+
     # --- REPORTS (Table 1) ---
     def save_report(self, report_data: dict):
         if not self.db: return {"error": "Firebase inactive"}
         try:
-            ref = self.db.reference('reports')
-            new_ref = ref.push()
-            report_data['id'] = new_ref.key
+            report_id = generate_push_id()
+            report_data['id'] = report_id
             report_data['timestamp'] = {".sv": "timestamp"}
-            new_ref.set(report_data)
-            return {"success": True, "id": new_ref.key}
+            self.db.reference(f'reports/{report_id}').set(report_data)
+            self._on_report_written(report_id, report_data)
+            change_log.record('reports', report_id, CREATE, report_data)
+            return {"success": True, "id": report_id}
         except Exception as e:
             return {"error": str(e)}
 
+    def _on_report_written(self, report_id: str, report_data: dict):
+        """Keep in-memory report indexes in step with a report write"""
+        collection_versions.bump(('reports',))
+        self._index_report(report_id, report_data)
+
+    def _index_report(self, report_id: str, report_data: dict):
+        point = report_point(report_data)
+        if point:
+            report_geo_index.upsert(report_id, *point)
+        user_report_index.add_report(report_id, report_data)
+        report_stats.add_report(report_id, report_data)
+
+    def _on_report_patched(self, report_id: str, fields: dict):
+        """Keep in-memory report indexes in step with a partial report update"""
+        user_report_index.update_report(report_id, fields)
+        report_stats.update_report(report_id, fields)
+
+    def _on_reports_patched(self, updates: dict):
+        """Route the report fields of a multi-path update to _on_report_patched"""
+        patches = {}
+        for path, value in updates.items():
+            parts = path.strip('/').split('/')
+            if parts[0] != 'reports' or len(parts) < 2:
+                continue
+            if len(parts) == 2 and isinstance(value, dict):
+                patches.setdefault(parts[1], {}).update(value)
+            elif len(parts) == 3:
+                patches.setdefault(parts[1], {})[parts[2]] = value
+        for report_id, fields in patches.items():
+            self._on_report_patched(report_id, fields)
+
+    def apply_remote_changes(self, changes: Iterable[dict]):
+        """
+        Apply record changes made on another worker (relayed over the
+        backplane) to this worker's indexes and user cache, so alert
+        targeting, /reports/by-user, /reports/stats and login see them.
+        Versions are not bumped here: they travel on their own channel.
+        """
+        for change in changes:
+            collection, record_id, data = change["collection"], change["id"], change.get("data") or {}
+            if collection == 'users':
+                self._index_user(record_id, data)
+            elif collection == 'reports':
+                if change["op"] == CREATE:
+                    self._index_report(record_id, data)
+                else:
+                    self._on_report_patched(record_id, data)
+
     def get_reports(self):
         if not self.db: return {}
         return self.db.reference('reports').get() or {}
 
+    def get_report(self, report_id: str):
+        """Fetch one report. Returns None if absent."""
+        if not self.db or not report_id: return None
+        try:
+            report = self.db.reference(f'reports/{report_id}').get()
+        except ValueError:
+            return None
+        return report if isinstance(report, dict) else None
+
     def update_report_status(self, report_id: str, status: str):
+        return self.update_report(report_id, {"status": status})
+
+    def update_report(self, report_id: str, updates: dict):
+        """Patch fields of one report (e.g. status, aiAnalysis)"""
         if not self.db: return {"error": "Firebase inactive"}
         try:
-            self.db.reference(f'reports/{report_id}').update({"status": status})
+            self.db.reference(f'reports/{report_id}').update(updates)
+            self._on_report_patched(report_id, updates)
+            collection_versions.bump(('reports',))
+            change_log.record('reports', report_id, UPDATE, updates)
             return {"success": True}
         except Exception as e:
             return {"error": str(e)}
 
-    # --- SOLUTIONS (Table 2) ---
-    def save_solution(self, solution_data: dict):
+    # --- INCIDENTS (clustered reports) ---
+    def get_incident(self, incident_id: str):
+        """Fetch one incident. Returns None if absent."""
+        if not self.db or not incident_id: return None
+        try:
+            incident = self.db.reference(f'incidents/{incident_id}').get()
+        except ValueError:
+            return None
+        return {**incident, 'id': incident_id} if isinstance(incident, dict) else None
+
+    def get_recent_incidents(self, since_ms: int):
+        """(id, incident) pairs with a report since since_ms, newest first"""
+        recent = []
+        for key, incident in self.iter_collection('incidents', 'lastReportedAt'):
+            if (incident.get('lastReportedAt') or 0) < since_ms:
+                break
+            recent.append((key, incident))
+        return recent
+
+    # --- MULTI-PATH WRITES ---
+    def update_multi(self, updates: dict):
         """
-        Saves data to the 'solutions' table and updates the report status.
+        Atomic multi-location update: {"path/to/field": value, ...}.
+        Either every path is written or none is.
         """
         if not self.db: return {"error": "Firebase inactive"}
         try:
-            # 1. Save to Solutions Table
-            sol_ref = self.db.reference('solutions')
-            new_sol_ref = sol_ref.push()
-            solution_data['id'] = new_sol_ref.key
-            solution_data['solvedAt'] = {".sv": "timestamp"}
-            new_sol_ref.set(solution_data)
-
-            # 2. Update Report Status to 'Resolved'
-            report_id = solution_data.get('reportId')
-            if report_id:
-                self.db.reference(f'reports/{report_id}').update({
-                    "status": "Resolved",
-                    "solutionId": new_sol_ref.key
-                })
-
-            return {"success": True, "solutionId": new_sol_ref.key}
+            self.db.reference().update(updates)
+            collection_versions.bump_paths(updates)
+            change_log.record_paths(updates)
+            # Report status changes (incident verify, solutions) reach the report indexes
+            self._on_reports_patched(updates)
+            return {"success": True}
         except Exception as e:
             return {"error": str(e)}
 
+    # --- SOLUTIONS (Table 2) ---
+    def save_solution(self, solution_data: dict, incident_id: str = None, related_report_ids: list = None):
+        """
+        Saves data to the 'solutions' table and updates the report status
+        in one atomic multi-path update, so they cannot diverge.
+        With incident_id, the incident and all its reports are resolved too.
+        """
+        if not self.db: return {"error": "Firebase inactive"}
+        solution_id = generate_push_id()
+        solution_data['id'] = solution_id
+        solution_data['solvedAt'] = {".sv": "timestamp"}
+
+        # 1. Solutions Table entry
+        updates = {f'solutions/{solution_id}': solution_data}
+
+        # 2. Report Status -> 'Resolved'
+        report_id = solution_data.get('reportId')
+        if report_id:
+            updates[f'reports/{report_id}/status'] = "Resolved"
+            updates[f'reports/{report_id}/solutionId'] = solution_id
+
+        # 3. Same incident: one fix resolves every duplicate report
+        for related_id in related_report_ids or []:
+            updates[f'reports/{related_id}/status'] = "Resolved"
+            updates[f'reports/{related_id}/solutionId'] = solution_id
+        if incident_id:
+            updates[f'incidents/{incident_id}/status'] = "Resolved"
+            updates[f'incidents/{incident_id}/solutionId'] = solution_id
+
+        result = self.update_multi(updates)
+        if "error" in result:
+            return result
+        return {"success": True, "solutionId": solution_id}
+
     def get_solutions(self):
         if not self.db: return {}
         return self.db.reference('solutions').get() or {}
 
-firebase_service = FirebaseService()
\ No newline at end of file
+    # --- PAGINATION / QUERIES ---
+    @staticmethod
+    def encode_cursor(sort_value, key: str) -> str:
+        raw = json.dumps([sort_value, key], separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple:
+        """Raises ValueError on a malformed cursor"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            sort_value, key = json.loads(base64.urlsafe_b64decode(padded))
+        except Exception:
+            raise ValueError("Invalid cursor")
+        return sort_value, key
+
+    @staticmethod
+    def _sort_value(value):
+        # Missing/non-numeric values sort as oldest (Firebase puts nulls first)
+        return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
+
+    def _run_query(self, path: str, field: str, equal_to=None, end_at=None, limit_to_last: int = None) -> dict:
+        """
+        order_by_child query pushed down to Firebase.
+        Needs ".indexOn" on `field`; without it we download `path` and
+        apply the same query in Python.
+        """
+        try:
+            query = self.db.reference(path).order_by_child(field)
+            if equal_to is not None:
+                query = query.equal_to(equal_to)
+            if end_at is not None:
+                query = query.end_at(end_at)
+            if limit_to_last is not None:
+                query = query.limit_to_last(limit_to_last)
+            return query.get() or {}
+        except Exception as e:
+            if (path, field) not in self._warned_unindexed:
+                logger.warning("Query on %s/%s failed (%s). Add \".indexOn\": [\"%s\"] to /%s rules.",
+                               path, field, e, field, path)
+                self._warned_unindexed.add((path, field))
+
+        rows = []
+        for key, val in (self.db.reference(path).get() or {}).items():
+            value = val.get(field) if isinstance(val, dict) else None
+            if equal_to is not None and value != equal_to:
+                continue
+            if end_at is not None and self._sort_value(value) > end_at:
+                continue
+            rows.append((self._sort_value(value), key, val))
+        rows.sort(key=lambda row: (row[0], row[1]))
+        if limit_to_last is not None:
+            rows = rows[-limit_to_last:]
+        return {key: val for _, key, val in rows}
+
+    def _record_sort_key(self, order_field: str):
+        return lambda item: (self._sort_value(item[1].get(order_field)), item[0])
+
+    def _filtered_records(self, path: str, order_field: str, filters: dict, after: tuple = None) -> list:
+        """
+        Records matching every equality filter, newest-first (and older than
+        `after`). The first filter is pushed down to Firebase, the rest are
+        applied here.
+        """
+        sort_key = self._record_sort_key(order_field)
+        field, value = next(iter(filters.items()))
+        rows = self._run_query(path, field, equal_to=value)
+        matched = [
+            item for item in rows.items()
+            if isinstance(item[1], dict)
+            and all(item[1].get(f) == v for f, v in filters.items())
+            and (after is None or sort_key(item) < after)
+        ]
+        matched.sort(key=sort_key, reverse=True)
+        return matched
+
+    def query_page(self, path: str, order_field: str, limit: int, cursor: str = None, filters: dict = None):
+        """
+        One newest-first page of a collection ordered by `order_field`,
+        optionally narrowed by equality `filters`.
+        Returns ([(key, record), ...], next_cursor or None).
+        Raises ValueError on a malformed cursor.
+        """
+        if not self.db: return [], None
+        filters = {field: value for field, value in (filters or {}).items() if value is not None}
+        after = tuple(self.decode_cursor(cursor)) if cursor else None
+        sort_key = self._record_sort_key(order_field)
+
+        if filters:
+            candidates = self._filtered_records(path, order_field, filters, after)
+        else:
+            # Timestamp ties at the cursor can eat into the page; widen until full
+            fetch = limit + 1
+            while True:
+                rows = self._run_query(path, order_field, end_at=after[0] if after else None, limit_to_last=fetch)
+                candidates = sorted(
+                    (item for item in rows.items()
+                     if isinstance(item[1], dict) and (after is None or sort_key(item) < after)),
+                    key=sort_key, reverse=True,
+                )
+                if len(candidates) > limit or len(rows) < fetch:
+                    break
+                fetch *= 2
+
+        page = candidates[:limit]
+        next_cursor = self.encode_cursor(*sort_key(page[-1])) if len(candidates) > limit else None
+        return page, next_cursor
+
+    def iter_collection(self, path: str, order_field: str, filters: dict = None, page_size: int = None):
+        """Yield (key, record) newest-first without holding the whole collection"""
+        if not self.db: return
+        filters = {field: value for field, value in (filters or {}).items() if value is not None}
+        if filters:
+            # Already bounded by the pushed-down equality query
+            yield from self._filtered_records(path, order_field, filters)
+            return
+
+        cursor = None
+        while True:
+            page, cursor = self.query_page(path, order_field, limit=page_size or settings.FIREBASE_PAGE_SIZE, cursor=cursor)
+            yield from page
+            if not cursor:
+                return
+
+firebase_service = FirebaseService()
+
+
+class CallLatency:
+    """Count, errors and recent latency samples for one service method"""
+
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self.errors = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self._recent = deque(maxlen=window)
+
+    def record(self, seconds: float, ok: bool):
+        self.count += 1
+        self.total_s += seconds
+        self.max_s = max(self.max_s, seconds)
+        if not ok:
+            self.errors += 1
+        self._recent.append(seconds)
+
+    def summary(self) -> dict:
+        recent = sorted(self._recent)
+
+        def pct(p):
+            return round(recent[min(len(recent) - 1, int(p * len(recent)))] * 1000, 2) if recent else 0.0
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_s / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": round(self.max_s * 1000, 2),
+        }
+
+
+class AsyncFirebaseService:
+    """
+    Awaitable facade over FirebaseService.
+    firebase_admin only does blocking HTTP, so every call runs on a bounded
+    thread pool instead of the event loop. Each public method of the sync
+    service is available as a coroutine with the same signature, and its
+    latency is recorded per method.
+    """
+
+    def __init__(self, service: FirebaseService, max_workers: int):
+        self._service = service
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="firebase")
+        self._latency = {}
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._service, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            ok = False
+            try:
+                result = await loop.run_in_executor(self._executor, functools.partial(attr, *args, **kwargs))
+                ok = not (isinstance(result, dict) and "error" in result)
+                return result
+            finally:
+                elapsed = time.perf_counter() - start
+                stats = self._latency.get(name)
+                if stats is None:
+                    stats = self._latency[name] = CallLatency()
+                stats.record(elapsed, ok)
+                FIREBASE_CALL_SECONDS.labels(name, "ok" if ok else "error").observe(elapsed)
+
+        return call
+
+    async def iter_collection(self, path: str, order_field: str, filters: dict = None, page_size: int = None):
+        """
+        Async FirebaseService.iter_collection: yields (key, record) newest-first,
+        fetching one page at a time on the pool, never on the event loop.
+        """
+        filters = {field: value for field, value in (filters or {}).items() if value is not None}
+        if filters:
+            # One pushed-down equality query, already bounded
+            loop = asyncio.get_running_loop()
+            for item in await loop.run_in_executor(
+                    self._executor, self._service._filtered_records, path, order_field, filters):
+                yield item
+            return
+
+        cursor = None
+        while True:
+            page, cursor = await self.query_page(path, order_field, page_size or settings.FIREBASE_PAGE_SIZE, cursor)
+            for item in page:
+                yield item
+            if not cursor:
+                return
+
+    async def warm(self, connections: int):
+        """Start pool threads and open HTTP connections before the first request (app startup)"""
+        await asyncio.gather(*(self.ping() for _ in range(max(1, min(connections, self.max_workers)))))
+
+    def latency_stats(self) -> dict:
+        """Per-method call latency (ms)"""
+        return {name: stats.summary() for name, stats in sorted(self._latency.items())}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+firebase_async = AsyncFirebaseService(firebase_service, max_workers=settings.FIREBASE_EXECUTOR_WORKERS)
\ No newline at end of file
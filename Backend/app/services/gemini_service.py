@@ -1,16 +1,48 @@
-import google.generativeai as genai
+import asyncio
+import time
 from app.core.config import settings
+from app.core.log import get_logger
+from app.core.metrics import GEMINI_ANALYSIS_SECONDS
+from app.services.analysis_cache import analysis_cache
+
+logger = get_logger(__name__)
 
 class GeminiService:
     def __init__(self):
-        if settings.GOOGLE_GEMINI_API_KEY:
+        # Created by init() at app startup (google.generativeai is slow to import)
+        self.model = None
+        self.init_error = None
+
+    def init(self) -> bool:
+        """
+        Import the Gemini SDK and create the model (blocking).
+        A model set beforehand (e.g. a local stand-in) is kept as is.
+        """
+        if self.model is not None:
+            return True
+        if not settings.GOOGLE_GEMINI_API_KEY:
+            self.init_error = "Gemini API key not found"
+            logger.warning(self.init_error)
+            return False
+        try:
+            import google.generativeai as genai
             genai.configure(api_key=settings.GOOGLE_GEMINI_API_KEY)
             self.model = genai.GenerativeModel('gemini-pro-vision')
-        else:
-            print("Warning: Gemini API Key not found.")
-            self.model = None
+            self.init_error = None
+            return True
+        except Exception as e:
+            self.init_error = str(e)
+            logger.error("Error initializing Gemini: %s", e)
+            return False
 
-    async def analyze_image(self, image_data, prompt="Describe this image"):
+    async def warm(self):
+        """
+        One cheap count_tokens call, so the async channel is open (and the key
+        checked) before the first verification.
+        """
+        await self.model.count_tokens_async("ping")
+
+    async def analyze_image(self, image_data, prompt="Describe this image", mime_type="image/jpeg"):
         """
         Analyzes an image to detect if it contains specific civic issues
         like potholes, garbage dumps, or fire.
@@ -18,15 +50,39 @@ class GeminiService:
         Args:
             image_data: The image bytes or PIL object.
             prompt: The instruction for Gemini.
+            mime_type: Format of image_data when it is raw bytes.
         """
         if not self.model:
             return {"error": "Gemini Service not configured"}
 
+        fingerprint = None
+        if isinstance(image_data, (bytes, bytearray)):
+            image_data = bytes(image_data)
+            if settings.GEMINI_CACHE_ENABLED:
+                # Same (or near-identical) photo seen before: skip the model
+                fingerprint = await asyncio.to_thread(analysis_cache.fingerprint, image_data)
+                cached = await asyncio.to_thread(analysis_cache.get, prompt, fingerprint)
+                if cached is not None:
+                    return cached
+            image_data = {"mime_type": mime_type, "data": image_data}
+
+        start = time.perf_counter()
         try:
-            # Note: This is a simplified call. Real usage requires handling image formats.
-            response = self.model.generate_content([prompt, image_data])
-            return {"analysis": response.text}
+            # Native async call: the event loop keeps serving while the model works
+            response = await self.model.generate_content_async([prompt, image_data])
+            result = {"analysis": response.text}
         except Exception as e:
+            GEMINI_ANALYSIS_SECONDS.labels("error").observe(time.perf_counter() - start)
             return {"error": str(e)}
+        elapsed = time.perf_counter() - start
+        GEMINI_ANALYSIS_SECONDS.labels("ok").observe(elapsed)
+
+        if fingerprint is not None:
+            latency_ms = elapsed * 1000
+            try:
+                await asyncio.to_thread(analysis_cache.put, prompt, fingerprint, result, latency_ms)
+            except Exception as e:
+                logger.warning("Gemini cache write failed: %s", e)
+        return result
 
 gemini_service = GeminiService()
@@ -0,0 +1,136 @@
+"""
+Geospatial Grid Index
+Buckets points into fixed lat/lng cells so radius and bounding-box
+queries only look at nearby cells instead of every record.
+"""
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import math
+import threading
+from app.core.config import settings
+
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEGREE_LAT = 111320.0
+
+Cell = Tuple[int, int]
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in meters"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def extract_point(location, lat_key: str, lng_key: str) -> Optional[Tuple[float, float]]:
+    """Pull a valid (lat, lng) out of a stored location dict"""
+    if not isinstance(location, dict):
+        return None
+    try:
+        lat, lng = float(location[lat_key]), float(location[lng_key])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+
+def report_point(report: dict):
+    """Reports store location.lat / location.lng"""
+    return extract_point(report.get('location') if isinstance(report, dict) else None, 'lat', 'lng')
+
+
+def user_point(user: dict):
+    """Users store location.latitude / location.longitude"""
+    return extract_point(user.get('location') if isinstance(user, dict) else None, 'latitude', 'longitude')
+
+
+class GeoGridIndex:
+    """Uniform grid over lat/lng; cell_size_deg ~ 0.01 is about 1.1 km"""
+
+    def __init__(self, cell_size_deg: float):
+        self.cell_size = cell_size_deg
+        self._lock = threading.Lock()
+        self._cells: Dict[Cell, Set[str]] = {}
+        self._points: Dict[str, Tuple[float, float]] = {}
+
+    def _cell(self, lat: float, lng: float) -> Cell:
+        return int(math.floor(lat / self.cell_size)), int(math.floor(lng / self.cell_size))
+
+    def _remove_locked(self, item_id: str):
+        point = self._points.pop(item_id, None)
+        if point is not None:
+            cell = self._cell(*point)
+            members = self._cells.get(cell)
+            if members is not None:
+                members.discard(item_id)
+                if not members:
+                    del self._cells[cell]
+
+    def upsert(self, item_id: str, lat: float, lng: float):
+        with self._lock:
+            self._remove_locked(item_id)
+            self._points[item_id] = (lat, lng)
+            self._cells.setdefault(self._cell(lat, lng), set()).add(item_id)
+
+    def remove(self, item_id: str):
+        with self._lock:
+            self._remove_locked(item_id)
+
+    def build(self, points: Iterable[Tuple[str, float, float]]):
+        cells: Dict[Cell, Set[str]] = {}
+        positions: Dict[str, Tuple[float, float]] = {}
+        for item_id, lat, lng in points:
+            positions[item_id] = (lat, lng)
+            cells.setdefault(self._cell(lat, lng), set()).add(item_id)
+        with self._lock:
+            self._cells = cells
+            self._points = positions
+
+    def get(self, item_id: str) -> Optional[Tuple[float, float]]:
+        return self._points.get(item_id)
+
+    def _candidates(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> List[Tuple[str, float, float]]:
+        lo_row, lo_col = self._cell(min_lat, min_lng)
+        hi_row, hi_col = self._cell(max_lat, max_lng)
+        with self._lock:
+            span = (hi_row - lo_row + 1) * (hi_col - lo_col + 1)
+            if span > len(self._cells):
+                # Huge box: cheaper to walk the occupied cells
+                cells = [c for c in self._cells if lo_row <= c[0] <= hi_row and lo_col <= c[1] <= hi_col]
+            else:
+                cells = [(r, c) for r in range(lo_row, hi_row + 1) for c in range(lo_col, hi_col + 1)]
+            return [
+                (item_id, *self._points[item_id])
+                for cell in cells
+                for item_id in self._cells.get(cell, ())
+            ]
+
+    def within_bbox(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> List[Tuple[str, float, float]]:
+        """(id, lat, lng) for every point inside the box"""
+        return [
+            (item_id, lat, lng)
+            for item_id, lat, lng in self._candidates(min_lat, min_lng, max_lat, max_lng)
+            if min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
+        ]
+
+    def within_radius(self, lat: float, lng: float, radius_m: float) -> List[Tuple[str, float, float, float]]:
+        """(id, lat, lng, distance_m) within radius_m, nearest first"""
+        dlat = radius_m / METERS_PER_DEGREE_LAT
+        dlng = radius_m / (METERS_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 1e-6))
+        hits = []
+        for item_id, p_lat, p_lng in self._candidates(lat - dlat, lng - dlng, lat + dlat, lng + dlng):
+            distance = haversine_m(lat, lng, p_lat, p_lng)
+            if distance <= radius_m:
+                hits.append((item_id, p_lat, p_lng, distance))
+        hits.sort(key=lambda hit: hit[3])
+        return hits
+
+    def stats(self) -> dict:
+        return {"points": len(self._points), "cells": len(self._cells), "cell_size_deg": self.cell_size}
+
+
+# Global indexes: report positions and last-known user positions
+report_geo_index = GeoGridIndex(settings.GEO_CELL_SIZE_DEG)
+user_geo_index = GeoGridIndex(settings.GEO_CELL_SIZE_DEG)
@@ -0,0 +1,187 @@
+"""
+Upload Preprocessing
+Report photos are read in chunks up to UPLOAD_MAX_BYTES, then decoded,
+downscaled to IMAGE_MAX_DIMENSION and re-encoded as JPEG in a process pool,
+so full-resolution pixels never sit in the API worker and Gemini gets a
+small image. Re-encoding drops EXIF; GPS coordinates are pulled out first
+and kept as report metadata.
+
+Pillow is optional: without it the upload is passed through unchanged.
+"""
+import asyncio
+import io
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from fastapi import UploadFile
+
+from app.core.config import settings
+from app.core.log import get_logger
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Required; without it uploads pass through and the image_workers step fails
+    Image = None
+
+logger = get_logger(__name__)
+
+GPS_IFD = 0x8825
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+async def read_upload(file: UploadFile, max_bytes: int, chunk_size: int) -> bytearray:
+    """Read an upload chunk by chunk, refusing anything over max_bytes"""
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            # Returned as-is: a bytes() copy would double the peak per upload
+            return buffer
+        if len(buffer) + len(chunk) > max_bytes:
+            raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+        buffer.extend(chunk)
+
+
+def _dms_to_degrees(dms, ref) -> float:
+    degrees, minutes, seconds = (float(v) for v in dms)
+    value = degrees + minutes / 60 + seconds / 3600
+    return -value if ref in ("S", "W") else value
+
+
+def _exif_gps(img) -> Optional[dict]:
+    try:
+        gps = img.getexif().get_ifd(GPS_IFD)
+        if not gps or 2 not in gps or 4 not in gps:
+            return None
+        return {
+            "lat": round(_dms_to_degrees(gps[2], gps.get(1, "N")), 7),
+            "lng": round(_dms_to_degrees(gps[4], gps.get(3, "E")), 7),
+        }
+    except Exception:
+        return None
+
+
+def preprocess_image(data: bytes, max_dimension: int, quality: int) -> dict:
+    """
+    Decode, orient, downscale and re-encode one photo (runs in a worker process).
+    Returns {"image", "mime_type", "width", "height", "gps"}; raises if the
+    bytes are not a decodable image.
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        gps = _exif_gps(img)
+        # JPEG: decode straight at a reduced scale instead of full resolution
+        scale = max_dimension / max(img.size)
+        if scale < 1:
+            img.draft("RGB", (int(img.width * scale), int(img.height * scale)))
+        img.thumbnail((max_dimension, max_dimension))
+        # Rotate after shrinking (the box is square, so the bound still holds)
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        out = io.BytesIO()
+        # No exif= argument: metadata is stripped
+        img.save(out, "JPEG", quality=quality)
+        return {
+            "image": out.getvalue(),
+            "mime_type": "image/jpeg",
+            "width": img.width,
+            "height": img.height,
+            "gps": gps,
+        }
+
+
+def _worker_ready() -> bool:
+    # Load the image plugins now rather than in the first upload
+    Image.init()
+    return True
+
+
+class ImagePreprocessor:
+    """
+    Process pool for upload preprocessing (created on first use).
+    At most max_in_flight uploads are read into memory at once; the rest
+    wait in Starlette's spooled temp files (<= 1 MB in RAM each).
+    """
+
+    def __init__(self, workers: int, max_in_flight: int, max_dimension: int, quality: int):
+        self.workers = workers
+        self.max_dimension = max_dimension
+        self.quality = quality
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.processed = 0
+        self.passed_through = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.IMAGE_PREPROCESS_ENABLED and Image is not None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def warm(self) -> Optional[str]:
+        """Start the worker processes now rather than on the first upload (app startup)"""
+        if not settings.IMAGE_PREPROCESS_ENABLED:
+            return "disabled"
+        if Image is None:
+            # Uploads would be stored and sent to Gemini at full size
+            raise RuntimeError("Pillow is not installed: uploads are not downscaled or stripped of GPS")
+        loop = asyncio.get_running_loop()
+        pool = self._executor()
+        await asyncio.gather(*(loop.run_in_executor(pool, _worker_ready) for _ in range(self.workers)))
+
+    async def process_upload(self, file: UploadFile, max_bytes: int, chunk_size: int) -> dict:
+        """Read (capped) and shrink one uploaded photo. Raises UploadTooLarge."""
+        async with self._slots:
+            data = await read_upload(file, max_bytes, chunk_size)
+            if not data:
+                raise ValueError("Empty upload")
+            return await self.process(data, file.content_type or "image/jpeg")
+
+    async def process(self, data: bytes, mime_type: str = "image/jpeg") -> dict:
+        """
+        Shrink a photo for analysis. Anything that can't be decoded (or when
+        preprocessing is off) is passed through as-is.
+        """
+        if self.enabled:
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(
+                    self._executor(), preprocess_image, data, self.max_dimension, self.quality
+                )
+                self.processed += 1
+                self.bytes_in += len(data)
+                self.bytes_out += len(result["image"])
+                return result
+            except Exception as e:
+                logger.warning("Image preprocessing failed, using original upload: %s", e)
+        self.passed_through += 1
+        return {"image": data, "mime_type": mime_type, "width": None, "height": None, "gps": None}
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "processed": self.processed,
+            "passed_through": self.passed_through,
+            "avg_reduction": round(1 - self.bytes_out / self.bytes_in, 3) if self.bytes_in else 0.0,
+        }
+
+
+image_preprocessor = ImagePreprocessor(
+    workers=settings.IMAGE_PREPROCESS_WORKERS,
+    max_in_flight=settings.IMAGE_PREPROCESS_MAX_IN_FLIGHT,
+    max_dimension=settings.IMAGE_MAX_DIMENSION,
+    quality=settings.IMAGE_JPEG_QUALITY,
+)
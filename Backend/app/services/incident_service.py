@@ -0,0 +1,287 @@
+"""
+Incident Clustering
+Reports of the same category within INCIDENT_RADIUS_M and INCIDENT_WINDOW_S
+of an open incident join it instead of standing alone, so ten photos of one
+fallen tree are verified (and alerted) once. Clustering is incremental: open
+incidents sit in one grid index per category, and a new report only looks
+at the cells around it.
+
+Incidents are stored in Firebase under 'incidents/{id}'; member reports get
+an 'incidentId'.
+"""
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.log import get_logger
+from app.services.alert_digest import alert_digest
+from app.services.alert_service import broadcast_alert_to_radius
+from app.services.firebase_service import firebase_async, generate_push_id
+from app.services.geo_index import GeoGridIndex, report_point
+from app.services.websocket_manager import manager
+
+logger = get_logger(__name__)
+
+PENDING_STATUS = "Pending Verification"
+# Incidents in these states no longer take new reports
+CLOSED_STATUSES = {"Resolved", "Rejected"}
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _category_key(category) -> str:
+    return category.lower().strip() if isinstance(category, str) else ""
+
+
+class IncidentClusterer:
+    """In-memory view of open incidents, used to place each new report"""
+
+    def __init__(self, radius_m: float, window_s: float, cell_size_deg: float):
+        self.radius_m = radius_m
+        self.window_ms = int(window_s * 1000)
+        self.cell_size_deg = cell_size_deg
+        # incident_id -> record (same shape as in Firebase)
+        self._incidents: Dict[str, dict] = {}
+        # normalized category -> grid of open incidents
+        self._grids: Dict[str, GeoGridIndex] = {}
+        self._last_prune = 0
+        self.assigned = 0
+        self.created = 0
+
+    def _grid(self, category: str) -> GeoGridIndex:
+        grid = self._grids.get(category)
+        if grid is None:
+            grid = self._grids[category] = GeoGridIndex(self.cell_size_deg)
+        return grid
+
+    def _track(self, incident: dict):
+        point = report_point(incident)
+        if point and incident.get('status') not in CLOSED_STATUSES:
+            self._incidents[incident['id']] = incident
+            self._grid(_category_key(incident.get('category'))).upsert(incident['id'], *point)
+
+    def _forget(self, incident_id: str):
+        incident = self._incidents.pop(incident_id, None)
+        if incident is not None:
+            self._grid(_category_key(incident.get('category'))).remove(incident_id)
+
+    def _prune(self, now: int):
+        """Drop incidents whose window has passed (at most once per window)"""
+        if now - self._last_prune < self.window_ms:
+            return
+        self._last_prune = now
+        for incident_id, incident in list(self._incidents.items()):
+            if now - incident.get('lastReportedAt', 0) > self.window_ms:
+                self._forget(incident_id)
+
+    def load(self, incidents: List[Tuple[str, dict]]):
+        """Seed from recently active incidents (startup)"""
+        self._incidents.clear()
+        self._grids.clear()
+        for incident_id, incident in incidents:
+            self._track({**incident, 'id': incident_id})
+        self._last_prune = _now_ms()
+        logger.info("Incident clusterer loaded open incidents", extra={"incidents": len(self._incidents)})
+
+    def get(self, incident_id: str) -> Optional[dict]:
+        return self._incidents.get(incident_id)
+
+    def assign(self, report_id: str, report: dict) -> Tuple[Optional[str], dict]:
+        """
+        Put a saved report into the nearest open incident of its category,
+        or start a new one. Returns (incident_id, multi-path updates to write).
+        """
+        point = report_point(report)
+        if not point:
+            return None, {}
+        now = _now_ms()
+        self._prune(now)
+        category = _category_key(report.get('category'))
+        user_id = report.get('userId') or "anonymous"
+        # Anonymous reports can't be told apart, so each counts once
+        submitter = report_id if user_id == "anonymous" else user_id
+
+        incident = None
+        for incident_id, _, _, _ in self._grid(category).within_radius(*point, self.radius_m):
+            candidate = self._incidents.get(incident_id)
+            if candidate and now - candidate.get('lastReportedAt', 0) <= self.window_ms:
+                incident = candidate
+                break
+
+        if incident is None:
+            incident_id = generate_push_id()
+            incident = {
+                'id': incident_id,
+                'category': report.get('category'),
+                'location': {'lat': point[0], 'lng': point[1]},
+                'status': PENDING_STATUS,
+                'reportIds': {report_id: True},
+                'submitters': {submitter: True},
+                'reportCount': 1,
+                'submitterCount': 1,
+                'firstReportedAt': now,
+                'lastReportedAt': now,
+            }
+            self._track(incident)
+            self.created += 1
+            return incident_id, {
+                # A copy: the in-memory record keeps changing before the write runs
+                f'incidents/{incident_id}': {**incident, 'reportIds': dict(incident['reportIds']),
+                                             'submitters': dict(incident['submitters'])},
+                f'reports/{report_id}/incidentId': incident_id,
+            }
+
+        incident_id = incident['id']
+        count = incident['reportCount'] + 1
+        # Running mean keeps the incident pin at the centre of its reports
+        lat = incident['location']['lat'] + (point[0] - incident['location']['lat']) / count
+        lng = incident['location']['lng'] + (point[1] - incident['location']['lng']) / count
+        incident['location'] = {'lat': lat, 'lng': lng}
+        incident['reportIds'][report_id] = True
+        incident['submitters'][submitter] = True
+        incident['reportCount'] = count
+        incident['submitterCount'] = len(incident['submitters'])
+        incident['lastReportedAt'] = now
+        self._grid(category).upsert(incident_id, lat, lng)
+        self.assigned += 1
+
+        updates = {
+            f'incidents/{incident_id}/reportIds/{report_id}': True,
+            f'incidents/{incident_id}/submitters/{submitter}': True,
+            f'incidents/{incident_id}/reportCount': count,
+            f'incidents/{incident_id}/submitterCount': incident['submitterCount'],
+            f'incidents/{incident_id}/location': incident['location'],
+            f'incidents/{incident_id}/lastReportedAt': now,
+            f'reports/{report_id}/incidentId': incident_id,
+        }
+        if incident['status'] != PENDING_STATUS:
+            # Joining an incident an admin already decided on
+            updates[f'reports/{report_id}/status'] = incident['status']
+            if incident.get('verifiedArea'):
+                updates[f'reports/{report_id}/verifiedArea'] = incident['verifiedArea']
+        return incident_id, updates
+
+    def status_updates(self, incident: dict, status: str, extra: dict = None) -> dict:
+        """Multi-path updates that set the incident and all its reports to `status`"""
+        incident_id = incident['id']
+        updates = {f'incidents/{incident_id}/status': status}
+        for field, value in (extra or {}).items():
+            updates[f'incidents/{incident_id}/{field}'] = value
+        for report_id in incident.get('reportIds') or {}:
+            updates[f'reports/{report_id}/status'] = status
+            if 'verifiedArea' in (extra or {}):
+                updates[f'reports/{report_id}/verifiedArea'] = extra['verifiedArea']
+        return updates
+
+    def set_status(self, incident_id: str, status: str, extra: dict = None):
+        """Mirror a written status change in memory"""
+        incident = self._incidents.get(incident_id)
+        if incident is None:
+            return
+        if status in CLOSED_STATUSES:
+            self._forget(incident_id)
+            return
+        incident['status'] = status
+        incident.update(extra or {})
+
+    def stats(self) -> dict:
+        return {
+            "open_incidents": len(self._incidents),
+            "created": self.created,
+            "reports_merged": self.assigned,
+            "radius_m": self.radius_m,
+            "window_s": self.window_ms / 1000,
+        }
+
+
+incident_clusterer = IncidentClusterer(
+    radius_m=settings.INCIDENT_RADIUS_M,
+    window_s=settings.INCIDENT_WINDOW_S,
+    cell_size_deg=settings.GEO_CELL_SIZE_DEG,
+)
+
+
+async def load_incidents():
+    """Load incidents active within the clustering window (startup)"""
+    since = _now_ms() - incident_clusterer.window_ms
+    incident_clusterer.load(await firebase_async.get_recent_incidents(since))
+
+
+# Incidents whose first alert is being sent (guards concurrent verifies)
+_alerting = set()
+
+
+async def verify_incident(incident_id: str, status: str, area: str, issue_type: str, radius_m: float = None,
+                          severity: str = None):
+    """
+    Admin decision for a whole incident: one multi-path write sets the
+    incident and every member report, and the first "Verified" decision
+    sends exactly one alert (area alerts go through the digest scheduler).
+    """
+    incident = incident_clusterer.get(incident_id) or await firebase_async.get_incident(incident_id)
+    if not incident:
+        return {"error": "Incident not found"}
+
+    first_alert = status == "Verified" and not incident.get('alertedAt') and incident_id not in _alerting
+    extra = {"verifiedArea": area, "issueType": issue_type}
+    if first_alert:
+        extra["alertedAt"] = _now_ms()
+        _alerting.add(incident_id)
+    try:
+        result = await firebase_async.update_multi(incident_clusterer.status_updates(incident, status, extra))
+        if "error" in result:
+            return result
+        incident_clusterer.set_status(incident_id, status, extra)
+
+        alert_result = {"status": "skipped"}
+        if status == "Verified" and not first_alert:
+            alert_result = {"status": "already_alerted"}
+        elif first_alert:
+            alert_data = {
+                "incident_id": incident_id,
+                "report_count": incident.get('reportCount', 1),
+                "submitter_count": incident.get('submitterCount', 1),
+            }
+            point = report_point(incident)
+            if radius_m and point:
+                alert_result = await broadcast_alert_to_radius(
+                    point[0], point[1], radius_m, issue_type=issue_type, incident_area=area,
+                    additional_data=alert_data
+                )
+            else:
+                alert_result = await alert_digest.submit(
+                    incident_area=area, issue_type=issue_type, severity=severity, additional_data=alert_data
+                )
+    finally:
+        _alerting.discard(incident_id)
+
+    return {
+        "firebase_update": result,
+        "whatsapp_alert": alert_result,
+        # Poll /api/v1/outbox/jobs/{job_id} for WhatsApp delivery progress
+        "job_id": alert_result.get("job_id"),
+        "incident": {
+            "id": incident_id,
+            "status": status,
+            "reportCount": incident.get('reportCount', 1),
+            "submitterCount": incident.get('submitterCount', 1),
+        },
+    }
+
+
+async def notify_incident_resolved(incident: dict, solution_id: str):
+    """One update to admins and one notification per submitter, however many reports"""
+    incident_clusterer.set_status(incident['id'], "Resolved")
+    update = {
+        "event": "incident_resolved",
+        "incidentId": incident['id'],
+        "solutionId": solution_id,
+        "reportIds": list(incident.get('reportIds') or {}),
+    }
+    await manager.send_admin_update(update)
+    for submitter in incident.get('submitters') or {}:
+        # Anonymous submitters are keyed by their report id
+        if submitter not in (incident.get('reportIds') or {}):
+            await manager.send_notification(submitter, update)
@@ -0,0 +1,122 @@
+"""
+Location Write Buffer
+/users/update-location is called continuously by every device's background
+service. Positions are kept here (latest per user only) and written to
+Firebase as one multi-path update per flush instead of one write per call.
+The geo index is updated immediately so the admin map stays live.
+"""
+import asyncio
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.log import get_logger
+from app.core.metrics import LOCATION_BUFFER_PENDING
+from app.services.firebase_service import firebase_async, firebase_service
+from app.services.geo_index import user_geo_index
+
+logger = get_logger(__name__)
+
+
+class LocationWriteBuffer:
+    """Coalesces location updates per user and flushes them on an interval"""
+
+    def __init__(self, flush_interval: float, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        # user_id -> (latitude, longitude), latest wins
+        self._pending: Dict[str, Tuple[float, float]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Counters
+        self.received = 0
+        self.writes_performed = 0
+        self.flushes = 0
+        self.flush_errors = 0
+
+    def add(self, user_id: str, latitude: float, longitude: float):
+        """Record a position; only the latest one per user is written"""
+        self.received += 1
+        self._pending[user_id] = (latitude, longitude)
+        user_geo_index.upsert(user_id, latitude, longitude)
+        if len(self._pending) >= self.max_pending:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Write every pending position in one multi-path update. Returns users written."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            updates = {}
+            for user_id, (latitude, longitude) in batch.items():
+                updates[f"users/{user_id}/location"] = {"latitude": latitude, "longitude": longitude}
+                updates[f"users/{user_id}/lastActive"] = {".sv": "timestamp"}
+                updates[f"users/{user_id}/updatedAt"] = {".sv": "timestamp"}
+
+            result = await firebase_async.update_multi(updates)
+            self.flushes += 1
+            if "error" in result:
+                self.flush_errors += 1
+                # Put the batch back unless a newer position arrived meanwhile
+                for user_id, point in batch.items():
+                    self._pending.setdefault(user_id, point)
+                logger.warning("Location flush failed, users kept for retry: %s", result['error'],
+                               extra={"users": len(batch)})
+                return 0
+
+            for user_id in batch:
+                firebase_service.user_cache.invalidate(user_id)
+            self.writes_performed += len(batch)
+            return len(batch)
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                self.flush_errors += 1
+                logger.warning("Location flush error: %s", e)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flush loop and write whatever is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "pending": len(self._pending),
+            "writes_performed": self.writes_performed,
+            "writes_avoided": self.received - self.writes_performed - len(self._pending),
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+            "flush_interval_s": self.flush_interval,
+        }
+
+
+location_buffer = LocationWriteBuffer(
+    flush_interval=settings.LOCATION_FLUSH_INTERVAL,
+    max_pending=settings.LOCATION_FLUSH_MAX_PENDING,
+)
+
+LOCATION_BUFFER_PENDING.set_function(lambda: len(location_buffer._pending))
@@ -0,0 +1,78 @@
+"""
+Readiness
+What /ready reports. Startup steps (connecting Firebase, creating the Gemini
+model, warming connection pools) are run through `readiness.step`, which
+records whether each succeeded and how long it took. Background workers
+register a live check that is evaluated on every request.
+
+/ready answers 200 once startup has finished and every required dependency
+is ready, 503 otherwise. Optional dependencies (Gemini, Green-API) only
+degrade the service: reports wait for manual review, WhatsApp messages wait
+in the outbox.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
+
+
+class Readiness:
+    """Per-dependency startup outcome plus live worker checks"""
+
+    def __init__(self):
+        self._checks: Dict[str, dict] = {}
+        self._live: Dict[str, tuple] = {}
+        self._started_at = time.perf_counter()
+        self.startup_s: Optional[float] = None
+
+    def reset(self):
+        """Forget previous results (a new lifespan is starting)"""
+        self._checks = {}
+        self._live = {}
+        self._started_at = time.perf_counter()
+        self.startup_s = None
+
+    async def step(self, name: str, work: Awaitable, required: bool = False, timeout: float = None) -> bool:
+        """
+        Await one startup step. A step fails by raising (or timing out);
+        a string it returns is kept as detail (e.g. the Green-API state).
+        """
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(work, timeout)
+            ready, detail = True, result if isinstance(result, str) else None
+        except Exception as e:
+            ready, detail = False, str(e) or type(e).__name__
+            log = logger.error if required else logger.warning
+            log("Startup step failed: %s", detail, extra={"step": name})
+        self._checks[name] = {
+            "ready": ready,
+            "required": required,
+            "detail": detail,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+        return ready
+
+    def live(self, name: str, check: Callable[[], bool], required: bool = True):
+        """Register a check evaluated on every /ready (e.g. a worker task is alive)"""
+        self._live[name] = (check, required)
+
+    def finish(self):
+        """Startup done: /ready may now answer 200"""
+        self.startup_s = round(time.perf_counter() - self._started_at, 3)
+        logger.info("Startup finished", extra={"startup_s": self.startup_s,
+                                                "failed": [n for n, c in self._checks.items() if not c["ready"]]})
+
+    def report(self) -> dict:
+        checks = dict(self._checks)
+        for name, (check, required) in self._live.items():
+            checks[name] = {"ready": bool(check()), "required": required}
+        ready = self.startup_s is not None and all(c["ready"] for c in checks.values() if c["required"])
+        return {"ready": ready, "startup_s": self.startup_s, "checks": checks}
+
+
+# Global readiness instance
+readiness = Readiness()
@@ -0,0 +1,102 @@
+"""
+User -> Reports Index
+Keeps each submitter's report ids with a small summary (status, category,
+time) in memory, so "my reports" and the WhatsApp "Status" command are a
+dictionary lookup instead of a scan of the whole 'reports' tree.
+
+Users registered through the app are keyed by mobile number, so the same
+key serves lookups by user id and by phone.
+"""
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
+
+ANONYMOUS = "anonymous"
+
+
+def _summary(report: dict) -> dict:
+    timestamp = report.get('timestamp')
+    if not isinstance(timestamp, (int, float)):
+        # Server timestamp placeholder on a fresh write: close enough for sorting
+        timestamp = int(time.time() * 1000)
+    return {
+        'status': report.get('status'),
+        'category': report.get('category'),
+        'address': report.get('address') or "",
+        'timestamp': timestamp,
+    }
+
+
+class UserReportIndex:
+    """Index from submitter key to {report_id: summary}"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # user key -> report id -> summary
+        self._by_user: Dict[str, Dict[str, dict]] = {}
+        # report id -> user key (to apply status changes)
+        self._owner_of: Dict[str, str] = {}
+        self.is_built = False
+
+    def build(self, reports: Iterable[Tuple[str, dict]]):
+        """(Re)build from (report_id, report) pairs"""
+        by_user: Dict[str, Dict[str, dict]] = {}
+        owner_of: Dict[str, str] = {}
+        for report_id, report in reports:
+            user_id = report.get('userId') if isinstance(report, dict) else None
+            if not user_id or user_id == ANONYMOUS:
+                continue
+            by_user.setdefault(user_id, {})[report_id] = _summary(report)
+            owner_of[report_id] = user_id
+        with self._lock:
+            self._by_user = by_user
+            self._owner_of = owner_of
+            self.is_built = True
+        logger.info("Report index built", extra={"reports": len(owner_of), "users": len(by_user)})
+
+    def add_report(self, report_id: str, report: dict):
+        user_id = report.get('userId')
+        if not user_id or user_id == ANONYMOUS:
+            return
+        with self._lock:
+            self._by_user.setdefault(user_id, {})[report_id] = _summary(report)
+            self._owner_of[report_id] = user_id
+
+    def update_report(self, report_id: str, fields: dict):
+        """Apply a patch of report fields (only indexed ones matter)"""
+        with self._lock:
+            user_id = self._owner_of.get(report_id)
+            if user_id is None:
+                return
+            summary = self._by_user[user_id][report_id]
+            for field in ('status', 'category', 'address'):
+                if field in fields:
+                    summary[field] = fields[field]
+
+    def reports_for(self, user_id: str, status: Optional[str] = None) -> List[dict]:
+        """A user's reports, newest first: [{"id", "status", "category", "address", "timestamp"}]"""
+        with self._lock:
+            reports = [{'id': report_id, **summary}
+                       for report_id, summary in self._by_user.get(user_id, {}).items()
+                       if status is None or summary['status'] == status]
+        reports.sort(key=lambda r: r['timestamp'], reverse=True)
+        return reports
+
+    def has_user(self, user_id: str) -> bool:
+        return user_id in self._by_user
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "built": self.is_built,
+                "users": len(self._by_user),
+                "reports": len(self._owner_of),
+            }
+
+
+# Global report index instance
+user_report_index = UserReportIndex()
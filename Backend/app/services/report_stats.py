@@ -0,0 +1,152 @@
+"""
+Report Statistics
+Dashboard counts (by status, category, area and day) and mean time to
+resolution, kept as in-memory counters. Rebuilt from Firebase at startup and
+adjusted on every report write, so /reports/stats never downloads the
+'reports' tree.
+
+A report's area is the one an admin gave when verifying it ('verifiedArea',
+or 'area' if the report has one); until then it counts as "Unassigned".
+Days are UTC dates of the report's timestamp.
+"""
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
+
+RESOLVED_STATUS = "Resolved"
+UNASSIGNED_AREA = "Unassigned"
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _day(timestamp_ms: int) -> str:
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def _area(report: dict) -> str:
+    area = report.get('area') or report.get('verifiedArea')
+    return area.strip() if isinstance(area, str) and area.strip() else UNASSIGNED_AREA
+
+
+class ReportEntry:
+    """What the counters know about one report"""
+
+    __slots__ = ('status', 'category', 'area', 'created_ms', 'resolved_ms')
+
+    def __init__(self, status, category, area: str, created_ms: int, resolved_ms: Optional[int]):
+        self.status = status
+        self.category = category
+        self.area = area
+        self.created_ms = created_ms
+        self.resolved_ms = resolved_ms
+
+
+class ReportStats:
+    """Counters over all reports, adjusted per write"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, ReportEntry] = {}
+        self._reset()
+        self.is_built = False
+
+    def _reset(self):
+        self.by_status = Counter()
+        self.by_category = Counter()
+        self.by_area = Counter()
+        self.by_day = Counter()
+        self.resolved = 0
+        self.resolution_ms_total = 0
+
+    def _count(self, entry: ReportEntry, sign: int):
+        for counter, key in ((self.by_status, entry.status), (self.by_category, entry.category),
+                             (self.by_area, entry.area), (self.by_day, _day(entry.created_ms))):
+            counter[key] += sign
+            if counter[key] <= 0:
+                del counter[key]
+        if entry.resolved_ms is not None:
+            self.resolved += sign
+            self.resolution_ms_total += sign * max(0, entry.resolved_ms - entry.created_ms)
+
+    @staticmethod
+    def entry(report: dict, resolved_ms: Optional[int] = None) -> ReportEntry:
+        """
+        Counter view of a report. resolved_ms is its solution's solvedAt;
+        resolved reports without one are counted but left out of the MTTR.
+        """
+        created_ms = report.get('timestamp')
+        if not isinstance(created_ms, (int, float)):
+            # Server timestamp placeholder on a fresh write
+            created_ms = _now_ms()
+        status = report.get('status')
+        if status != RESOLVED_STATUS or not isinstance(resolved_ms, (int, float)):
+            resolved_ms = None
+        return ReportEntry(status, report.get('category'), _area(report), int(created_ms), resolved_ms)
+
+    def build(self, entries: Iterable[Tuple[str, ReportEntry]]):
+        """(Re)build from (report_id, entry) pairs"""
+        entries = dict(entries)
+        with self._lock:
+            self._entries = entries
+            self._reset()
+            for entry in entries.values():
+                self._count(entry, 1)
+            self.is_built = True
+        logger.info("Report stats built", extra={"reports": len(entries), "resolved": self.resolved})
+
+    def add_report(self, report_id: str, report: dict):
+        entry = self.entry(report)
+        with self._lock:
+            old = self._entries.get(report_id)
+            if old is not None:
+                self._count(old, -1)
+            self._entries[report_id] = entry
+            self._count(entry, 1)
+
+    def update_report(self, report_id: str, fields: dict):
+        """Apply a patch of report fields (status, category, verifiedArea)"""
+        if not any(field in fields for field in ('status', 'category', 'area', 'verifiedArea')):
+            return
+        with self._lock:
+            entry = self._entries.get(report_id)
+            if entry is None:
+                return
+            self._count(entry, -1)
+            if 'status' in fields:
+                if fields['status'] == RESOLVED_STATUS and entry.status != RESOLVED_STATUS:
+                    entry.resolved_ms = _now_ms()
+                elif fields['status'] != RESOLVED_STATUS:
+                    entry.resolved_ms = None
+                entry.status = fields['status']
+            if 'category' in fields:
+                entry.category = fields['category']
+            if 'area' in fields or 'verifiedArea' in fields:
+                entry.area = _area(fields)
+            self._count(entry, 1)
+
+    def snapshot(self, days: int = 30) -> dict:
+        with self._lock:
+            by_day = sorted(self.by_day.items())[-days:] if days else []
+            mttr_ms = self.resolution_ms_total / self.resolved if self.resolved else None
+            return {
+                "total": len(self._entries),
+                "by_status": dict(self.by_status),
+                "by_category": dict(self.by_category),
+                "by_area": dict(self.by_area),
+                "by_day": dict(by_day),
+                # Resolved reports with a known resolution time
+                "resolution_samples": self.resolved,
+                "mean_time_to_resolution_hours": round(mttr_ms / 3600000, 2) if mttr_ms is not None else None,
+            }
+
+
+# Global report statistics instance
+report_stats = ReportStats()
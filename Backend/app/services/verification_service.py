@@ -0,0 +1,205 @@
+"""
+AI Verification Pipeline
+Reports are saved as "Pending Verification" straight away; the photo is
+queued here and analysed by a small pool of workers (bounded concurrency,
+per-attempt timeout, retries with backoff). The result is patched onto the
+report and pushed to admins and the submitter over WebSocket.
+"""
+import asyncio
+import time
+from typing import List
+
+from app.core.config import settings
+from app.core.log import get_logger
+from app.core.metrics import VERIFICATION_IN_FLIGHT, VERIFICATION_QUEUE_DEPTH
+from app.services.firebase_service import firebase_async
+from app.services.gemini_service import gemini_service
+from app.services.websocket_manager import manager
+
+logger = get_logger(__name__)
+
+PENDING_STATUS = "Pending Verification"
+
+VERIFY_PROMPT = """
+    Analyze this image for civic issues like potholes, garbage, street light issues, or accidents.
+    Answer with a JSON object containing:
+    - "is_civic_issue": boolean
+    - "issue_type": string (e.g., "Pothole", "Garbage", "Traffic", "N/A")
+    - "severity": string ("Low", "Medium", "High")
+    - "description": short description of what you see
+    """
+
+
+def interpret_analysis(ai_analysis: dict) -> dict:
+    """Turn a Gemini reply into the report's status and aiAnalysis fields"""
+    report_status = PENDING_STATUS
+    issue_type = "reported_issue"
+    confidence = 0.0
+
+    if "analysis" in ai_analysis and ai_analysis["analysis"]:
+        text_resp = ai_analysis["analysis"].lower()
+        if "true" in text_resp or "pothole" in text_resp or "garbage" in text_resp:
+            report_status = "Verified"
+            issue_type = "Verified Issue"
+            confidence = 0.95
+
+    return {
+        "status": report_status,
+        "aiAnalysis": {
+            "raw": ai_analysis.get("analysis", ""),
+            "detectedType": issue_type,
+            "confidence": confidence,
+        },
+    }
+
+
+class VerificationJob:
+    """One report photo waiting for analysis"""
+
+    def __init__(self, report_id: str, user_id: str, image_bytes: bytes, mime_type: str, queued_at: float):
+        self.report_id = report_id
+        self.user_id = user_id
+        self.image_bytes = image_bytes
+        self.mime_type = mime_type
+        self.queued_at = queued_at
+
+
+class VerificationPipeline:
+    """Bounded queue of reports waiting for AI analysis, drained by N workers"""
+
+    def __init__(self, workers: int, queue_size: int, timeout: float, max_attempts: int, retry_backoff: float):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks: List[asyncio.Task] = []
+        # Counters
+        self.queued = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.in_flight = 0
+        self._total_wait_s = 0.0
+        self._total_analysis_s = 0.0
+
+    def submit(self, report_id: str, user_id: str, image_bytes: bytes, mime_type: str = "image/jpeg") -> bool:
+        """Queue a report for analysis. False if the queue is full (report stays pending)."""
+        try:
+            self._queue.put_nowait(VerificationJob(report_id, user_id, image_bytes, mime_type, time.monotonic()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logger.warning("Verification queue full, report left for manual review", extra={"report_id": report_id})
+            return False
+        self.queued += 1
+        return True
+
+    async def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers. Reports still queued stay pending for manual review."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if not self._queue.empty():
+            logger.warning("Reports left unverified at shutdown", extra={"reports": self._queue.qsize()})
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            self.in_flight += 1
+            try:
+                await self._process(job)
+            except Exception:
+                self.failed += 1
+                logger.exception("Verification crashed", extra={"report_id": job.report_id})
+            finally:
+                self.in_flight -= 1
+                self._queue.task_done()
+
+    async def _analyze(self, job: VerificationJob) -> dict:
+        """Call the model with a timeout, retrying errors with exponential backoff"""
+        result = {"error": "not attempted"}
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self.retries += 1
+                await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            try:
+                result = await asyncio.wait_for(
+                    gemini_service.analyze_image(job.image_bytes, prompt=VERIFY_PROMPT, mime_type=job.mime_type),
+                    timeout=self.timeout,
+                )
+            except asyncio.TimeoutError:
+                result = {"error": f"timed out after {self.timeout}s"}
+            if "error" not in result:
+                break
+        result["attempts"] = attempt + 1
+        return result
+
+    async def _process(self, job: VerificationJob):
+        self._total_wait_s += time.monotonic() - job.queued_at
+        start = time.monotonic()
+        ai_analysis = await self._analyze(job)
+        self._total_analysis_s += time.monotonic() - start
+        job.image_bytes = b""
+
+        verdict = interpret_analysis(ai_analysis)
+        ai_fields = {**verdict["aiAnalysis"], "attempts": ai_analysis["attempts"]}
+        if "error" in ai_analysis:
+            ai_fields["error"] = ai_analysis["error"]
+            self.failed += 1
+        else:
+            self.completed += 1
+
+        updates = {"aiAnalysis": ai_fields}
+        # Never override a decision an admin made while the model was busy
+        current = await firebase_async.get_report(job.report_id)
+        status = (current or {}).get("status", PENDING_STATUS)
+        if status == PENDING_STATUS:
+            status = verdict["status"]
+            updates["status"] = status
+
+        result = await firebase_async.update_report(job.report_id, updates)
+        if "error" in result:
+            logger.error("Could not save verification: %s", result['error'], extra={"report_id": job.report_id})
+            return
+
+        update = {"event": "report_verified", "reportId": job.report_id, "status": status, "aiAnalysis": ai_fields}
+        await manager.send_admin_update(update)
+        if job.user_id and job.user_id != "anonymous":
+            await manager.send_notification(job.user_id, update)
+
+    @property
+    def is_running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    def stats(self) -> dict:
+        processed = self.completed + self.failed
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize(),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "avg_wait_ms": round(self._total_wait_s / processed * 1000, 1) if processed else 0.0,
+            "avg_analysis_ms": round(self._total_analysis_s / processed * 1000, 1) if processed else 0.0,
+        }
+
+
+verification_pipeline = VerificationPipeline(
+    workers=settings.AI_VERIFY_WORKERS,
+    queue_size=settings.AI_VERIFY_QUEUE_SIZE,
+    timeout=settings.AI_VERIFY_TIMEOUT,
+    max_attempts=settings.AI_VERIFY_MAX_ATTEMPTS,
+    retry_backoff=settings.AI_VERIFY_RETRY_BACKOFF,
+)
+
+VERIFICATION_QUEUE_DEPTH.set_function(verification_pipeline._queue.qsize)
+VERIFICATION_IN_FLIGHT.set_function(lambda: verification_pipeline.in_flight)
@@ -0,0 +1,192 @@
+"""
+WhatsApp Webhook Processing
+The webhook endpoint only checks and queues each Green-API notification and
+acknowledges it at once; a few workers build the replies in the background
+and put them in the WhatsApp outbox. "Status" is answered from the
+user -> reports index. Green-API redelivers a notification it
+did not see acknowledged in time, so recently seen idMessage values are kept
+in a bounded LRU and repeats are dropped.
+"""
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.log import get_logger
+from app.core.metrics import WEBHOOK_QUEUE_DEPTH
+from app.services.firebase_service import firebase_async
+from app.services.report_index import user_report_index
+from app.services.whatsapp_outbox import whatsapp_outbox
+
+logger = get_logger(__name__)
+
+# Reports listed in a "Status" reply
+STATUS_REPLY_LIMIT = 5
+
+
+def _incoming_text(message_data: dict) -> str:
+    # safely extract text
+    if isinstance(message_data.get("textMessageData"), dict):
+        text = message_data["textMessageData"].get("textMessage", "")
+    else:
+        text = message_data.get("textMessage", "")
+    if not text:
+        # Try checking extendedTextMessage (sometimes used for replies)
+        text = message_data.get("extendedTextMessageData", {}).get("text", "")
+    return text
+
+
+def incoming_message(data: dict) -> Optional[Tuple[str, str, str]]:
+    """(phone_number, sender_name, text) of an incoming message, or None if there is nothing to answer"""
+    message_data = data.get("messageData", {})
+    chat_id = message_data.get("chatId", "")
+    sender_name = message_data.get("senderData", {}).get("senderName", "Unknown")
+
+    # Extract phone number from chatId (e.g., "919876543210@c.us" -> "919876543210")
+    phone_number = chat_id.split("@")[0]
+    incoming_text = _incoming_text(message_data)
+    if not phone_number or not incoming_text:
+        return None
+    return phone_number, sender_name, incoming_text
+
+
+async def status_reply(phone_number: str) -> str:
+    """The sender's latest reports, from the user -> reports index"""
+    user_key = phone_number
+    if not user_report_index.has_user(user_key):
+        # Registered under another key with this mobile number
+        user_key, _ = await firebase_async.get_user_by_mobile(phone_number)
+    reports = user_report_index.reports_for(user_key) if user_key else []
+    if not reports:
+        return "📭 We could not find any reports from this number.\n\nType 'Report' to file a complaint."
+
+    lines = [
+        f"• {report['category'] or 'Issue'} - *{report['status']}* "
+        f"({datetime.fromtimestamp(report['timestamp'] / 1000).strftime('%d %b')})"
+        for report in reports[:STATUS_REPLY_LIMIT]
+    ]
+    more = len(reports) - STATUS_REPLY_LIMIT
+    if more > 0:
+        lines.append(f"…and {more} more in the Nagar Alert App.")
+    return f"📋 *Your Reports* ({len(reports)})\n\n" + "\n".join(lines)
+
+
+async def build_reply(phone_number: str, sender_name: str, incoming_text: str) -> str:
+    logger.debug("WhatsApp message received", extra={"phone": phone_number, "sender": sender_name, "text": incoming_text})
+    text = incoming_text.lower()
+
+    if "status" in text:
+        return await status_reply(phone_number)
+    if "hello" in text or "hi" in text:
+        return f"👋 Hello {sender_name}!\n\nWelcome to Nagar Alert Hub.\n\nType 'Report' to file a complaint.\nType 'Status' to check your reports."
+    if "report" in text:
+        return "📸 To report an incident, please open the Nagar Alert App and use the 'Report Incident' feature for verified location tracking."
+    # Default Echo
+    return f"🤖 You said: '{incoming_text}'.\n\nI am an automated bot. Type 'Hello' to see options."
+
+
+class WebhookProcessor:
+    """Bounded queue of incoming notifications with idMessage de-duplication"""
+
+    def __init__(self, workers: int, queue_size: int, dedup_size: int):
+        self.workers = workers
+        self.dedup_size = dedup_size
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks: List[asyncio.Task] = []
+        # idMessage -> None, least recently seen first
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        # Counters
+        self.accepted = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+
+    def _remember(self, message_id: str):
+        self._seen[message_id] = None
+        if len(self._seen) > self.dedup_size:
+            self._seen.popitem(last=False)
+
+    def accept(self, data: dict) -> str:
+        """
+        Queue one incoming-message notification.
+        Returns "accepted", "duplicate" or "busy" (queue full; not marked
+        as seen, so Green-API's redelivery is processed).
+        """
+        message_id = data.get("idMessage")
+        if message_id and message_id in self._seen:
+            self._seen.move_to_end(message_id)
+            self.duplicates += 1
+            return "duplicate"
+        try:
+            self._queue.put_nowait(data)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return "busy"
+        if message_id:
+            self._remember(message_id)
+        self.accepted += 1
+        return "accepted"
+
+    async def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Finish what is queued, then stop the workers"""
+        if self._tasks:
+            await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self):
+        while True:
+            data = await self._queue.get()
+            try:
+                await self._process(data)
+                self.processed += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Webhook processing failed")
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, data: dict):
+        message = incoming_message(data)
+        if message is None:
+            return
+        phone_number = message[0]
+        text = await build_reply(*message)
+        message_id = data.get("idMessage")
+        # The outbox de-duplicates too, across restarts
+        await whatsapp_outbox.enqueue(
+            "reply", [phone_number], text, dedup_key=f"reply:{message_id}" if message_id else None
+        )
+
+    @property
+    def is_running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize(),
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dedup_entries": len(self._seen),
+        }
+
+
+webhook_processor = WebhookProcessor(
+    workers=settings.WEBHOOK_WORKERS,
+    queue_size=settings.WEBHOOK_QUEUE_SIZE,
+    dedup_size=settings.WEBHOOK_DEDUP_SIZE,
+)
+
+WEBHOOK_QUEUE_DEPTH.set_function(webhook_processor._queue.qsize)
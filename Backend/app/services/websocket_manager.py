@@ -2,106 +2,489 @@
 WebSocket Manager for Real-Time Alert Broadcasting
 Handles WebSocket connections and manages alert notifications
 """
-from typing import List, Set, Dict
+from typing import Deque, List, Optional, Set, Dict, Tuple
+from collections import deque
+import asyncio
 import json
+import time
+import uuid
 from fastapi import WebSocket
 from datetime import datetime
+from app.core.config import settings
+from app.core.log import get_logger
+from app.core.ws_auth import verify_admin_token
+from app.core.metrics import (
+    ALERT_RECIPIENTS, WS_ADMIN_CONNECTIONS, WS_CONNECTIONS, WS_OUTBOUND_QUEUED, WS_SUBSCRIBED_AREAS,
+    WS_SUBSCRIPTIONS,
+)
+from app.services.area_index import normalize_area
+from app.services.backplane import Backplane, create_backplane
+from app.services.change_log import change_log
+from app.services.collection_versions import collection_versions
+from app.services.firebase_service import firebase_async, firebase_service
+from app.services.geo_index import user_geo_index
+
+logger = get_logger(__name__)
+
+BACKPLANE_CHANNELS = ["alert", "notification", "location", "admin", "presence", "versions", "changes"]
+
+
+class ClientConnection:
+    """
+    One WebSocket plus its bounded outbound queue.
+    A dedicated writer task drains the queue, so broadcasters only enqueue
+    and a stalled peer never blocks the alert path.
+    
+    Overflow policy (see settings):
+    - Message types in WS_QUEUE_DROP_OLDEST_TYPES (location updates) are
+      dropped oldest-first to make room
+    - Everything else (alerts, notifications) is never dropped
+    - If the queue stays full for WS_QUEUE_FULL_DISCONNECT_AFTER seconds
+      the client is disconnected
+    """
+    
+    def __init__(self, manager: "ConnectionManager", user_id: str, websocket: WebSocket):
+        self.manager = manager
+        self.user_id = user_id
+        self.websocket = websocket
+        # Looked up from the user record on connect; never taken from the client
+        self.role = "user"
+        # Admin map bounds (min_lat, min_lng, max_lat, max_lng); None = everywhere
+        self.viewport: Optional[Tuple[float, float, float, float]] = None
+        self.queue: Deque[Tuple[str, str]] = deque()
+        self.dropped = 0
+        self.full_since: Optional[float] = None
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+    
+    def start(self):
+        self._writer = asyncio.create_task(self._write_loop())
+    
+    def stop(self):
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+    
+    def _drop_oldest(self, droppable: Set[str]) -> bool:
+        for i, (msg_type, _) in enumerate(self.queue):
+            if msg_type in droppable:
+                del self.queue[i]
+                self.dropped += 1
+                return True
+        return False
+    
+    def enqueue(self, msg_type: str, text: str) -> bool:
+        """Queue a serialized message. Never blocks. Returns False if dropped."""
+        maxsize = settings.WS_QUEUE_MAXSIZE
+        droppable = set(settings.WS_QUEUE_DROP_OLDEST_TYPES)
+        
+        if len(self.queue) >= maxsize:
+            now = time.monotonic()
+            if self.full_since is None:
+                self.full_since = now
+            elif now - self.full_since > settings.WS_QUEUE_FULL_DISCONNECT_AFTER:
+                logger.warning("Outbound queue stayed full, disconnecting", extra={"user_id": self.user_id})
+                self.manager._evict(self)
+                return False
+            
+            if not self._drop_oldest(droppable) and msg_type in droppable:
+                self.dropped += 1
+                return False
+        
+        self.queue.append((msg_type, text))
+        self._ready.set()
+        return True
+    
+    async def _write_loop(self):
+        try:
+            while True:
+                while not self.queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                _, text = self.queue.popleft()
+                await asyncio.wait_for(self.websocket.send_text(text), timeout=settings.WS_SEND_TIMEOUT)
+                if len(self.queue) < settings.WS_QUEUE_MAXSIZE:
+                    self.full_since = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info("WebSocket send failed: %r", e, extra={"user_id": self.user_id})
+            self.manager._evict(self)
+    
+    @property
+    def is_admin(self) -> bool:
+        return self.role == "admin"
+    
+    def stats(self) -> dict:
+        return {"role": self.role, "depth": len(self.queue), "dropped": self.dropped}
 
 
 class ConnectionManager:
-    """Manages WebSocket connections for real-time updates"""
+    """
+    Manages WebSocket connections for real-time updates.
+    
+    Broadcasts go through a pub/sub backplane: every worker (this one
+    included) receives the message and delivers it to its own sockets.
     
-    def __init__(self):
+    Location updates are only for admins: positions are collected and sent
+    every WS_LOCATION_FRAME_INTERVAL seconds as one delta frame holding the
+    users that moved, filtered by each admin's viewport.
+    """
+    
+    def __init__(self, backplane: Backplane = None):
         # Store active connections with user_id as key
-        self.active_connections: Dict[str, WebSocket] = {}
+        self.active_connections: Dict[str, ClientConnection] = {}
         # Map user_id to their subscribed areas
         self.user_subscriptions: Dict[str, List[str]] = {}
+        # Reverse index: normalized area -> subscribed user_ids
+        self.area_connections: Dict[str, Set[str]] = {}
+        
+        self.node_id = uuid.uuid4().hex[:12]
+        self.backplane = backplane or create_backplane()
+        # Last presence report of every worker, keyed by node_id
+        self.cluster_nodes: Dict[str, dict] = {}
+        self._presence_task: Optional[asyncio.Task] = None
+        
+        # Positions reported to this worker, published once per frame interval
+        self._location_changes: Dict[str, Tuple[float, float]] = {}
+        # Cluster-wide positions waiting for the next frame to local admins
+        self._location_outgoing: Dict[str, Tuple[float, float]] = {}
+        self._location_task: Optional[asyncio.Task] = None
+        self.location_frames_sent = 0
+    
+    async def start(self):
+        """
+        Start announcing presence and join the backplane (app startup).
+        The local tasks start first, so they run even when waiting for the
+        backplane is given up on.
+        """
+        self._presence_task = asyncio.create_task(self._presence_loop())
+        self._location_task = asyncio.create_task(self._location_loop())
+        if self.backplane.is_distributed:
+            # Other workers must stop answering 304 for collections written here,
+            # and log the changes so their /changes sees every write
+            loop = asyncio.get_running_loop()
+            collection_versions.on_bump = lambda names: loop.call_soon_threadsafe(self._share_versions, names)
+            change_log.on_record = lambda changes: loop.call_soon_threadsafe(self._share_changes, changes)
+        await self.backplane.start(self._on_backplane_message, BACKPLANE_CHANNELS)
+        logger.info("WebSocket node joined backplane",
+                    extra={"node_id": self.node_id, "backplane": type(self.backplane).__name__})
+    
+    async def stop(self):
+        collection_versions.on_bump = None
+        change_log.on_record = None
+        if self._presence_task is not None:
+            self._presence_task.cancel()
+            self._presence_task = None
+        if self._location_task is not None:
+            self._location_task.cancel()
+            self._location_task = None
+        await self.backplane.stop()
+    
+    async def _publish(self, channel: str, payload: dict):
+        """Send through the backplane; deliver locally if it is unavailable"""
+        if self.backplane.is_running:
+            try:
+                await self.backplane.publish(channel, payload)
+                return
+            except Exception as e:
+                logger.warning("Backplane publish failed, delivering locally only: %s", e)
+        await self._on_backplane_message(channel, payload)
+    
+    async def _on_backplane_message(self, channel: str, payload: dict):
+        """Deliver a cluster message to the sockets held by this worker"""
+        if channel == "alert":
+            self._deliver_alert(payload["message"], payload.get("target_area"), payload.get("target_users"))
+        elif channel == "notification":
+            self._deliver_notification(payload["user_id"], payload["message"])
+        elif channel == "location":
+            self._merge_locations(payload["node_id"], payload["changes"])
+        elif channel == "admin":
+            self._deliver_admin(payload["message"])
+        elif channel == "presence":
+            is_new = payload["node_id"] not in self.cluster_nodes
+            self.cluster_nodes[payload["node_id"]] = {**payload, "seen_at": time.monotonic()}
+            # Introduce ourselves to a newly started worker right away
+            if is_new and payload["node_id"] != self.node_id:
+                asyncio.create_task(self._publish("presence", self._local_presence()))
+        elif channel == "versions":
+            if payload["node_id"] != self.node_id:
+                collection_versions.bump(payload["collections"], share=False)
+        elif channel == "changes":
+            if payload["node_id"] != self.node_id:
+                change_log.record_many(((c["collection"], c["id"], c["op"], c["data"]) for c in payload["changes"]),
+                                       share=False)
+                # Keep this worker's indexes in step with writes made elsewhere
+                firebase_service.apply_remote_changes(payload["changes"])
     
-    async def connect(self, websocket: WebSocket, user_id: str):
-        """Accept and register a new WebSocket connection"""
+    def _share_versions(self, names: List[str]):
+        """Announce a local collection write to the other workers"""
+        asyncio.create_task(self._publish("versions", {"node_id": self.node_id, "collections": names}))
+    
+    def _share_changes(self, changes: List[dict]):
+        """Relay locally logged record changes to the other workers"""
+        asyncio.create_task(self._publish("changes", {"node_id": self.node_id, "changes": changes}))
+    
+    def _local_presence(self) -> dict:
+        return {
+            "node_id": self.node_id,
+            "connections": len(self.active_connections),
+            "subscribed_areas": len(self.area_connections),
+            "queued_messages": sum(len(c.queue) for c in self.active_connections.values()),
+        }
+    
+    async def _presence_loop(self):
+        while True:
+            try:
+                await self._publish("presence", self._local_presence())
+            except Exception as e:
+                logger.warning("Presence publish failed: %s", e)
+            await asyncio.sleep(settings.WS_PRESENCE_INTERVAL)
+    
+    async def connect(self, websocket: WebSocket, user_id: str, admin_token: str = None):
+        """
+        Accept and register a new WebSocket connection. The admin role needs
+        a valid admin token for this user, and is then checked in the database.
+        """
         await websocket.accept()
-        self.active_connections[user_id] = websocket
-        print(f"✅ User {user_id} connected. Total connections: {len(self.active_connections)}")
+        role = await self._lookup_role(user_id) if verify_admin_token(admin_token, user_id) else "user"
+        previous = self.active_connections.get(user_id)
+        if previous is not None:
+            # Same user reconnected; retire the old socket but keep subscriptions
+            previous.stop()
+            asyncio.create_task(self._close_quietly(previous.websocket))
+        
+        connection = ClientConnection(self, user_id, websocket)
+        connection.role = role
+        self.active_connections[user_id] = connection
+        connection.start()
+        logger.debug("WebSocket connected",
+                     extra={"user_id": user_id, "role": role, "connections": len(self.active_connections)})
     
-    def disconnect(self, user_id: str):
-        """Remove a disconnected user"""
-        if user_id in self.active_connections:
+    @staticmethod
+    async def _lookup_role(user_id: str) -> str:
+        try:
+            user = await firebase_async.get_user(user_id)
+        except Exception as e:
+            logger.warning("Role lookup failed: %s", e, extra={"user_id": user_id})
+            return "user"
+        if isinstance(user, dict) and user.get('role') == "admin":
+            return "admin"
+        return "user"
+    
+    def disconnect(self, user_id: str, websocket: WebSocket = None):
+        """
+        Remove a disconnected user.
+        Pass the websocket to ignore stale disconnects after a reconnect.
+        """
+        connection = self.active_connections.get(user_id)
+        if connection is not None and websocket is not None and connection.websocket is not websocket:
+            return
+        if connection is not None:
+            connection.stop()
             del self.active_connections[user_id]
-        if user_id in self.user_subscriptions:
-            del self.user_subscriptions[user_id]
-        print(f"❌ User {user_id} disconnected. Total connections: {len(self.active_connections)}")
+        self._unindex_subscriptions(user_id)
+        logger.debug("WebSocket disconnected", extra={"user_id": user_id, "connections": len(self.active_connections)})
+    
+    def _unindex_subscriptions(self, user_id: str):
+        for area in self.user_subscriptions.pop(user_id, []):
+            subscribers = self.area_connections.get(normalize_area(area))
+            if subscribers is not None:
+                subscribers.discard(user_id)
+                if not subscribers:
+                    del self.area_connections[normalize_area(area)]
     
     async def subscribe_to_area(self, user_id: str, areas: List[str]):
-        """Subscribe a user to alerts in specific areas"""
+        """Subscribe a user to alerts in specific areas (replaces previous subscription)"""
+        self._unindex_subscriptions(user_id)
         self.user_subscriptions[user_id] = areas
-        print(f"📍 User {user_id} subscribed to areas: {areas}")
+        for area in areas:
+            clean_area = normalize_area(area)
+            if clean_area:
+                self.area_connections.setdefault(clean_area, set()).add(user_id)
+        logger.debug("Subscribed to areas", extra={"user_id": user_id, "areas": areas})
+    
+    def _evict(self, connection: ClientConnection):
+        """Drop a slow/dead socket without waiting on it"""
+        self.disconnect(connection.user_id, connection.websocket)
+        connection.stop()
+        asyncio.create_task(self._close_quietly(connection.websocket))
     
-    async def broadcast_alert(self, alert_data: dict, target_area: str = None):
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket):
+        try:
+            await asyncio.wait_for(websocket.close(), timeout=settings.WS_SEND_TIMEOUT)
+        except Exception:
+            pass
+    
+    def send_personal(self, user_id: str, message: dict) -> bool:
+        """Queue a direct reply (e.g. pong, subscription confirmation) for one user"""
+        connection = self.active_connections.get(user_id)
+        if connection is None:
+            return False
+        return connection.enqueue(message.get("type", ""), json.dumps(message))
+    
+    async def broadcast_alert(self, alert_data: dict, target_area: str = None, target_users: List[str] = None):
         """
         Broadcast an alert to all connected users
         If target_area is provided, only broadcast to users subscribed to that area
+        target_users (e.g. users near the incident) are alerted as well
         """
         message = {
             "type": "alert",
             "timestamp": datetime.now().isoformat(),
             "data": alert_data
         }
+        await self._publish("alert", {"message": message, "target_area": target_area, "target_users": target_users})
+    
+    def _deliver_alert(self, message: dict, target_area: str = None, target_users: List[str] = None):
+        # Serialize once for every local recipient
+        text = json.dumps(message)
         
-        disconnected_users = []
-        
-        for user_id, websocket in self.active_connections.items():
-            try:
-                # Check if user is subscribed to this area
-                if target_area:
-                    subscribed_areas = self.user_subscriptions.get(user_id, [])
-                    if target_area.lower() not in [area.lower() for area in subscribed_areas]:
-                        continue
-                
-                await websocket.send_json(message)
-                print(f"📤 Alert sent to {user_id}")
-            except Exception as e:
-                print(f"❌ Error sending to {user_id}: {e}")
-                disconnected_users.append(user_id)
+        if target_area or target_users:
+            user_ids = set(self.area_connections.get(normalize_area(target_area), ())) if target_area else set()
+            user_ids.update(target_users or ())
+            recipients = [self.active_connections[uid] for uid in user_ids if uid in self.active_connections]
+        else:
+            recipients = list(self.active_connections.values())
         
-        # Clean up disconnected users
-        for user_id in disconnected_users:
-            self.disconnect(user_id)
+        # Enqueue only; each connection's writer delivers at its own pace
+        queued = sum(1 for connection in recipients if connection.enqueue("alert", text))
+        ALERT_RECIPIENTS.labels("websocket").inc(queued)
+        logger.debug("Alert queued for WebSocket clients", extra={"queued": queued, "recipients": len(recipients)})
     
     async def send_location_update(self, user_id: str, location_data: dict):
-        """Broadcast location update to admin users"""
-        message = {
-            "type": "location_update",
-            "user_id": user_id,
-            "timestamp": datetime.now().isoformat(),
-            "data": location_data
-        }
-        
-        # Only send to admin users for now
-        for admin_id, websocket in self.active_connections.items():
+        """
+        Queue a user's position for the admin location stream.
+        Only the latest position per user goes into the next delta frame.
+        """
+        self._location_changes[user_id] = (location_data["latitude"], location_data["longitude"])
+    
+    def set_viewport(self, user_id: str, bounds: Optional[dict]) -> Optional[List[dict]]:
+        """
+        Restrict an admin's location stream to a bounding box (None clears it).
+        Returns the users currently inside the new viewport, or None if the
+        connection is not an admin's.
+        """
+        connection = self.active_connections.get(user_id)
+        if connection is None or not connection.is_admin:
+            return None
+        if not bounds:
+            connection.viewport = None
+            return []
+        min_lat, min_lng = float(bounds["min_lat"]), float(bounds["min_lng"])
+        max_lat, max_lng = float(bounds["max_lat"]), float(bounds["max_lng"])
+        if min_lat > max_lat or min_lng > max_lng:
+            raise ValueError("min_lat/min_lng must not exceed max_lat/max_lng")
+        connection.viewport = (min_lat, min_lng, max_lat, max_lng)
+        return [
+            {"userId": uid, "latitude": lat, "longitude": lng}
+            for uid, lat, lng in user_geo_index.within_bbox(min_lat, min_lng, max_lat, max_lng)
+        ]
+    
+    def _merge_locations(self, node_id: str, changes: List[list]):
+        # Other workers' positions keep this worker's geo index current too
+        if node_id != self.node_id:
+            for user_id, lat, lng in changes:
+                user_geo_index.upsert(user_id, lat, lng)
+        if not any(c.is_admin for c in self.active_connections.values()):
+            return
+        for user_id, lat, lng in changes:
+            self._location_outgoing[user_id] = (lat, lng)
+    
+    async def _location_loop(self):
+        while True:
+            await asyncio.sleep(settings.WS_LOCATION_FRAME_INTERVAL)
             try:
-                await websocket.send_json(message)
+                if self._location_changes:
+                    changes, self._location_changes = self._location_changes, {}
+                    await self._publish("location", {
+                        "node_id": self.node_id,
+                        "changes": [[uid, lat, lng] for uid, (lat, lng) in changes.items()],
+                    })
+                self._send_location_frames()
             except Exception as e:
-                print(f"Error sending location to {admin_id}: {e}")
+                logger.warning("Location frame failed: %s", e)
     
-    async def send_notification(self, user_id: str, notification: dict):
-        """Send a notification to a specific user"""
-        if user_id not in self.active_connections:
-            print(f"User {user_id} not connected")
-            return False
+    def _send_location_frames(self):
+        """One delta frame per admin with the users that moved since the last one"""
+        if not self._location_outgoing:
+            return
+        changes, self._location_outgoing = self._location_outgoing, {}
+        timestamp = datetime.now().isoformat()
+        
+        def frame(items) -> str:
+            return json.dumps({
+                "type": "location_delta",
+                "timestamp": timestamp,
+                "users": [{"userId": uid, "latitude": lat, "longitude": lng} for uid, (lat, lng) in items],
+            })
         
+        unfiltered_text = None
+        for connection in list(self.active_connections.values()):
+            if not connection.is_admin:
+                continue
+            if connection.viewport is None:
+                # Serialize once for every admin watching the whole map
+                if unfiltered_text is None:
+                    unfiltered_text = frame(changes.items())
+                text = unfiltered_text
+            else:
+                min_lat, min_lng, max_lat, max_lng = connection.viewport
+                visible = [
+                    (uid, point) for uid, point in changes.items()
+                    if min_lat <= point[0] <= max_lat and min_lng <= point[1] <= max_lng
+                ]
+                if not visible:
+                    continue
+                text = frame(visible)
+            if connection.enqueue("location_delta", text):
+                self.location_frames_sent += 1
+    
+    async def send_notification(self, user_id: str, notification: dict):
+        """
+        Send a notification to a specific user.
+        With a distributed backplane the user may sit on another worker, so
+        the message is handed to the cluster and True means "published".
+        """
         message = {
             "type": "notification",
             "timestamp": datetime.now().isoformat(),
             "data": notification
         }
         
-        try:
-            await self.active_connections[user_id].send_json(message)
+        if self.backplane.is_distributed and self.backplane.is_running:
+            await self._publish("notification", {"user_id": user_id, "message": message})
             return True
-        except Exception as e:
-            print(f"Error sending notification to {user_id}: {e}")
-            self.disconnect(user_id)
+        
+        if user_id not in self.active_connections:
+            logger.debug("Notification for offline user", extra={"user_id": user_id})
             return False
+        return self._deliver_notification(user_id, message)
+    
+    def _deliver_notification(self, user_id: str, message: dict) -> bool:
+        connection = self.active_connections.get(user_id)
+        if connection is None:
+            return False
+        return connection.enqueue("notification", json.dumps(message))
+    
+    async def send_admin_update(self, update: dict):
+        """Push a dashboard update (e.g. a report's AI verdict) to every connected admin"""
+        message = {
+            "type": "report_update",
+            "timestamp": datetime.now().isoformat(),
+            "data": update
+        }
+        await self._publish("admin", {"message": message})
+    
+    def _deliver_admin(self, message: dict):
+        text = json.dumps(message)
+        for connection in list(self.active_connections.values()):
+            if connection.is_admin:
+                connection.enqueue("report_update", text)
+    
+    def get_admin_count(self) -> int:
+        """Connected admins receiving the location stream"""
+        return sum(1 for c in self.active_connections.values() if c.is_admin)
     
     def get_connected_users_count(self) -> int:
         """Get count of connected users"""
@@ -110,7 +493,39 @@ class ConnectionManager:
     def get_connected_users(self) -> List[str]:
         """Get list of connected user IDs"""
         return list(self.active_connections.keys())
+    
+    def get_queue_stats(self) -> Dict[str, dict]:
+        """Outbound queue depth and drop count per connected user"""
+        return {user_id: connection.stats() for user_id, connection in self.active_connections.items()}
+    
+    def get_cluster_status(self) -> dict:
+        """Connection counts across all workers that reported presence recently"""
+        expiry = settings.WS_PRESENCE_INTERVAL * 3
+        now = time.monotonic()
+        nodes = {
+            node_id: info for node_id, info in self.cluster_nodes.items()
+            if node_id != self.node_id and now - info["seen_at"] <= expiry
+        }
+        nodes[self.node_id] = self._local_presence()
+        
+        return {
+            "node_id": self.node_id,
+            "backplane": type(self.backplane).__name__,
+            "nodes": len(nodes),
+            "connected_users": sum(info["connections"] for info in nodes.values()),
+            "queued_messages": sum(info["queued_messages"] for info in nodes.values()),
+            "per_node": {
+                node_id: {"connections": info["connections"], "queued_messages": info["queued_messages"]}
+                for node_id, info in nodes.items()
+            },
+        }
 
 
 # Global connection manager instance
 manager = ConnectionManager()
+
+WS_CONNECTIONS.set_function(manager.get_connected_users_count)
+WS_ADMIN_CONNECTIONS.set_function(manager.get_admin_count)
+WS_SUBSCRIPTIONS.set_function(lambda: sum(len(areas) for areas in manager.user_subscriptions.values()))
+WS_SUBSCRIBED_AREAS.set_function(lambda: len(manager.area_connections))
+WS_OUTBOUND_QUEUED.set_function(lambda: sum(len(c.queue) for c in manager.active_connections.values()))
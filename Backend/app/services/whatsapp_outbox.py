@@ -0,0 +1,384 @@
+"""
+WhatsApp Outbox
+Every outgoing WhatsApp message (area alerts, admin notifications, webhook
+replies) is written to a local SQLite outbox first and sent by a background
+dispatcher, so callers return immediately with a job id and nothing is lost
+if the process dies halfway through a broadcast.
+
+- Messages are claimed in batches and sent through the pooled, rate limited
+  `whatsapp_sender`; failures are retried with exponential backoff up to
+  WHATSAPP_OUTBOX_MAX_ATTEMPTS.
+- (dedup_key, phone) is unique, so enqueueing the same thing twice (a retried
+  webhook, a phone listed twice) sends it once.
+- Several workers may share one outbox file. A batch is claimed in one
+  write transaction and leased to the claiming worker for
+  WHATSAPP_OUTBOX_LEASE_S; rows whose lease ran out (their worker crashed)
+  are claimed again by any worker (at-least-once delivery).
+- Area alerts held for a digest window are stored here too (`digests`), so
+  a restart inside the window does not lose them.
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Iterable, List, Optional
+
+from app.core.config import settings
+from app.core.log import get_logger
+from app.core.metrics import OUTBOX_PENDING, WHATSAPP_DELIVERY_SECONDS
+from app.services.whatsapp_service import whatsapp_sender
+
+logger = get_logger(__name__)
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+
+class WhatsAppOutbox:
+    """Durable queue of WhatsApp messages, drained by one dispatcher task"""
+
+    def __init__(self, path: str, batch_size: int, max_attempts: int, backoff: float,
+                 max_backoff: float, poll_interval: float, retention: float, lease: float):
+        self.path = path
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.lease = lease
+        # Marks the rows this process has claimed
+        self.owner = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # Counters (this process)
+        self.enqueued = 0
+        self.deduplicated = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        # Queued or sending, kept in memory for the metrics gauge
+        self.pending = 0
+
+    # --- storage (blocking; called through asyncio.to_thread) ---
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT, created_at REAL, meta TEXT)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT, dedup_key TEXT, phone TEXT,"
+                " body TEXT, status TEXT, attempts INTEGER DEFAULT 0, next_attempt_at REAL,"
+                " last_error TEXT, updated_at REAL, owner TEXT, lease_until REAL, UNIQUE (dedup_key, phone))"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(messages)")}
+            for column, kind in (("owner", "TEXT"), ("lease_until", "REAL")):
+                if column not in columns:
+                    # Outbox files written before claims were leased
+                    conn.execute(f"ALTER TABLE messages ADD COLUMN {column} {kind}")
+            conn.execute("CREATE INDEX IF NOT EXISTS messages_due ON messages (status, next_attempt_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS messages_job ON messages (job_id, status)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS digests ("
+                " job_id TEXT PRIMARY KEY, area TEXT, opened_at REAL, issues TEXT)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _recover(self) -> int:
+        """Requeue messages whose lease ran out (their worker died mid-send), drop old history"""
+        with self._lock:
+            conn = self._db()
+            recovered = conn.execute(
+                "UPDATE messages SET status = ?, owner = NULL WHERE status = ?"
+                " AND (lease_until IS NULL OR lease_until < ?)",
+                (PENDING, SENDING, time.time()),
+            ).rowcount
+            cutoff = time.time() - self.retention
+            conn.execute(
+                "DELETE FROM messages WHERE status IN (?, ?) AND updated_at < ?", (SENT, FAILED, cutoff)
+            )
+            conn.execute(
+                "DELETE FROM jobs WHERE created_at < ? AND id NOT IN (SELECT job_id FROM messages)", (cutoff,)
+            )
+            conn.commit()
+            return recovered
+
+    def _insert(self, job_id: str, kind: str, phones: List[str], body: str,
+                dedup_key: Optional[str], meta: Optional[str]) -> dict:
+        now = time.time()
+        key = dedup_key or job_id
+        with self._lock:
+            conn = self._db()
+            inserted = 0
+            for phone in phones:
+                inserted += conn.execute(
+                    "INSERT OR IGNORE INTO messages (job_id, dedup_key, phone, body, status, next_attempt_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, key, phone, body, PENDING, now, now),
+                ).rowcount
+            if not inserted and phones and dedup_key:
+                # Everything was enqueued before: report the original job
+                row = conn.execute("SELECT job_id FROM messages WHERE dedup_key = ? LIMIT 1", (key,)).fetchone()
+                conn.commit()
+                return {"job_id": row[0], "queued": 0, "duplicates": len(phones)}
+            # OR IGNORE: a digest re-sent after a crash reuses its job id
+            conn.execute("INSERT OR IGNORE INTO jobs VALUES (?, ?, ?, ?)", (job_id, kind, now, meta))
+            conn.commit()
+            return {"job_id": job_id, "queued": inserted, "duplicates": len(phones) - inserted}
+
+    def _claim(self) -> List[tuple]:
+        """
+        Lease a batch of due messages to this worker. BEGIN IMMEDIATE takes the
+        file's write lock before the SELECT, so two workers never claim the
+        same row; expired leases are due again.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT m.id, m.phone, m.body, m.attempts, j.kind, j.created_at"
+                    " FROM messages m LEFT JOIN jobs j ON j.id = m.job_id"
+                    " WHERE (m.status = ? AND m.next_attempt_at <= ?)"
+                    " OR (m.status = ? AND (m.lease_until IS NULL OR m.lease_until < ?))"
+                    " ORDER BY m.next_attempt_at, m.id LIMIT ?",
+                    (PENDING, now, SENDING, now, self.batch_size),
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE messages SET status = ?, owner = ?, lease_until = ? WHERE id = ?",
+                    [(SENDING, self.owner, now + self.lease, row[0]) for row in rows],
+                )
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            return rows
+
+    def _release(self) -> int:
+        """Hand the rows this worker has claimed back to the queue (shutdown)"""
+        with self._lock:
+            conn = self._db()
+            released = conn.execute(
+                "UPDATE messages SET status = ?, owner = NULL, lease_until = NULL WHERE status = ? AND owner = ?",
+                (PENDING, SENDING, self.owner),
+            ).rowcount
+            conn.commit()
+            return released
+
+    def _complete(self, outcomes: List[tuple]):
+        """outcomes: (message_id, attempts_so_far, ok)"""
+        now = time.time()
+        updates = []
+        for message_id, attempts, ok in outcomes:
+            attempts += 1
+            if ok:
+                updates.append((SENT, attempts, now, None, now, message_id))
+            elif attempts >= self.max_attempts:
+                updates.append((FAILED, attempts, now, "send failed", now, message_id))
+            else:
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+                updates.append((PENDING, attempts, now + delay, "send failed", now, message_id))
+        with self._lock:
+            conn = self._db()
+            # Only rows still leased to this worker: an expired lease may have been claimed again
+            conn.executemany(
+                "UPDATE messages SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, updated_at = ?,"
+                " owner = NULL, lease_until = NULL WHERE id = ? AND owner = ?",
+                [update + (self.owner,) for update in updates],
+            )
+            conn.commit()
+
+    def _next_due(self) -> Optional[float]:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT MIN(next_attempt_at) FROM messages WHERE status = ?", (PENDING,)
+            ).fetchone()
+            return row[0]
+
+    def _job(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            conn = self._db()
+            job = conn.execute("SELECT kind, created_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            counts = dict(conn.execute(
+                "SELECT status, COUNT(*) FROM messages WHERE job_id = ? GROUP BY status", (job_id,)
+            ).fetchall())
+            last_update = conn.execute(
+                "SELECT MAX(updated_at) FROM messages WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+        total = sum(counts.values())
+        done = counts.get(SENT, 0) + counts.get(FAILED, 0)
+        if done < total:
+            state = "in_progress" if done or counts.get(SENDING) else "queued"
+        else:
+            state = "completed_with_failures" if counts.get(FAILED) else "completed"
+        return {
+            "job_id": job_id,
+            "kind": job[0],
+            "state": state,
+            "total": total,
+            "sent": counts.get(SENT, 0),
+            "failed": counts.get(FAILED, 0),
+            "pending": counts.get(PENDING, 0) + counts.get(SENDING, 0),
+            "created_at": int(job[1] * 1000),
+            "updated_at": int(last_update * 1000) if last_update else None,
+        }
+
+    def _save_digest(self, job_id: str, area: str, opened_at: float, issues: List[dict]):
+        with self._lock:
+            conn = self._db()
+            conn.execute("INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?)",
+                         (job_id, area, opened_at, json.dumps(issues)))
+            conn.commit()
+
+    def _delete_digest(self, job_id: str):
+        with self._lock:
+            conn = self._db()
+            conn.execute("DELETE FROM digests WHERE job_id = ?", (job_id,))
+            conn.commit()
+
+    def _load_digests(self) -> List[tuple]:
+        with self._lock:
+            rows = self._db().execute("SELECT job_id, area, opened_at, issues FROM digests").fetchall()
+        return [(job_id, area, opened_at, json.loads(issues)) for job_id, area, opened_at, issues in rows]
+
+    def _counts(self) -> dict:
+        with self._lock:
+            return dict(self._db().execute("SELECT status, COUNT(*) FROM messages GROUP BY status").fetchall())
+
+    # --- async API ---
+    async def enqueue(self, kind: str, phones: Iterable[str], message: str,
+                      dedup_key: str = None, meta: str = None, job_id: str = None) -> dict:
+        """
+        Store a message for each phone and return straight away.
+        Returns {"job_id", "queued", "duplicates"}.
+        """
+        phones = list(dict.fromkeys(p for p in phones if p))
+        job_id = job_id or uuid.uuid4().hex
+        result = await asyncio.to_thread(self._insert, job_id, kind, phones, message, dedup_key, meta)
+        self.enqueued += result["queued"]
+        self.pending += result["queued"]
+        self.deduplicated += result["duplicates"]
+        if result["queued"] and self._wakeup is not None:
+            self._wakeup.set()
+        return result
+
+    async def save_digest(self, job_id: str, area: str, opened_at: float, issues: List[dict]):
+        """Store (or replace) an area digest that is waiting for its window to close"""
+        await asyncio.to_thread(self._save_digest, job_id, area, opened_at, issues)
+
+    async def delete_digest(self, job_id: str):
+        """Forget a stored digest once its messages are enqueued"""
+        await asyncio.to_thread(self._delete_digest, job_id)
+
+    async def load_digests(self) -> List[tuple]:
+        """(job_id, area, opened_at, issues) of digests a previous run did not send"""
+        return await asyncio.to_thread(self._load_digests)
+
+    async def job_status(self, job_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self._job, job_id)
+
+    async def start(self):
+        if self._task is None:
+            recovered = await asyncio.to_thread(self._recover)
+            if recovered:
+                logger.info("WhatsApp outbox resuming interrupted messages", extra={"messages": recovered})
+            counts = await asyncio.to_thread(self._counts)
+            self.pending = counts.get(PENDING, 0)
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop dispatching. Unsent messages stay in the outbox for the next start."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            await asyncio.to_thread(self._release)
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def _run(self):
+        while True:
+            try:
+                batch = await asyncio.to_thread(self._claim)
+                if batch:
+                    await self._send_batch(batch)
+                    continue
+                next_due = await asyncio.to_thread(self._next_due)
+            except Exception as e:
+                logger.error("WhatsApp outbox error: %s", e)
+                next_due = None
+            timeout = self.poll_interval if next_due is None else min(
+                self.poll_interval, max(0.0, next_due - time.time())
+            )
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send_batch(self, batch: List[tuple]):
+        results = await asyncio.gather(*(whatsapp_sender.send(phone, body) for _, phone, body, *_ in batch))
+        now = time.time()
+        outcomes = []
+        for (message_id, _, _, attempts, kind, created_at), ok in zip(batch, results):
+            outcomes.append((message_id, attempts, ok))
+            if ok:
+                self.sent += 1
+            elif attempts + 1 >= self.max_attempts:
+                self.failed += 1
+            else:
+                self.retried += 1
+                continue
+            self.pending -= 1
+            if created_at is not None:
+                WHATSAPP_DELIVERY_SECONDS.labels(kind, "sent" if ok else "failed").observe(now - created_at)
+        await asyncio.to_thread(self._complete, outcomes)
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def stats(self) -> dict:
+        counts = await asyncio.to_thread(self._counts)
+        return {
+            "queued": counts.get(PENDING, 0),
+            "sending": counts.get(SENDING, 0),
+            "sent_total": counts.get(SENT, 0),
+            "failed_total": counts.get(FAILED, 0),
+            "enqueued": self.enqueued,
+            "deduplicated": self.deduplicated,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+
+whatsapp_outbox = WhatsAppOutbox(
+    path=settings.WHATSAPP_OUTBOX_PATH,
+    batch_size=settings.WHATSAPP_OUTBOX_BATCH_SIZE,
+    max_attempts=settings.WHATSAPP_OUTBOX_MAX_ATTEMPTS,
+    backoff=settings.WHATSAPP_OUTBOX_BACKOFF,
+    max_backoff=settings.WHATSAPP_OUTBOX_MAX_BACKOFF,
+    poll_interval=settings.WHATSAPP_OUTBOX_POLL_INTERVAL,
+    retention=settings.WHATSAPP_OUTBOX_RETENTION,
+    lease=settings.WHATSAPP_OUTBOX_LEASE_S,
+)
+
+OUTBOX_PENDING.set_function(lambda: max(0, whatsapp_outbox.pending))
@@ -1,21 +1,44 @@
-import requests
+import asyncio
+import time
+from typing import Iterable, Optional
+
+import httpx
 from app.core.config import settings
+from app.core.log import get_logger
+from app.core.metrics import GREEN_API_SEND_SECONDS
+
+logger = get_logger(__name__)
+
+
+def _send_message_url() -> str:
+    return f"{settings.GREEN_API_HOST}/waInstance{settings.GREEN_API_ID_INSTANCE}/sendMessage/{settings.GREEN_API_API_TOKEN}"
+
+
+def _state_url() -> str:
+    return f"{settings.GREEN_API_HOST}/waInstance{settings.GREEN_API_ID_INSTANCE}/getStateInstance/{settings.GREEN_API_API_TOKEN}"
+
+
+def _format_chat_id(phone_number: str):
+    """Green-API needs '919876543210@c.us'. Returns (clean_phone, chat_id)."""
+    clean_phone = phone_number.replace("+", "").strip()
+    return clean_phone, f"{clean_phone}@c.us"
+
 
 def send_green_alert(phone_number: str, message: str) -> bool:
     """
     Sends a text message via Green-API (WhatsApp).
+    Blocking - use `whatsapp_sender` from async code paths.
     """
     # 1. Check if keys are set
     if not settings.GREEN_API_ID_INSTANCE or not settings.GREEN_API_API_TOKEN:
-        print("⚠️ Green-API Credentials missing in .env")
+        logger.warning("Green-API credentials missing in .env")
         return False
 
     # 2. Prepare URL
-    url = f"https://api.green-api.com/waInstance{settings.GREEN_API_ID_INSTANCE}/sendMessage/{settings.GREEN_API_API_TOKEN}"
+    url = _send_message_url()
 
-    # 3. Format Phone Number (Green-API needs '919876543210@c.us')
-    clean_phone = phone_number.replace("+", "").strip()
-    chat_id = f"{clean_phone}@c.us"
+    # 3. Format Phone Number
+    clean_phone, chat_id = _format_chat_id(phone_number)
 
     payload = {
         "chatId": chat_id,
@@ -27,16 +50,149 @@ def send_green_alert(phone_number: str, message: str) -> bool:
     }
 
     try:
-        # 4. Send Request
+        # 4. Send Request (requests is only needed by this legacy path)
+        import requests
         response = requests.post(url, headers=headers, json=payload)
         
         if response.status_code == 200:
-            print(f"✅ WhatsApp sent to {clean_phone}")
+            logger.debug("WhatsApp sent", extra={"phone": clean_phone})
             return True
         else:
-            print(f"❌ Failed to send to {clean_phone}: {response.text}")
+            logger.warning("WhatsApp send failed", extra={"phone": clean_phone, "status": response.status_code,
+                                                          "response": response.text[:200]})
             return False
             
     except Exception as e:
-        print(f"⚠️ WhatsApp Service Error: {e}")
-        return False
\ No newline at end of file
+        logger.warning("WhatsApp send error: %s", e)
+        return False
+
+
+class TokenBucket:
+    """
+    Async token bucket limiter.
+    Refills `rate` tokens per second and holds at most `capacity` tokens,
+    so short bursts are allowed while the long-run rate matches the quota.
+    A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class AsyncWhatsAppSender:
+    """
+    Non-blocking Green-API sender for bulk alerts.
+    - One pooled keep-alive HTTP client shared by all sends
+    - Semaphore caps in-flight requests
+    - Token bucket keeps us inside the Green-API quota
+    - Every send is bounded by a timeout
+    """
+
+    def __init__(self, max_concurrency: int, rate_per_sec: float, burst: int, timeout: float):
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._bucket = TokenBucket(rate_per_sec, burst)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Created lazily so it binds to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+                headers={'Content-Type': 'application/json'},
+            )
+        return self._client
+
+    async def send(self, phone_number: str, message: str) -> bool:
+        """Send one WhatsApp message. Returns True on HTTP 200."""
+        if not settings.GREEN_API_ID_INSTANCE or not settings.GREEN_API_API_TOKEN:
+            logger.warning("Green-API credentials missing in .env")
+            return False
+
+        clean_phone, chat_id = _format_chat_id(phone_number)
+        payload = {"chatId": chat_id, "message": message}
+
+        start = time.perf_counter()
+        async with self._semaphore:
+            await self._bucket.acquire()
+            try:
+                response = await asyncio.wait_for(
+                    self._get_client().post(_send_message_url(), json=payload),
+                    timeout=self.timeout,
+                )
+            except asyncio.TimeoutError:
+                GREEN_API_SEND_SECONDS.labels("timeout").observe(time.perf_counter() - start)
+                logger.warning("WhatsApp send timed out", extra={"phone": clean_phone})
+                return False
+            except Exception as e:
+                GREEN_API_SEND_SECONDS.labels("error").observe(time.perf_counter() - start)
+                logger.warning("WhatsApp send error: %s", e, extra={"phone": clean_phone})
+                return False
+
+        ok = response.status_code == 200
+        GREEN_API_SEND_SECONDS.labels("sent" if ok else "failed").observe(time.perf_counter() - start)
+        if ok:
+            logger.debug("WhatsApp sent", extra={"phone": clean_phone})
+            return True
+        logger.warning("WhatsApp send failed", extra={"phone": clean_phone, "status": response.status_code,
+                                                      "response": response.text[:200]})
+        return False
+
+    async def warm(self, connections: int) -> str:
+        """
+        Open keep-alive connections before the first alert (app startup).
+        Returns the instance state Green-API reports (e.g. "authorized").
+        """
+        if not settings.GREEN_API_ID_INSTANCE or not settings.GREEN_API_API_TOKEN:
+            raise RuntimeError("Green-API credentials missing in .env")
+        client = self._get_client()
+        count = max(1, min(connections, self.max_concurrency))
+        responses = await asyncio.gather(*(client.get(_state_url()) for _ in range(count)))
+        responses[0].raise_for_status()
+        return responses[0].json().get("stateInstance", "unknown")
+
+    async def send_many(self, phone_numbers: Iterable[str], message: str) -> dict:
+        """Fan the same message out to many phones concurrently"""
+        results = await asyncio.gather(*(self.send(phone, message) for phone in phone_numbers))
+        sent = sum(1 for ok in results if ok)
+        return {"sent": sent, "failed": len(results) - sent}
+
+    async def aclose(self):
+        """Close the pooled HTTP client (called on app shutdown)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Global sender instance
+whatsapp_sender = AsyncWhatsAppSender(
+    max_concurrency=settings.GREEN_API_MAX_CONCURRENCY,
+    rate_per_sec=settings.GREEN_API_RATE_LIMIT_PER_SEC,
+    burst=settings.GREEN_API_RATE_LIMIT_BURST,
+    timeout=settings.GREEN_API_SEND_TIMEOUT,
+)
@@ -0,0 +1,126 @@
+"""
+Benchmark: what one admin socket receives from the live location stream.
+
+N citizens report a position every --period seconds. The old broadcast sent
+one location_update per report to every socket (citizens included); the
+admin stream sends each admin one delta frame per WS_LOCATION_FRAME_INTERVAL.
+Reports messages/s and bytes/s delivered per admin and the total number of
+messages queued across all sockets.
+
+Run from the Backend folder:
+    python -m benchmarks.bench_admin_locations --citizens 100 1000 5000 --duration 3
+"""
+import argparse
+import asyncio
+import json
+import random
+from datetime import datetime
+
+from app.core.config import settings
+from app.core.ws_auth import issue_admin_token
+from app.services.backplane import InMemoryBackplane
+from app.services.websocket_manager import ConnectionManager
+
+
+class CountingSocket:
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.messages += 1
+        self.bytes += len(text)
+
+    async def close(self):
+        pass
+
+
+def old_broadcast_cost(citizens: int, reports: int, sample_message: str):
+    """Old path: every report serialized once and queued for every socket"""
+    sockets = citizens + 1
+    return {
+        "admin_msgs": reports,
+        "admin_bytes": reports * len(sample_message),
+        "total_queued": reports * sockets,
+    }
+
+
+async def run(citizens: int, admins: int, period: float, duration: float, viewport: bool):
+    manager = ConnectionManager(InMemoryBackplane())
+
+    async def lookup_role(user_id):
+        return "admin" if user_id.startswith("admin") else "user"
+    manager._lookup_role = lookup_role
+    await manager.start()
+
+    admin_sockets = []
+    for a in range(admins):
+        socket = CountingSocket()
+        admin_sockets.append(socket)
+        await manager.connect(socket, f"admin{a}", admin_token=issue_admin_token(f"admin{a}"))
+        if viewport:
+            # Quarter of the city visible
+            manager.set_viewport(f"admin{a}", {"min_lat": 21.20, "min_lng": 81.58, "max_lat": 21.25, "max_lng": 81.63})
+    citizen_sockets = []
+    for c in range(citizens):
+        socket = CountingSocket()
+        citizen_sockets.append(socket)
+        await manager.connect(socket, f"9{c:09d}")
+
+    rng = random.Random(3)
+    reports = 0
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    while loop.time() - start < duration:
+        for c in range(citizens):
+            await manager.send_location_update(f"9{c:09d}", {
+                "latitude": 21.20 + rng.uniform(0, 0.1), "longitude": 81.58 + rng.uniform(0, 0.1),
+            })
+            reports += 1
+        await asyncio.sleep(period)
+    # Let the last frame go out
+    await asyncio.sleep(0.1 + settings.WS_LOCATION_FRAME_INTERVAL)
+    await manager.stop()
+
+    sample = json.dumps({
+        "type": "location_update", "user_id": "9000000000", "timestamp": datetime.now().isoformat(),
+        "data": {"latitude": 21.212345678, "longitude": 81.612345678},
+    })
+    old = old_broadcast_cost(citizens, reports, sample)
+    admin = admin_sockets[0]
+    return {
+        "citizens": citizens,
+        "reports": reports,
+        "old_admin_msgs_per_s": round(old["admin_msgs"] / duration, 1),
+        "old_admin_kb_per_s": round(old["admin_bytes"] / duration / 1024, 1),
+        "old_total_msgs_queued": old["total_queued"],
+        "new_admin_msgs_per_s": round(admin.messages / duration, 1),
+        "new_admin_kb_per_s": round(admin.bytes / duration / 1024, 1),
+        "new_total_msgs_queued": sum(s.messages for s in admin_sockets + citizen_sockets),
+        "citizen_msgs": sum(s.messages for s in citizen_sockets),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--citizens", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--admins", type=int, default=3)
+    parser.add_argument("--period", type=float, default=1.0, help="Seconds between reports per citizen")
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--viewport", action="store_true", help="Admins watch a quarter of the city")
+    args = parser.parse_args()
+
+    # Admin sockets need a signed token
+    settings.WS_ADMIN_TOKEN_SECRET = settings.WS_ADMIN_TOKEN_SECRET or "bench"
+    results = [
+        asyncio.run(run(n, args.admins, args.period, args.duration, args.viewport))
+        for n in args.citizens
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: the Webadmin polling GET /reports/ and GET /users/active.
+
+Against a FakeDatabase holding N reports and N users, each endpoint is
+polled three ways:
+- plain:        standard-library JSON, no compression (the old responses)
+- full:         fast encoder + gzip, no ETag sent (first poll, or after a write)
+- not_modified: If-None-Match with the last ETag (nothing written since)
+Reports median latency and bytes on the wire per poll.
+
+Run from the Backend folder:
+    python -m benchmarks.bench_admin_polls --sizes 1000 10000 --polls 20
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+import httpx
+
+from app.core import json_stream
+from app.services.firebase_service import firebase_service
+from benchmarks.fake_firebase import FakeDatabase
+
+CATEGORIES = ["Pothole", "Garbage", "Streetlight", "Water Logging", "Traffic"]
+AREAS = ["Sector 4", "Civil Lines", "Shankar Nagar", "Telibandha", "Pandri"]
+
+
+def build_data(size: int) -> dict:
+    rng = random.Random(7)
+    reports, users = {}, {}
+    for i in range(size):
+        mobile = f"91{9000000000 + i}"
+        reports[f"r{i:07d}"] = {
+            "id": f"r{i:07d}", "userId": mobile, "timestamp": 1700000000000 + i * 1000,
+            "category": rng.choice(CATEGORIES), "status": rng.choice(["Pending", "Verified", "Resolved"]),
+            "description": "Reported issue near the main road, needs attention", "severity": "Medium",
+            "imageUrl": f"https://storage.example.com/reports/r{i:07d}.jpg",
+            "location": {"latitude": 21.2 + rng.random() / 10, "longitude": 81.6 + rng.random() / 10},
+        }
+        users[mobile] = {
+            "firstName": "Citizen", "lastName": str(i), "mobile": mobile, "role": "user",
+            "area": rng.choice(AREAS), "email": f"user{i}@example.com",
+            "location": {"latitude": 21.2 + rng.random() / 10, "longitude": 81.6 + rng.random() / 10},
+        }
+    return {"reports": reports, "users": users, "solutions": {}}
+
+
+async def poll(client: httpx.AsyncClient, url: str, polls: int, headers: dict) -> dict:
+    times, sizes, status = [], [], None
+    for _ in range(polls):
+        sent = 0
+        start = time.perf_counter()
+        async with client.stream("GET", url, headers=headers) as response:
+            async for chunk in response.aiter_raw():
+                sent += len(chunk)
+        times.append((time.perf_counter() - start) * 1000)
+        sizes.append(sent)
+        status = response.status_code
+    return {"status": status, "ms": round(statistics.median(times), 2), "bytes": int(statistics.median(sizes))}
+
+
+async def run(size: int, polls: int, latency: float) -> dict:
+    from app.main import app
+
+    firebase_service.db = FakeDatabase(data=build_data(size), latency=latency)
+    transport = httpx.ASGITransport(app=app)
+    result = {"size": size}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, url in (("reports", "/api/v1/reports/"), ("users", "/api/v1/users/active")):
+            fast = json_stream.orjson
+            json_stream.orjson = None
+            plain = await poll(client, url, polls, {"Accept-Encoding": "identity"})
+            json_stream.orjson = fast
+            full = await poll(client, url, polls, {"Accept-Encoding": "gzip"})
+            etag = (await client.get(url)).headers["etag"]
+            not_modified = await poll(client, url, polls, {"Accept-Encoding": "gzip", "If-None-Match": etag})
+            result[name] = {"plain": plain, "full": full, "not_modified": not_modified}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Admin list polling benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--polls", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated Firebase round trip (s)")
+    args = parser.parse_args()
+    print(json.dumps([asyncio.run(run(size, args.polls, args.latency)) for size in args.sizes], indent=2))
+
+
+if __name__ == "__main__":
+    main()
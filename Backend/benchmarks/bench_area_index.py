@@ -0,0 +1,79 @@
+"""
+Benchmark: full users-tree scan vs the area -> recipients index.
+
+Run from the Backend folder:
+    python -m benchmarks.bench_area_index --sizes 100000 1000000 --areas 500
+"""
+import argparse
+import json
+import random
+import time
+
+from app.services.area_index import AreaIndex
+
+
+def make_users(count: int, areas: int) -> dict:
+    rng = random.Random(42)
+    names = [f"Sector {i}" for i in range(areas)]
+    return {
+        f"91{7000000000 + i}": {
+            "firstName": "User",
+            "area": rng.choice(names).upper() if i % 3 == 0 else rng.choice(names),
+            "location": {"latitude": 21.25, "longitude": 81.63},
+        }
+        for i in range(count)
+    }
+
+
+def scan(all_users: dict, incident_area: str) -> list:
+    """The pre-index targeting loop from broadcast_alert_to_area"""
+    clean_incident_area = incident_area.lower().strip()
+    target_phones = []
+    for phone, data in all_users.items():
+        if isinstance(data, dict):
+            if data.get('area', '').lower().strip() == clean_incident_area:
+                target_phones.append(phone)
+    return target_phones
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--areas", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        users = make_users(size, args.areas)
+        index = AreaIndex()
+        _, build_time = timed(lambda: index.build(users), 1)
+
+        scanned, scan_time = timed(lambda: scan(users, "sector 7"), args.repeat)
+        indexed, lookup_time = timed(lambda: index.phones_for("sector 7"), args.repeat)
+        assert sorted(scanned) == sorted(indexed)
+
+        _, update_time = timed(lambda: index.update_user("917000000001", {"area": "Sector 9"}), 1000)
+
+        results.append({
+            "users": size,
+            "recipients": len(indexed),
+            "build_s": round(build_time, 3),
+            "scan_ms": round(scan_time * 1000, 3),
+            "index_lookup_ms": round(lookup_time * 1000, 4),
+            "update_us": round(update_time * 1e6, 2),
+            "speedup": round(scan_time / lookup_time, 1),
+        })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: cross-worker alert fan-out through the Redis backplane.
+
+Boots a fake Redis plus several ConnectionManager "nodes" in one process,
+attaches fake sockets to each node and measures how long an alert raised on
+node 0 takes to reach every socket in the cluster.
+
+Run from the Backend folder:
+    python -m benchmarks.bench_backplane --nodes 4 --clients 500 --alerts 20
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from app.core.config import settings
+from app.services import websocket_manager
+from app.services.backplane import RedisBackplane
+from app.services.websocket_manager import ConnectionManager
+from benchmarks.fake_redis import FakeRedis
+
+
+class FakeSocket:
+    def __init__(self, on_alert):
+        self.on_alert = on_alert
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        message = json.loads(text)
+        if message["type"] == "alert":
+            self.on_alert(message["data"]["seq"])
+
+    async def close(self):
+        pass
+
+
+async def run(nodes: int, clients: int, alerts: int):
+    redis = await FakeRedis().start()
+    managers = []
+    for _ in range(nodes):
+        manager = ConnectionManager(RedisBackplane(redis.url, settings.WS_BACKPLANE_CHANNEL_PREFIX))
+        await manager.start()
+        managers.append(manager)
+
+    received = {}
+    pending = {}
+
+    def on_alert(seq):
+        received[seq] = received.get(seq, 0) + 1
+        if received[seq] == nodes * clients:
+            pending[seq].set_result(time.perf_counter())
+
+    for n, manager in enumerate(managers):
+        for c in range(clients):
+            user_id = f"node{n}-user{c}"
+            await manager.connect(FakeSocket(on_alert), user_id)
+            await manager.subscribe_to_area(user_id, ["Sector 4"])
+
+    # Let presence reports go round
+    await asyncio.sleep(0.2)
+    cluster = managers[-1].get_cluster_status()
+
+    latencies = []
+    for seq in range(alerts):
+        pending[seq] = asyncio.get_running_loop().create_future()
+        start = time.perf_counter()
+        await managers[0].broadcast_alert({"seq": seq}, target_area="Sector 4")
+        done = await asyncio.wait_for(pending[seq], timeout=10)
+        latencies.append((done - start) * 1000)
+
+    for manager in managers:
+        await manager.stop()
+    await redis.stop()
+
+    return {
+        "nodes": nodes,
+        "clients_per_node": clients,
+        "cluster_status_nodes": cluster["nodes"],
+        "cluster_connected_users": cluster["connected_users"],
+        "alerts": alerts,
+        "fanout_ms_p50": round(statistics.median(latencies), 2),
+        "fanout_ms_max": round(max(latencies), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--alerts", type=int, default=20)
+    args = parser.parse_args()
+
+    # Keep connection chatter out of the output
+    websocket_manager.print = lambda *a, **k: None
+    print(json.dumps(asyncio.run(run(args.nodes, args.clients, args.alerts)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
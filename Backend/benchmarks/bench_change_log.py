@@ -0,0 +1,103 @@
+"""
+Benchmark: catching up with /changes instead of refetching the lists.
+
+Against a FakeDatabase holding N reports and N users, each round writes a
+few report status changes and a batch of location updates (as the location
+buffer does), then the client catches up two ways:
+- refetch: GET /reports/ + GET /users/active (what clients did before)
+- delta:   GET /changes?since=<next>&epoch=<epoch>
+Reports median latency and bytes on the wire per catch-up, plus the time of
+one update_report through FirebaseService (indexes, versions and change log;
+the fake database itself is in memory).
+
+Run from the Backend folder:
+    python -m benchmarks.bench_change_log --sizes 1000 10000 --rounds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from app.services.change_log import change_log
+from app.services.firebase_service import firebase_service
+from benchmarks.bench_admin_polls import build_data
+from benchmarks.fake_firebase import FakeDatabase
+
+
+async def fetch(client: httpx.AsyncClient, url: str, **params) -> tuple:
+    start = time.perf_counter()
+    response = await client.get(url, params=params, headers={"Accept-Encoding": "gzip"})
+    return response, (time.perf_counter() - start) * 1000, response.num_bytes_downloaded
+
+
+async def run(size: int, rounds: int, status_writes: int, movers: int) -> dict:
+    from app.main import app
+
+    data = build_data(size)
+    report_ids, user_ids = list(data["reports"]), list(data["users"])
+    firebase_service.db = FakeDatabase(data=data)
+    rng = random.Random(11)
+    refetch_ms, refetch_bytes, delta_ms, delta_bytes, update_us = [], [], [], [], []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        head = (await client.get("/api/v1/changes/")).json()
+        since, epoch = head["next"], head["epoch"]
+        for _ in range(rounds):
+            for report_id in rng.sample(report_ids, status_writes):
+                start = time.perf_counter()
+                firebase_service.update_report(report_id, {"status": "Verified"})
+                update_us.append((time.perf_counter() - start) * 1e6)
+            firebase_service.update_multi({
+                f"users/{user_id}/location": {"latitude": 21.2 + rng.random() / 10, "longitude": 81.6 + rng.random() / 10}
+                for user_id in rng.sample(user_ids, movers)
+            })
+
+            total_ms = total_bytes = 0
+            for url in ("/api/v1/reports/", "/api/v1/users/active"):
+                _, ms, sent = await fetch(client, url)
+                total_ms += ms
+                total_bytes += sent
+            refetch_ms.append(total_ms)
+            refetch_bytes.append(total_bytes)
+
+            response, ms, sent = await fetch(client, "/api/v1/changes/", since=since, epoch=epoch)
+            body = response.json()
+            assert not body["resync"], body
+            since = body["next"]
+            delta_ms.append(ms)
+            delta_bytes.append(sent)
+
+    median = statistics.median
+    return {
+        "size": size,
+        "writes_per_round": status_writes + movers,
+        "refetch": {"ms": round(median(refetch_ms), 2), "bytes": int(median(refetch_bytes))},
+        "delta": {"ms": round(median(delta_ms), 2), "bytes": int(median(delta_bytes))},
+        "update_report_us": round(median(update_us), 1),
+        "change_log": change_log.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Change log catch-up benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--status-writes", type=int, default=5, help="report updates per round")
+    parser.add_argument("--movers", type=int, default=50, help="location updates per round")
+    args = parser.parse_args()
+
+    change_log.path = os.path.join(tempfile.mkdtemp(), "change_log.sqlite3")
+    asyncio.run(change_log.start())
+    results = [asyncio.run(run(size, args.rounds, args.status_writes, args.movers)) for size in args.sizes]
+    change_log.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark: cold start of a worker.
+
+Each run starts a fresh Python process that boots app.main:app under uvicorn
+(with a FakeDatabase and a FakeGreenAPIProcess in place of Firebase and
+Green-API) and measures:
+- import_s: `import app.main` in a fresh interpreter
+- ready_s: process spawn -> first HTTP answer (uvicorn only listens once
+  the lifespan startup has finished)
+- first_upload_ms / first_login_ms / first_verify_ms: the first requests
+  after startup, which pay for anything left to be created lazily
+
+Run from the Backend folder:
+    python -m benchmarks.bench_cold_start --runs 5
+"""
+import argparse
+import io
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.fake_green_api import FakeGreenAPIProcess
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+
+def child(port: int, green_api_url: str):
+    """The measured worker process"""
+    sys.stdout = open(os.devnull, "w")
+    from app.core.config import settings
+    settings.GREEN_API_HOST = green_api_url
+    settings.GREEN_API_ID_INSTANCE = settings.GREEN_API_ID_INSTANCE or "bench"
+    settings.GREEN_API_API_TOKEN = settings.GREEN_API_API_TOKEN or "bench"
+    settings.WHATSAPP_OUTBOX_PATH = ":memory:"
+    settings.GEMINI_CACHE_ENABLED = False
+    settings.ALERT_DIGEST_WINDOW_S = 0
+    import uvicorn
+    from app.services.firebase_service import firebase_service
+    from app.services import whatsapp_outbox
+    from benchmarks.fake_firebase import FakeDatabase
+
+    whatsapp_outbox.whatsapp_outbox.path = ":memory:"
+    firebase_service.db = FakeDatabase(data={"users": {
+        "919000000001": {"mobile": "919000000001", "password": "bench", "area": "Sector 4"},
+    }}, latency=0.02)
+    uvicorn.run("app.main:app", host="127.0.0.1", port=port, log_level="warning")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _photo() -> bytes:
+    from PIL import Image
+    out = io.BytesIO()
+    Image.new("RGB", (1200, 900), (90, 120, 150)).save(out, "JPEG")
+    return out.getvalue()
+
+
+def measure_import() -> float:
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def measure_start(green_api_url: str, photo: bytes) -> dict:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "benchmarks.bench_cold_start", "--child", str(port), green_api_url])
+    try:
+        with httpx.Client(base_url=base, timeout=30) as client:
+            while True:
+                try:
+                    client.get("/")
+                    break
+                except httpx.TransportError:
+                    if proc.poll() is not None:
+                        raise RuntimeError("server exited during startup")
+                    time.sleep(0.005)
+            ready_s = time.perf_counter() - start
+
+            def timed(method, url, **kwargs):
+                t = time.perf_counter()
+                response = client.request(method, url, **kwargs)
+                response.raise_for_status()
+                return response, round((time.perf_counter() - t) * 1000, 1)
+
+            report, upload_ms = timed("POST", "/api/v1/reports/submit",
+                                      files={"file": ("photo.jpg", photo, "image/jpeg")},
+                                      data={"latitude": 21.25, "longitude": 81.63, "user_id": "919000000001"})
+            _, login_ms = timed("POST", "/api/v1/users/login", json={"mobile": "919000000001", "password": "bench"})
+            _, verify_ms = timed("PATCH", f"/api/v1/reports/{report.json()['reportId']}/verify",
+                                 data={"status": "Verified", "area": "Sector 4", "severity": "High"})
+            ready = client.get("/ready")
+            checks = ready.json().get("checks") if ready.status_code in (200, 503) else None
+        return {"ready_s": round(ready_s, 3), "first_upload_ms": upload_ms, "first_login_ms": login_ms,
+                "first_verify_ms": verify_ms, "ready_status": ready.status_code, "checks": checks}
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", nargs=2, metavar=("PORT", "GREEN_API_URL"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(int(args.child[0]), args.child[1])
+        return
+
+    photo = _photo()
+    imports = [measure_import() for _ in range(args.runs)]
+    with FakeGreenAPIProcess(latency=0.05) as green_api:
+        starts = [measure_start(green_api.url, photo) for _ in range(args.runs)]
+
+    median = lambda key: statistics.median(run[key] for run in starts)
+    print(json.dumps({
+        "runs": args.runs,
+        "import_s": round(statistics.median(imports), 3),
+        "ready_s": median("ready_s"),
+        "first_upload_ms": median("first_upload_ms"),
+        "first_login_ms": median("first_login_ms"),
+        "first_verify_ms": median("first_verify_ms"),
+        "ready_status": starts[-1]["ready_status"],
+        "checks": starts[-1]["checks"],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
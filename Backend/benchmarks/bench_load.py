@@ -0,0 +1,343 @@
+"""
+Load test: the whole backend under a realistic request mix.
+
+Boots app.main:app under uvicorn in a child process against local stand-ins
+(FakeDatabase for Firebase, FakeGreenAPIProcess for WhatsApp, FakeGeminiModel
+for AI verification), connects --ws-clients WebSocket clients subscribed to
+the alert area, then drives an open-loop mix of:
+    submit    POST  /reports/submit        (photo upload)
+    verify    PATCH /reports/{id}/verify   (area alert -> WebSocket + WhatsApp)
+    login     POST  /users/login
+    location  POST  /users/update-location
+at --rps for --duration seconds.
+
+Prints (and with --output, writes) one JSON document: per-operation
+p50/p95/p99 latency, error count and throughput, WebSocket connect times,
+alert fan-out time (verify sent -> alert on every subscribed socket) and the
+server's own stats, so runs can be compared over time.
+
+Run from the Backend folder:
+    python -m benchmarks.bench_load --ws-clients 2000 --rps 50 --duration 30
+"""
+import argparse
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import time
+
+import httpx
+import websockets
+
+from benchmarks.fake_green_api import FakeGreenAPIProcess
+
+AREA = "Sector 4"
+PASSWORD = "bench"
+# Reports are spread over ~10 km so most of them start their own incident
+CENTER = (21.25, 81.63)
+SPREAD_DEG = 0.05
+
+
+def _phone(i: int) -> str:
+    return f"91900{i:07d}"
+
+
+def seed_data(users: int) -> dict:
+    """Residents of AREA, registered the way /users/register stores them"""
+    return {"users": {
+        _phone(i): {
+            "firstName": "Bench", "lastName": str(i), "mobile": _phone(i), "password": PASSWORD,
+            "role": "user", "area": AREA,
+            "location": {"latitude": CENTER[0], "longitude": CENTER[1]},
+        } for i in range(users)
+    }}
+
+
+def make_photo() -> bytes:
+    """Small JPEG (or opaque bytes without Pillow: preprocessing passes them through)"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return b"\xff\xd8\xff\xe0bench-photo" + os.urandom(20000)
+    out = io.BytesIO()
+    Image.frombytes("RGB", (320, 240), os.urandom(320 * 240 * 3)).save(out, "JPEG", quality=80)
+    return out.getvalue()
+
+
+def serve(port: int, opts: dict):
+    """Child process: the real app with local stand-ins"""
+    if not opts["server_logs"]:
+        sys.stdout = open(os.devnull, "w")
+    import uvicorn
+    from app.core.config import settings
+    settings.GREEN_API_HOST = opts["green_api_url"]
+    settings.GREEN_API_ID_INSTANCE = settings.GREEN_API_ID_INSTANCE or "bench"
+    settings.GREEN_API_API_TOKEN = settings.GREEN_API_API_TOKEN or "bench"
+    settings.GREEN_API_RATE_LIMIT_PER_SEC = opts["whatsapp_rate"]
+    settings.WHATSAPP_OUTBOX_PATH = ":memory:"
+    settings.GEMINI_CACHE_ENABLED = False
+    settings.ALERT_DIGEST_WINDOW_S = opts["digest_window"]
+
+    from app.services.firebase_service import firebase_service
+    from app.services.gemini_service import gemini_service
+    from app.main import app
+    from benchmarks.fake_firebase import FakeDatabase
+    from benchmarks.fake_gemini import FakeGeminiModel
+
+    firebase_service.db = FakeDatabase(data=seed_data(opts["users"]), latency=opts["firebase_latency"])
+    gemini_service.model = FakeGeminiModel(latency=opts["gemini_latency"], error_rate=opts["gemini_error_rate"])
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", ws_max_queue=64)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentiles(samples) -> dict:
+    if not samples:
+        return {"count": 0}
+    samples = sorted(samples)
+    pick = lambda q: round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 2)
+    return {"count": len(samples), "p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99),
+            "max_ms": round(samples[-1] * 1000, 2)}
+
+
+class LoadRun:
+    """Client side of one run: WebSocket fleet, request mix and measurements"""
+
+    def __init__(self, base_url: str, args):
+        self.base_url = base_url
+        self.ws_url = base_url.replace("http://", "ws://") + "/api/v1/ws/"
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.photo = make_photo()
+        self.latencies = {op: [] for op in args.mix}
+        self.errors = {op: 0 for op in args.mix}
+        self.reports = []
+        # incident id -> verify send time, and -> alert arrival times
+        self.alert_sent = {}
+        self.alert_arrivals = {}
+        self.ws_connect = []
+        self.ws_clients = 0
+        self._sockets = []
+
+    # --- WebSocket fleet ---
+    async def _ws_client(self, user_id: str, ready: asyncio.Event):
+        start = time.perf_counter()
+        try:
+            async with websockets.connect(self.ws_url + user_id, max_queue=None, open_timeout=60) as ws:
+                await ws.send(json.dumps({"type": "subscribe", "areas": [AREA]}))
+                await ws.recv()
+                self.ws_connect.append(time.perf_counter() - start)
+                self.ws_clients += 1
+                ready.set()
+                async for raw in ws:
+                    message = json.loads(raw)
+                    if message.get("type") == "alert":
+                        incident_id = message["data"].get("incident_id")
+                        if incident_id:
+                            self.alert_arrivals.setdefault(incident_id, []).append(time.perf_counter())
+        except (OSError, websockets.WebSocketException, asyncio.TimeoutError):
+            ready.set()
+
+    async def connect_fleet(self):
+        batch = 200
+        for first in range(0, self.args.ws_clients, batch):
+            events = []
+            for i in range(first, min(first + batch, self.args.ws_clients)):
+                ready = asyncio.Event()
+                events.append(ready)
+                self._sockets.append(asyncio.create_task(self._ws_client(f"bench-ws-{i}", ready)))
+            await asyncio.gather(*(e.wait() for e in events))
+
+    async def close_fleet(self):
+        for task in self._sockets:
+            task.cancel()
+        await asyncio.gather(*self._sockets, return_exceptions=True)
+
+    # --- operations ---
+    async def submit(self, client: httpx.AsyncClient):
+        user = _phone(self.rng.randrange(self.args.users))
+        lat = CENTER[0] + self.rng.uniform(-SPREAD_DEG, SPREAD_DEG)
+        lng = CENTER[1] + self.rng.uniform(-SPREAD_DEG, SPREAD_DEG)
+        response = await client.post("/api/v1/reports/submit", files={"file": ("photo.jpg", self.photo, "image/jpeg")},
+                                     data={"latitude": lat, "longitude": lng, "user_id": user,
+                                           "category": self.rng.choice(["Pothole", "Garbage", "Traffic"])})
+        if response.status_code == 201:
+            self.reports.append(response.json()["reportId"])
+        return response
+
+    async def verify(self, client: httpx.AsyncClient):
+        if not self.reports:
+            return await self.submit(client)
+        report_id = self.reports.pop(self.rng.randrange(len(self.reports)))
+        sent = time.perf_counter()
+        response = await client.patch(f"/api/v1/reports/{report_id}/verify",
+                                      data={"status": "Verified", "area": AREA, "issue_type": "Pothole"})
+        if response.status_code == 200:
+            body = response.json()
+            incident = body.get("incident") or {}
+            if incident.get("id") and body["whatsapp_alert"].get("status") != "already_alerted":
+                self.alert_sent[incident["id"]] = sent
+        return response
+
+    async def login(self, client: httpx.AsyncClient):
+        return await client.post("/api/v1/users/login",
+                                 json={"mobile": _phone(self.rng.randrange(self.args.users)), "password": PASSWORD})
+
+    async def location(self, client: httpx.AsyncClient):
+        return await client.post("/api/v1/users/update-location", json={
+            "user_id": _phone(self.rng.randrange(self.args.users)),
+            "latitude": CENTER[0] + self.rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+            "longitude": CENTER[1] + self.rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+        })
+
+    async def _timed(self, op: str, client: httpx.AsyncClient):
+        start = time.perf_counter()
+        try:
+            response = await getattr(self, op)(client)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        if ok:
+            self.latencies[op].append(time.perf_counter() - start)
+        else:
+            self.errors[op] += 1
+
+    async def drive(self):
+        """Open loop: requests start on schedule whether or not earlier ones finished"""
+        ops, weights = zip(*self.args.mix.items())
+        limits = httpx.Limits(max_connections=self.args.connections)
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=60) as client:
+            tasks = []
+            start = time.perf_counter()
+            total = int(self.args.rps * self.args.duration)
+            for i in range(total):
+                delay = start + i / self.args.rps - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                op = self.rng.choices(ops, weights)[0]
+                tasks.append(asyncio.create_task(self._timed(op, client)))
+            await asyncio.gather(*tasks)
+            return time.perf_counter() - start
+
+    def fanout(self) -> dict:
+        """Verify sent -> alert delivered to every connected subscriber"""
+        complete, partial = [], 0
+        for incident_id, sent in self.alert_sent.items():
+            arrivals = self.alert_arrivals.get(incident_id, [])
+            if arrivals and len(arrivals) >= self.ws_clients:
+                complete.append(max(arrivals) - sent)
+            else:
+                partial += 1
+        return {**percentiles(complete), "alerts": len(self.alert_sent), "incomplete": partial}
+
+    async def wait_for_alerts(self, timeout: float):
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if all(len(self.alert_arrivals.get(i, [])) >= self.ws_clients for i in self.alert_sent):
+                return
+            await asyncio.sleep(0.1)
+
+
+async def run_client(base_url: str, args) -> dict:
+    run = LoadRun(base_url, args)
+    start = time.perf_counter()
+    await run.connect_fleet()
+    connect_s = time.perf_counter() - start
+
+    elapsed = await run.drive()
+    await run.wait_for_alerts(args.drain)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        server = {name: (await client.get(path)).json() for name, path in [
+            ("verification", "/stats/verification"), ("outbox", "/stats/outbox"),
+            ("alerts", "/stats/alerts"), ("firebase", "/stats/firebase"),
+            ("websocket", "/api/v1/ws/status"),
+        ]}
+    await run.close_fleet()
+
+    requests = {}
+    for op in args.mix:
+        requests[op] = {**percentiles(run.latencies[op]), "errors": run.errors[op],
+                        "throughput_rps": round(len(run.latencies[op]) / elapsed, 1)}
+    all_latencies = [s for samples in run.latencies.values() for s in samples]
+    return {
+        "requests": requests,
+        "overall": {**percentiles(all_latencies), "errors": sum(run.errors.values()),
+                    "throughput_rps": round(len(all_latencies) / elapsed, 1), "elapsed_s": round(elapsed, 2)},
+        "websocket": {"clients": run.ws_clients, "fleet_connect_s": round(connect_s, 2),
+                      "connect": percentiles(run.ws_connect)},
+        "alert_fanout": run.fanout(),
+        "server": server,
+    }
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        op, weight = part.split("=")
+        if op not in ("submit", "verify", "login", "location"):
+            raise argparse.ArgumentTypeError(f"unknown operation {op!r}")
+        mix[op] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load")
+    parser.add_argument("--rps", type=float, default=50, help="Requests started per second")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("submit=15,verify=5,login=30,location=50"))
+    parser.add_argument("--ws-clients", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=5000, help="Registered residents of the alert area")
+    parser.add_argument("--connections", type=int, default=20, help="HTTP client connection pool size")
+    parser.add_argument("--firebase-latency", type=float, default=0.02, help="Per-call Firebase round trip (s)")
+    parser.add_argument("--gemini-latency", type=float, default=0.8)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.02)
+    parser.add_argument("--green-api-latency", type=float, default=0.05)
+    parser.add_argument("--green-api-error-rate", type=float, default=0.01)
+    parser.add_argument("--whatsapp-rate", type=float, default=0, help="Green-API msgs/s limit (0 = unlimited)")
+    parser.add_argument("--digest-window", type=float, default=0, help="ALERT_DIGEST_WINDOW_S (0 = alert at once)")
+    parser.add_argument("--drain", type=float, default=30, help="Max wait for alerts after the load (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--server-logs", action="store_true", help="Keep the server's console output")
+    parser.add_argument("--output", help="Also write the JSON result here")
+    args = parser.parse_args()
+
+    with FakeGreenAPIProcess(latency=args.green_api_latency, error_rate=args.green_api_error_rate) as green_api:
+        port = _free_port()
+        opts = {"green_api_url": green_api.url, "users": args.users, "firebase_latency": args.firebase_latency,
+                "gemini_latency": args.gemini_latency, "gemini_error_rate": args.gemini_error_rate,
+                "whatsapp_rate": args.whatsapp_rate, "digest_window": args.digest_window,
+                "server_logs": args.server_logs}
+        proc = multiprocessing.get_context("spawn").Process(target=serve, args=(port, opts))
+        proc.start()
+        base_url = f"http://127.0.0.1:{port}"
+        for _ in range(600):
+            try:
+                httpx.get(base_url + "/", timeout=1)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        try:
+            result = asyncio.run(run_client(base_url, args))
+            result["green_api"] = green_api.stats()
+        finally:
+            proc.terminate()
+            proc.join()
+
+    result = {"config": {k: v for k, v in vars(args).items() if k != "output"}, **result}
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: database writes for continuous /users/update-location traffic.
+
+Simulates N devices each reporting a position every --period seconds for
+--duration seconds, once with one save_user per call (old path) and once
+through the coalescing buffer. Runs against the in-memory Firebase fake and
+reports round trips to the database and wall time.
+
+Run from the Backend folder:
+    python -m benchmarks.bench_location_writes --devices 2000 --period 1 --duration 6
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from app.services.firebase_service import firebase_async, firebase_service
+from app.services.location_buffer import LocationWriteBuffer
+from benchmarks.fake_firebase import FakeDatabase
+
+
+def make_ticks(devices: int, period: float, duration: float):
+    """One list of (user_id, lat, lng) per tick of `period` seconds"""
+    rng = random.Random(7)
+    ticks = []
+    for _ in range(int(duration / period)):
+        ticks.append([
+            (f"9{i:09d}", 21.25 + rng.uniform(-0.05, 0.05), 81.63 + rng.uniform(-0.05, 0.05))
+            for i in range(devices)
+        ])
+    return ticks
+
+
+async def run_direct(ticks):
+    for tick in ticks:
+        await asyncio.gather(*(
+            firebase_async.save_user({"location": {"latitude": lat, "longitude": lng},
+                                      "lastActive": {".sv": "timestamp"}}, user_id=user_id)
+            for user_id, lat, lng in tick
+        ))
+
+
+async def run_buffered(ticks, buffer: LocationWriteBuffer, period: float):
+    await buffer.start()
+    for tick in ticks:
+        for user_id, lat, lng in tick:
+            buffer.add(user_id, lat, lng)
+        # Devices report once per period; the buffer flushes on its own interval
+        await asyncio.sleep(period)
+    await buffer.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--devices", type=int, default=2000)
+    parser.add_argument("--period", type=float, default=1.0, help="Seconds between reports per device")
+    parser.add_argument("--duration", type=float, default=6.0)
+    parser.add_argument("--flush-interval", type=float, default=2.0)
+    parser.add_argument("--latency", type=float, default=0.005, help="Fake round-trip latency (s)")
+    args = parser.parse_args()
+
+    ticks = make_ticks(args.devices, args.period, args.duration)
+    updates = sum(len(t) for t in ticks)
+
+    firebase_service.db = FakeDatabase(latency=args.latency)
+    start = time.perf_counter()
+    asyncio.run(run_direct(ticks))
+    direct = {"db_writes": firebase_service.db.calls, "write_time_s": round(time.perf_counter() - start, 2)}
+
+    firebase_service.db = FakeDatabase(latency=args.latency)
+    buffer = LocationWriteBuffer(flush_interval=args.flush_interval, max_pending=args.devices * 10)
+    asyncio.run(run_buffered(ticks, buffer, args.period))
+    buffered = {"db_writes": firebase_service.db.calls, **buffer.stats()}
+
+    firebase_async.shutdown()
+    print(json.dumps({
+        "devices": args.devices,
+        "location_updates": updates,
+        "direct": direct,
+        "buffered": buffered,
+        "write_reduction": round(direct["db_writes"] / max(1, buffered["db_writes"]), 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: login latency vs number of registered users.
+
+Compares the old path (download the whole users tree, scan twice) with the
+indexed, cached single-record lookup, against the in-memory Firebase fake.
+"Cold" lookups cost one or two single-record round trips; "cached" ones none.
+
+Run from the Backend folder:
+    python -m benchmarks.bench_login --sizes 1000 10000 100000 --latency 0.005
+"""
+import argparse
+import json
+import statistics
+import time
+
+from app.services.firebase_service import FirebaseService
+from benchmarks.fake_firebase import FakeDatabase
+
+
+def make_users(count: int) -> dict:
+    users = {}
+    for i in range(count):
+        mobile = f"9{i:09d}"
+        record = {
+            "firstName": "User", "lastName": str(i), "email": f"user{i}@example.com",
+            "mobile": mobile, "password": "secret", "role": "user", "area": f"Sector {i % 50}",
+        }
+        # A tenth of users are push-keyed (legacy records), the rest keyed by mobile
+        users[f"-legacy{i:08d}" if i % 10 == 0 else mobile] = record
+    return users
+
+
+def old_login(service: FirebaseService, mobile: str):
+    users = service.get_users()
+    target_user = users.get(mobile)
+    if not target_user:
+        for key, val in users.items():
+            if val.get('mobile') == mobile:
+                target_user = val
+                break
+        for key, val in users.items():
+            if val.get('mobile') == mobile:
+                target_user = val
+                break
+    return target_user
+
+
+def new_login(service: FirebaseService, mobile: str):
+    return service.get_user_by_mobile(mobile)[1]
+
+
+def measure(fn, service, mobiles):
+    samples = []
+    for mobile in mobiles:
+        start = time.perf_counter()
+        assert fn(service, mobile) is not None
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--latency", type=float, default=0.005, help="Fake round-trip latency (s)")
+    parser.add_argument("--logins", type=int, default=20)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        db = FakeDatabase(data={"users": make_users(size)}, latency=args.latency)
+        service = FirebaseService()
+        service.db = db
+        # Seed the mobile index like the app lifespan does
+        service.index_user_mobiles(db.root["users"])
+        # Mix of mobile-keyed and push-keyed users
+        step = max(1, size // args.logins)
+        mobiles = [f"9{i + (i // step) % 10:09d}" for i in range(0, size, step)][:args.logins]
+
+        old_ms = measure(old_login, service, mobiles)
+        cold_ms = measure(new_login, service, mobiles)
+        warm_ms = measure(new_login, service, mobiles)
+        results.append({
+            "users": size,
+            "old_full_scan_ms_p50": old_ms,
+            "indexed_cold_ms_p50": cold_ms,
+            "indexed_cached_ms_p50": warm_ms,
+            "speedup_cold": round(old_ms / cold_ms, 1),
+        })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
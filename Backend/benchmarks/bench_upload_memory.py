@@ -0,0 +1,154 @@
+"""
+Benchmark: API server peak RSS under a burst of concurrent photo uploads.
+
+Starts the app under uvicorn in a child process (Firebase fake, slow Gemini
+stand-in so photos pile up in the verification queue), then posts --uploads
+phone-sized JPEGs at once to /reports/submit, with preprocessing off and on.
+Peak RSS is the server's VmHWM growth over its idle RSS; the preprocessing
+pool's own processes are reported separately.
+
+Linux only (reads /proc). Needs Pillow. Run from the Backend folder:
+    python -m benchmarks.bench_upload_memory --uploads 20 --megapixels 12
+"""
+import argparse
+import asyncio
+import io
+import json
+import multiprocessing
+import random
+import socket
+import time
+
+import httpx
+
+
+def make_photo(megapixels: float, seed: int) -> bytes:
+    """Phone-like JPEG: smooth scene plus sensor noise, with a GPS EXIF block"""
+    from PIL import Image, ImageFilter
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    rng = random.Random(seed)
+    scene = Image.frombytes("RGB", (16, 12), rng.randbytes(16 * 12 * 3)).resize((width, height), Image.BICUBIC)
+    noise = Image.frombytes("RGB", (512, 512), rng.randbytes(512 * 512 * 3)).filter(ImageFilter.GaussianBlur(1))
+    tiled = Image.new("RGB", (width, height))
+    for x in range(0, width, 512):
+        for y in range(0, height, 512):
+            tiled.paste(noise, (x, y))
+    img = Image.blend(scene, tiled, 0.25)
+    exif = Image.Exif()
+    exif.get_ifd(0x8825).update({1: "N", 2: (21.0, 15.0, 0.0), 3: "E", 4: (81.0, 37.0, 48.0)})
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=95, exif=exif)
+    return out.getvalue()
+
+
+def serve(preprocess: bool, port: int):
+    """Child process: the real app with local stand-ins"""
+    import uvicorn
+    from app.core.config import settings
+    settings.IMAGE_PREPROCESS_ENABLED = preprocess
+    settings.GEMINI_CACHE_ENABLED = False
+    settings.WHATSAPP_OUTBOX_PATH = ":memory:"
+
+    from app.services.firebase_service import firebase_service
+    from app.services.gemini_service import gemini_service
+    from app.services.verification_service import verification_pipeline
+    from app.main import app
+    from benchmarks.fake_firebase import FakeDatabase
+
+    class SlowModel:
+        async def generate_content_async(self, parts):
+            await asyncio.sleep(60)
+
+    firebase_service.db = FakeDatabase()
+    gemini_service.model = SlowModel()
+    # One worker stuck on the model: every other photo waits in the queue
+    verification_pipeline.workers = 1
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def _status_kb(pid: int, field: str) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1])
+    return 0
+
+
+def _children(pid: int):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def burst(base_url: str, photos):
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post("/api/v1/reports/submit",
+                        files={"file": (f"p{i}.jpg", photo, "image/jpeg")},
+                        data={"latitude": "21.25", "longitude": "81.63", "user_id": "bench"})
+            for i, photo in enumerate(photos)
+        ))
+        elapsed = time.perf_counter() - start
+        assert all(r.status_code == 201 for r in responses), [r.text for r in responses if r.status_code != 201]
+        images = (await client.get("/stats/images")).json()
+    return elapsed, images
+
+
+def run_mode(preprocess: bool, photos) -> dict:
+    port = _free_port()
+    ctx = multiprocessing.get_context("spawn")
+    proc = ctx.Process(target=serve, args=(preprocess, port))
+    proc.start()
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            httpx.get(base_url + "/", timeout=1)
+            break
+        except httpx.HTTPError:
+            time.sleep(0.1)
+
+    # Warm-up upload (starts the preprocessing pool), then measure from idle
+    asyncio.run(burst(base_url, photos[:1]))
+    baseline = _status_kb(proc.pid, "VmRSS")
+    with open(f"/proc/{proc.pid}/clear_refs", "w") as f:
+        f.write("5")
+    elapsed, images = asyncio.run(burst(base_url, photos))
+    peak = _status_kb(proc.pid, "VmHWM")
+    pool_peak = sum(_status_kb(child, "VmHWM") for child in _children(proc.pid))
+
+    proc.terminate()
+    proc.join()
+    return {
+        "preprocess": preprocess,
+        "uploads": len(photos),
+        "submit_all_s": round(elapsed, 2),
+        "server_peak_rss_growth_mb": round((peak - baseline) / 1024, 1),
+        "preprocess_pool_peak_rss_mb": round(pool_peak / 1024, 1),
+        "image_bytes_reduction": images["avg_reduction"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--megapixels", type=float, default=12)
+    args = parser.parse_args()
+
+    photos = [make_photo(args.megapixels, i) for i in range(args.uploads)]
+    print(f"{args.uploads} photos, avg {sum(map(len, photos)) / len(photos) / 1e6:.1f} MB")
+    results = [run_mode(preprocess, photos) for preprocess in (False, True)]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
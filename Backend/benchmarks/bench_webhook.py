@@ -0,0 +1,190 @@
+"""
+Benchmark: WhatsApp webhook under a replayed burst of Green-API notifications.
+
+Posts --messages incoming messages, --redeliveries of them sent a second time
+(as Green-API does when the ack is slow), to the app under uvicorn in a
+child process:
+- inline: the previous handler, which built the reply and sent it with the
+  blocking send_green_alert before returning
+- queued: the current endpoint (ack at once, LRU de-dup, background workers
+  feeding the WhatsApp outbox)
+Reports ack latency percentiles (from the start of the burst), throughput,
+and how many replies reached Green-API and when. Queued replies drain at the
+configured GREEN_API_RATE_LIMIT_PER_SEC.
+
+Run from the Backend folder:
+    python -m benchmarks.bench_webhook --messages 200 --redeliveries 0.2 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import socket
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import Body, FastAPI
+
+from app.core.config import settings
+from app.services import whatsapp_service, webhook_processor as processor_module
+from benchmarks.fake_green_api import FakeGreenAPIProcess
+
+
+def make_burst(messages: int, redeliveries: float, seed: int = 7):
+    rng = random.Random(seed)
+    payloads = [{
+        "typeWebhook": "incomingMessageReceived",
+        "idMessage": f"BENCH{i:08d}",
+        "messageData": {
+            "chatId": f"9190000{i:05d}@c.us",
+            "textMessage": rng.choice(["Hi", "Report", "Is the road fixed?"]),
+            "senderData": {"senderName": f"User {i}"},
+        },
+    } for i in range(messages)]
+    burst = payloads + rng.sample(payloads, int(messages * redeliveries))
+    rng.shuffle(burst)
+    return burst
+
+
+def inline_app() -> FastAPI:
+    """The handler as it was: reply sent before the response"""
+    app = FastAPI()
+
+    @app.post("/api/v1/webhook/whatsapp")
+    async def whatsapp_webhook(data: dict = Body(...)):
+        message = processor_module.incoming_message(data)
+        if message:
+            whatsapp_service.send_green_alert(message[0], await processor_module.build_reply(*message))
+        return {"status": "replied"}
+
+    return app
+
+
+def queued_app() -> FastAPI:
+    """The current webhook router with its workers and the outbox"""
+    from app.api.v1.endpoints import webhook
+    from app.services.whatsapp_outbox import whatsapp_outbox
+    from app.services.webhook_processor import webhook_processor
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await whatsapp_outbox.start()
+        await webhook_processor.start()
+        yield
+        await webhook_processor.stop()
+        await whatsapp_outbox.stop()
+
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(webhook.router, prefix=settings.API_PREFIX)
+    app.get("/stats/webhook")(webhook_processor.stats)
+    return app
+
+
+def serve(mode: str, port: int, green_api_url: str):
+    """Child process: one of the two apps under uvicorn"""
+    import uvicorn
+    # A fresh outbox per run (a file would de-duplicate against the last run)
+    processor_module.whatsapp_outbox.path = ":memory:"
+    settings.GREEN_API_HOST = green_api_url
+    settings.GREEN_API_ID_INSTANCE = settings.GREEN_API_ID_INSTANCE or "bench"
+    settings.GREEN_API_API_TOKEN = settings.GREEN_API_API_TOKEN or "bench"
+    processor_module.print = lambda *a, **k: None
+    whatsapp_service.print = lambda *a, **k: None
+    app = inline_app() if mode == "inline" else queued_app()
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def post_all(base_url: str, burst, concurrency: int):
+    latencies = []
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        async def post(payload):
+            # Timed from when the whole burst was sent, like deliveries queued at Green-API
+            response = await client.post("/api/v1/webhook/whatsapp", json=payload)
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(post(p) for p in burst))
+        elapsed = time.perf_counter() - start
+    return latencies, elapsed
+
+
+def summarize(latencies, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    pick = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2)
+    return {
+        "requests": len(latencies),
+        "acked_in_s": round(elapsed, 3),
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "ack_p50_ms": pick(0.50),
+        "ack_p95_ms": pick(0.95),
+        "ack_p99_ms": pick(0.99),
+    }
+
+
+def run_mode(mode: str, burst, concurrency: int, server: FakeGreenAPIProcess, expected: int) -> dict:
+    port = _free_port()
+    proc = multiprocessing.get_context("spawn").Process(target=serve, args=(mode, port, server.url))
+    proc.start()
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            httpx.get(base_url + "/api/v1/health", timeout=1)
+            break
+        except httpx.HTTPError:
+            time.sleep(0.1)
+
+    before = server.stats()["received"]
+    latencies, elapsed = asyncio.run(post_all(base_url, burst, concurrency))
+    result = summarize(latencies, elapsed)
+
+    # Time until the replies have reached Green-API (the queued mode sends after acking)
+    start = time.perf_counter()
+    while server.stats()["received"] - before < expected and time.perf_counter() - start < 300:
+        time.sleep(0.05)
+    result["all_replies_sent_s"] = round(elapsed + time.perf_counter() - start, 3)
+    result["replies_sent"] = server.stats()["received"] - before
+    if mode == "queued":
+        result["duplicates_dropped"] = httpx.get(base_url + "/stats/webhook").json()["duplicates"]
+
+    proc.terminate()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--redeliveries", type=float, default=0.2, help="Share of messages delivered twice")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake Green-API latency per send (s)")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent webhook deliveries")
+    args = parser.parse_args()
+
+    burst = make_burst(args.messages, args.redeliveries)
+    with FakeGreenAPIProcess(latency=args.latency) as server:
+        # The inline handler answers every delivery, redeliveries included
+        inline = run_mode("inline", burst, args.concurrency, server, len(burst))
+        queued = run_mode("queued", burst, args.concurrency, server, args.messages)
+
+    print(json.dumps({
+        "messages": args.messages,
+        "deliveries": len(burst),
+        "green_api_latency_s": args.latency,
+        "green_api_rate_limit_per_sec": settings.GREEN_API_RATE_LIMIT_PER_SEC,
+        "inline": inline,
+        "queued": queued,
+        "p99_ack_speedup": round(inline["ack_p99_ms"] / queued["ack_p99_ms"], 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark: sequential blocking sends vs the pooled async sender.
+
+Run from the Backend folder:
+    python -m benchmarks.bench_whatsapp_fanout --recipients 200 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.core.config import settings
+from app.services import whatsapp_service
+from benchmarks.fake_green_api import FakeGreenAPIProcess
+
+
+def run_sequential(phones, message):
+    start = time.perf_counter()
+    sent = sum(1 for phone in phones if whatsapp_service.send_green_alert(phone, message))
+    return sent, time.perf_counter() - start
+
+
+async def run_async(phones, message, concurrency, rate):
+    sender = whatsapp_service.AsyncWhatsAppSender(
+        max_concurrency=concurrency,
+        rate_per_sec=rate,
+        burst=concurrency,
+        timeout=settings.GREEN_API_SEND_TIMEOUT,
+    )
+    start = time.perf_counter()
+    result = await sender.send_many(phones, message)
+    elapsed = time.perf_counter() - start
+    await sender.aclose()
+    return result["sent"], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--recipients", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake server latency per request (s)")
+    parser.add_argument("--concurrency", type=int, default=settings.GREEN_API_MAX_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=0, help="Token bucket rate, 0 = unlimited")
+    args = parser.parse_args()
+
+    phones = [f"9190000{i:05d}" for i in range(args.recipients)]
+    message = "🚨 NAGAR ALERT benchmark message"
+
+    with FakeGreenAPIProcess(latency=args.latency) as server:
+        settings.GREEN_API_HOST = server.url
+        settings.GREEN_API_ID_INSTANCE = settings.GREEN_API_ID_INSTANCE or "bench"
+        settings.GREEN_API_API_TOKEN = settings.GREEN_API_API_TOKEN or "bench"
+
+        # Silence per-send prints from the blocking path
+        whatsapp_service.print = lambda *a, **k: None
+
+        seq_sent, seq_time = run_sequential(phones, message)
+        seq_connections = server.stats()["connections"]
+        async_sent, async_time = asyncio.run(run_async(phones, message, args.concurrency, args.rate))
+        async_connections = server.stats()["connections"] - seq_connections
+
+    print(json.dumps({
+        "recipients": args.recipients,
+        "server_latency_s": args.latency,
+        "sequential": {
+            "sent": seq_sent,
+            "seconds": round(seq_time, 3),
+            "msgs_per_sec": round(seq_sent / seq_time, 1),
+            "tcp_connections": seq_connections,
+        },
+        "async_pooled": {
+            "sent": async_sent,
+            "seconds": round(async_time, 3),
+            "msgs_per_sec": round(async_sent / async_time, 1),
+            "tcp_connections": async_connections,
+            "concurrency": args.concurrency,
+        },
+        "speedup": round(seq_time / async_time, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+In-memory stand-in for the `firebase_admin.db` module.
+
+Supports the Reference/Query surface the backend uses (get/set/update/push,
+child, order_by_child/equal_to/start_at/end_at/limit_to_*), server
+timestamps and multi-path updates. Every read JSON round-trips its result so
+cost grows with payload size like a real download; `latency` adds a fixed
+round-trip delay per call.
+
+Usage:
+    from benchmarks.fake_firebase import FakeDatabase
+    firebase_service.db = FakeDatabase(latency=0.02)
+"""
+import copy
+import itertools
+import json
+import threading
+import time
+
+
+def _resolve_server_values(value, now_ms):
+    if isinstance(value, dict):
+        if value == {".sv": "timestamp"}:
+            return now_ms
+        return {k: _resolve_server_values(v, now_ms) for k, v in value.items()}
+    return value
+
+
+def _split(path: str):
+    return [part for part in path.strip("/").split("/") if part]
+
+
+class FakeDatabase:
+    """Drop-in for `firebase_admin.db` (only `reference` is needed)"""
+
+    def __init__(self, data: dict = None, latency: float = 0.0):
+        self.root = data or {}
+        self.latency = latency
+        self.calls = 0
+        self.bytes_read = 0
+        self._lock = threading.RLock()
+        self._push_counter = itertools.count()
+
+    def reference(self, path: str = "/"):
+        return FakeReference(self, _split(path))
+
+    # --- internals -------------------------------------------------------
+    def _round_trip(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _read(self, parts):
+        node = self.root
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def _write(self, parts, value):
+        if not parts:
+            self.root = value if isinstance(value, dict) else {}
+            return
+        node = self.root
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+            if not isinstance(node, dict):
+                raise ValueError(f"Cannot write below a leaf at {'/'.join(parts)}")
+        if value is None:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = value
+
+    def _download(self, value):
+        data = json.dumps(value)
+        self.bytes_read += len(data)
+        return json.loads(data)
+
+    def next_push_id(self):
+        # Chronological like real push ids
+        return f"-N{int(time.time() * 1000):013d}{next(self._push_counter):07d}"
+
+
+class FakeQuery:
+    def __init__(self, db: FakeDatabase, parts, order_by):
+        self._db = db
+        self._parts = parts
+        self._order_by = order_by
+        self._start = None
+        self._end = None
+        self._equal = None
+        self._limit_first = None
+        self._limit_last = None
+
+    def start_at(self, value):
+        self._start = value
+        return self
+
+    def end_at(self, value):
+        self._end = value
+        return self
+
+    def equal_to(self, value):
+        self._equal = value
+        return self
+
+    def limit_to_first(self, n):
+        self._limit_first = n
+        return self
+
+    def limit_to_last(self, n):
+        self._limit_last = n
+        return self
+
+    def _sort_value(self, key, val):
+        if self._order_by == "$key":
+            return key
+        if self._order_by == "$value":
+            return val
+        node = val
+        for part in _split(self._order_by):
+            node = node.get(part) if isinstance(node, dict) else None
+        return node
+
+    def get(self):
+        self._db._round_trip()
+        with self._db._lock:
+            node = self._db._read(self._parts)
+            if not isinstance(node, dict):
+                return {}
+            rows = []
+            for key, val in node.items():
+                sort_value = self._sort_value(key, val)
+                if self._equal is not None and sort_value != self._equal:
+                    continue
+                if self._start is not None and (sort_value is None or sort_value < self._start):
+                    continue
+                if self._end is not None and (sort_value is None or sort_value > self._end):
+                    continue
+                rows.append((sort_value, key, val))
+        # Firebase puts missing values first, then orders by value then key
+        rows.sort(key=lambda row: (row[0] is not None, row[0] if row[0] is not None else 0, row[1]))
+        if self._limit_first is not None:
+            rows = rows[:self._limit_first]
+        if self._limit_last is not None:
+            rows = rows[-self._limit_last:] if self._limit_last else []
+        return self._db._download({key: val for _, key, val in rows})
+
+
+class FakeReference:
+    def __init__(self, db: FakeDatabase, parts):
+        self._db = db
+        self._parts = parts
+
+    @property
+    def key(self):
+        return self._parts[-1] if self._parts else None
+
+    @property
+    def path(self):
+        return "/" + "/".join(self._parts)
+
+    def child(self, path: str):
+        return FakeReference(self._db, self._parts + _split(path))
+
+    def get(self, etag=False, shallow=False):
+        self._db._round_trip()
+        with self._db._lock:
+            value = self._db._read(self._parts)
+            if shallow and isinstance(value, dict):
+                value = {k: True for k in value}
+            return self._db._download(value) if value is not None else None
+
+    def set(self, value):
+        self._db._round_trip()
+        now_ms = int(time.time() * 1000)
+        with self._db._lock:
+            self._db._write(self._parts, copy.deepcopy(_resolve_server_values(value, now_ms)))
+
+    def update(self, value: dict):
+        """Shallow merge; keys containing '/' are multi-path updates (atomic)"""
+        self._db._round_trip()
+        now_ms = int(time.time() * 1000)
+        with self._db._lock:
+            for key, val in value.items():
+                self._db._write(self._parts + _split(key), copy.deepcopy(_resolve_server_values(val, now_ms)))
+
+    def push(self, value=""):
+        ref = self.child(self._db.next_push_id())
+        ref.set(value)
+        return ref
+
+    def delete(self):
+        self._db._round_trip()
+        with self._db._lock:
+            self._db._write(self._parts, None)
+
+    def order_by_child(self, path: str):
+        return FakeQuery(self._db, self._parts, path)
+
+    def order_by_key(self):
+        return FakeQuery(self._db, self._parts, "$key")
+
+    def order_by_value(self):
+        return FakeQuery(self._db, self._parts, "$value")
@@ -0,0 +1,50 @@
+"""
+Stand-in for the Gemini model used by GeminiService.
+
+Answers generate_content_async after a configurable latency with a canned
+JSON verdict (the shape VERIFY_PROMPT asks for), and fails a configurable
+share of calls so retries and timeouts can be exercised.
+
+Usage:
+    from benchmarks.fake_gemini import FakeGeminiModel
+    gemini_service.model = FakeGeminiModel(latency=0.8, error_rate=0.02)
+"""
+import asyncio
+import json
+import random
+
+VERDICTS = [
+    {"is_civic_issue": True, "issue_type": "Pothole", "severity": "Medium", "description": "Large pothole on the road"},
+    {"is_civic_issue": True, "issue_type": "Garbage", "severity": "Low", "description": "Garbage pile by the footpath"},
+    {"is_civic_issue": True, "issue_type": "Traffic", "severity": "High", "description": "Fallen tree blocking traffic"},
+    {"is_civic_issue": False, "issue_type": "N/A", "severity": "Low", "description": "No civic issue visible"},
+]
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGeminiModel:
+    """Drop-in for genai.GenerativeModel (generate_content_async, plus count_tokens_async for the warm-up)"""
+
+    def __init__(self, latency: float = 0.8, error_rate: float = 0.0, jitter: float = 0.25, seed: int = None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.jitter = jitter
+        self.calls = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+
+    async def count_tokens_async(self, contents):
+        return {"total_tokens": 1}
+
+    async def generate_content_async(self, parts):
+        self.calls += 1
+        # +/- jitter around the mean, like a real model's latency spread
+        await asyncio.sleep(self.latency * (1 + self._random.uniform(-self.jitter, self.jitter)))
+        if self._random.random() < self.error_rate:
+            self.errors += 1
+            raise RuntimeError("fake Gemini failure")
+        return FakeResponse(json.dumps(self._random.choice(VERDICTS)))
@@ -0,0 +1,164 @@
+"""
+Local stand-in for the Green-API HTTP server.
+Accepts sendMessage calls with configurable latency and error rate so
+WhatsApp fan-out can be measured without touching the real API.
+"""
+import json
+import multiprocessing
+import random
+import socket
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Default backlog of 5 drops SYNs when a pool opens many connections at once
+    request_queue_size = 1024
+
+
+class FakeGreenAPI:
+    """Threaded HTTP/1.1 (keep-alive) fake of the Green-API sendMessage endpoint"""
+
+    def __init__(self, latency: float = 0.05, error_rate: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.received = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out in separate writes; avoid Nagle stalls on keep-alive
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self.counted = False
+
+            def do_POST(self):
+                if not self.counted:
+                    self.counted = True
+                    with fake._lock:
+                        fake.connections += 1
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if fake.latency:
+                    time.sleep(fake.latency)
+                with fake._lock:
+                    fake.received += 1
+                    seq = fake.received
+
+                if "/sendMessage/" in self.path and random.random() >= fake.error_rate:
+                    status, payload = 200, {"idMessage": f"FAKE{seq:08d}", "chatId": body.get("chatId")}
+                else:
+                    status, payload = 500, {"error": "fake failure"}
+
+                self._reply(status, payload)
+
+            def do_GET(self):
+                if "/getStateInstance/" in self.path:
+                    self._reply(200, {"stateInstance": "authorized"})
+                    return
+                # Counters for benchmarks running the fake in another process
+                with fake._lock:
+                    stats = {"received": fake.received, "connections": fake.connections}
+                self._reply(200, stats)
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Caller went away (e.g. a benchmarked server shutting down)
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _serve(port, latency, error_rate, ready):
+    server = FakeGreenAPI(latency=latency, error_rate=error_rate, port=port)
+    ready.put(server.url)
+    server._server.serve_forever()
+
+
+class FakeGreenAPIProcess:
+    """
+    Runs FakeGreenAPI in a child process so the benchmarked event loop
+    does not share the GIL with the server threads.
+    """
+
+    def __init__(self, latency: float = 0.05, error_rate: float = 0.0, port: int = 0):
+        self._args = (port, latency, error_rate)
+        self._process = None
+        self.url = None
+
+    def start(self):
+        ready = multiprocessing.Queue()
+        self._process = multiprocessing.Process(target=_serve, args=(*self._args, ready), daemon=True)
+        self._process.start()
+        self.url = ready.get(timeout=10)
+        return self
+
+    def stats(self) -> dict:
+        with urllib.request.urlopen(f"{self.url}/stats") as response:
+            return json.loads(response.read())
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a fake Green-API server")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeGreenAPI(latency=args.latency, error_rate=args.error_rate, port=args.port)
+    print(f"Fake Green-API listening on {server.url}")
+    server._server.serve_forever()
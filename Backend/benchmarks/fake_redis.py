@@ -0,0 +1,84 @@
+"""
+Local stand-in for Redis pub/sub.
+Implements just enough RESP (PING, AUTH, SELECT, SUBSCRIBE, PUBLISH) to exercise
+RedisBackplane without a real Redis server.
+"""
+import asyncio
+from typing import Dict, Set
+
+
+def _bulk(value: bytes) -> bytes:
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class FakeRedis:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.published = 0
+        self._channels: Dict[bytes, Set[asyncio.StreamWriter]] = {}
+        self._handlers: Set[asyncio.Task] = set()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"redis://{self.host}:{self.port}/0"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self._server.close()
+        for task in list(self._handlers):
+            task.cancel()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def _read_command(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        count = int(line[1:-2])
+        parts = []
+        for _ in range(count):
+            length = int((await reader.readline())[1:-2])
+            parts.append((await reader.readexactly(length + 2))[:-2])
+        return parts
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            while True:
+                command = await self._read_command(reader)
+                if command is None:
+                    break
+                name = command[0].upper()
+                if name == b"PING":
+                    writer.write(b"+PONG\r\n")
+                elif name in (b"AUTH", b"SELECT"):
+                    writer.write(b"+OK\r\n")
+                elif name == b"SUBSCRIBE":
+                    for i, channel in enumerate(command[1:], start=1):
+                        self._channels.setdefault(channel, set()).add(writer)
+                        writer.write(b"*3\r\n" + _bulk(b"subscribe") + _bulk(channel) + b":%d\r\n" % i)
+                elif name == b"PUBLISH":
+                    channel, data = command[1], command[2]
+                    subscribers = list(self._channels.get(channel, ()))
+                    frame = b"*3\r\n" + _bulk(b"message") + _bulk(channel) + _bulk(data)
+                    for subscriber in subscribers:
+                        subscriber.write(frame)
+                    self.published += 1
+                    writer.write(b":%d\r\n" % len(subscribers))
+                else:
+                    writer.write(b"-ERR unsupported command\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self._handlers.discard(task)
+            for subscribers in self._channels.values():
+                subscribers.discard(writer)
+            writer.close()
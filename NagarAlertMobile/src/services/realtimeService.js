@@ -113,8 +113,11 @@ class RealtimeService {
         console.log('💓 Keep-alive pong received');
         break;
 
-      case 'location_update':
-        console.log('📍 Location update:', data);
+      // Live user map frames; the backend only sends them to admin sockets
+      // opened with the login wsToken (/ws/{userId}?token=...)
+      case 'location_delta':
+      case 'location_snapshot':
+        console.log('📍 Location frame:', message.users?.length ?? 0, 'users');
         break;
 
       default:
@@ -1,8 +1,8 @@
-import React, { useEffect, useState } from 'react';
-import { MapContainer, TileLayer, Marker, Popup } from 'react-leaflet';
+import React, { useEffect, useRef, useState } from 'react';
+import { MapContainer, TileLayer, Marker, Popup, useMap, useMapEvents } from 'react-leaflet';
 import 'leaflet/dist/leaflet.css';
 import L from 'leaflet';
-import { getReports, getActiveUsers } from '../../services/api';
+import { getReports, getUsersWithin } from '../../services/api';
 
 // Fix for default markers in React Leaflet
 delete L.Icon.Default.prototype._getIconUrl;
@@ -37,9 +37,33 @@ const createCustomIcon = (color) => {
     });
 };
 
+const clamp = (value, limit) => Math.max(-limit, Math.min(limit, value));
+
+// The API rejects coordinates outside the globe (zoomed-out maps wrap around)
+const toBounds = (map) => {
+    const bounds = map.getBounds();
+    return {
+        min_lat: clamp(bounds.getSouth(), 90),
+        min_lng: clamp(bounds.getWest(), 180),
+        max_lat: clamp(bounds.getNorth(), 90),
+        max_lng: clamp(bounds.getEast(), 180),
+    };
+};
+
+// Reports the visible area on load and after every pan / zoom
+const BoundsWatcher = ({ onChange }) => {
+    const map = useMap();
+    useMapEvents({ moveend: () => onChange(toBounds(map)) });
+    useEffect(() => {
+        onChange(toBounds(map));
+    }, [map]);
+    return null;
+};
+
 const MapReview = () => {
     const [incidents, setIncidents] = useState([]);
     const [users, setUsers] = useState([]);
+    const boundsRef = useRef(null);
 
     const fetchData = async () => {
         try {
@@ -54,20 +78,27 @@ const MapReview = () => {
                 setIncidents(reportsArray);
             }
 
-            // Fetch Active Users
-            const usersData = await getActiveUsers();
-            if (usersData) {
-                const usersArray = Object.entries(usersData || {}).map(([key, value]) => ({
-                    id: key,
-                    ...value
-                }));
-                setUsers(usersArray);
-            }
+            await fetchUsers();
         } catch (error) {
             console.error("Error fetching live map data:", error);
         }
     };
 
+    // Live user positions in the visible area
+    const fetchUsers = async () => {
+        if (!boundsRef.current) return;
+        const usersData = await getUsersWithin(boundsRef.current);
+        setUsers((usersData || []).map(({ userId, latitude, longitude }) => ({
+            id: userId,
+            location: { latitude, longitude }
+        })));
+    };
+
+    const handleBounds = (bounds) => {
+        boundsRef.current = bounds;
+        fetchUsers().catch((error) => console.error("Error fetching user positions:", error));
+    };
+
     useEffect(() => {
         fetchData(); // Initial fetch
         const interval = setInterval(fetchData, 5000); // Poll every 5 seconds
@@ -82,6 +113,7 @@ const MapReview = () => {
             zoomControl={false}
         >
             <TileLayer url={TILE_URL} attribution={ATTRIBUTION} />
+            <BoundsWatcher onChange={handleBounds} />
 
             {/* Dynamic Incident Markers */}
             {incidents.map((incident) => (
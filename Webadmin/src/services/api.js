@@ -14,6 +14,12 @@ export const getActiveUsers = async () => {
     return response.data;
 };
 
+// Live positions inside the visible map (the /users/active records can lag)
+export const getUsersWithin = async (bounds) => {
+    const response = await api.get('/users/within', { params: bounds });
+    return response.data;
+};
+
 export const getSolutions = async () => {
     const response = await api.get('/solutions');
     return response.data;